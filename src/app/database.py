@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from django.apps import apps
 from django.db.models import F
 
@@ -13,9 +15,9 @@ def get_media_list(user, media_type, status_filter, sort_filter):
     if "All" not in status_filter:
         queryset = queryset.filter(status__in=status_filter)
 
-    # Apply prefetch related based on media type
+    # Apply prefetch related based on media type, for the current episode
+    # of seasons, the progress of tv shows and seasons is stored
     prefetch_map = {
-        "tv": ["seasons", "seasons__episodes"],
         "season": ["episodes", "episodes__item"],
         "default": [None],
     }
@@ -24,12 +26,7 @@ def get_media_list(user, media_type, status_filter, sort_filter):
         "item",
     )
 
-    sort_is_property = sort_filter in get_properties(model)
-    sort_is_item_field = sort_filter in get_fields(Item)
-    if media_type in ("tv", "season") and sort_is_property:
-        return sorted(queryset, key=lambda x: getattr(x, sort_filter), reverse=True)
-
-    if sort_is_item_field:
+    if sort_filter in get_fields(Item):
         sort_field = f"item__{sort_filter}"
         return queryset.order_by(
             F(sort_field).asc() if sort_filter == "title" else F(sort_field).desc(),
@@ -42,26 +39,37 @@ def get_fields(model):
     return [f.name for f in model._meta.fields]  # noqa: SLF001
 
 
-def get_properties(model):
-    """Get properties of a model."""
-    return [name for name in dir(model) if isinstance(getattr(model, name), property)]
-
-
 def get_in_progress(user):
-    """Get a media list of in progress media by type."""
-    list_by_type = {}
+    """Get a media list of in progress media by type.
+
+    The in progress media of all types is found with one query on the library
+    index, then only the types with media are read from their tables, one
+    query each with their items, and two more for the episodes of seasons.
+    """
+    entries = (
+        models.LibraryEntry.objects.filter(
+            user=user,
+            status__in=[models.STATUS_IN_PROGRESS, models.STATUS_REPEATING],
+        )
+        # dont show tv and episodes in home page
+        .exclude(media_type="tv")
+        .values_list("media_type", "object_id")
+    )
+    ids_by_type = defaultdict(list)
+    for media_type, object_id in entries:
+        ids_by_type[media_type].append(object_id)
 
+    list_by_type = {}
     for media_type in models.MEDIA_TYPES:
-        # dont show tv and episodes in home page
-        if media_type not in ("tv", "episode"):
-            media_list = get_media_list(
-                user=user,
-                media_type=media_type,
-                status_filter=[models.STATUS_IN_PROGRESS, models.STATUS_REPEATING],
-                sort_filter="score",
+        if media_type in ids_by_type:
+            list_by_type[media_type] = list(
+                get_media_list(
+                    user=user,
+                    media_type=media_type,
+                    status_filter=["All"],
+                    sort_filter="score",
+                ).filter(id__in=ids_by_type[media_type]),
             )
-            if media_list:
-                list_by_type[media_type] = media_list
 
     return list_by_type
 
@@ -0,0 +1,159 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urlencode, urlparse
+
+import requests
+from django.conf import settings
+from django.urls import reverse
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# width in pixels of the resized variants, the height keeps the aspect ratio
+IMAGE_SIZES = {"table": 100, "grid": 300, "detail": 600}
+
+# size variants of the providers by context, replacing the size in the
+# stored image URL, so each context downloads the smallest usable image
+PROVIDER_VARIANTS = (
+    (
+        re.compile(r"^(https?://image\.tmdb\.org/t/p/)\w+(/)"),
+        {"table": "w92", "grid": "w342", "detail": "w500"},
+    ),
+    (
+        re.compile(r"^(https://images\.igdb\.com/igdb/image/upload/)t_\w+(/)"),
+        {"table": "t_cover_small", "grid": "t_cover_big", "detail": "t_cover_big_2x"},
+    ),
+    (
+        re.compile(r"^(https://cdn\.myanimelist\.net/images/\w+/\d+/\d+)l?(\.\w+)$"),
+        {"table": "", "grid": "l", "detail": "l"},
+    ),
+    (
+        re.compile(r"^(https://s4\.anilist\.co/file/anilistcdn/.*/cover/)\w+(/)"),
+        {"table": "medium", "grid": "large", "detail": "extraLarge"},
+    ),
+    (
+        # the original is stored when Kitsu has no other size
+        re.compile(r"^(https://media\.kitsu\.\w+/.*/)(?:tiny|small|medium|large)(\.)"),
+        {"table": "tiny", "grid": "small", "detail": "large"},
+    ),
+)
+
+# hosts of the provider images that can be proxied, other images are
+# linked directly so the proxy can't be used to fetch arbitrary URLs
+PROXIED_HOSTS = (
+    "image.tmdb.org",
+    "cdn.myanimelist.net",
+    "cdn.mangaupdates.com",
+    "images.igdb.com",
+)
+
+IMAGE_QUALITY = 80
+
+
+def get_image_url(url, size):
+    """Return the URL of the image at the size used by the template context.
+
+    Provider images are served by the proxy, other images are linked directly.
+    """
+    url = get_variant_url(url, size)
+    if not is_proxied(url):
+        return url
+    return f"{reverse('image', args=[size])}?{urlencode({'url': url})}"
+
+
+def get_variant_url(url, size):
+    """Return the URL of the provider variant of the image for the size."""
+    if not url:
+        return url
+    for pattern, variants in PROVIDER_VARIANTS:
+        variant_url, count = pattern.subn(rf"\g<1>{variants[size]}\g<2>", url)
+        if count:
+            return variant_url
+    return url
+
+
+def is_proxied(url):
+    """Return whether the image URL is from a proxied provider host."""
+    parsed = urlparse(url or "")
+    return parsed.scheme in ("http", "https") and parsed.netloc in PROXIED_HOSTS
+
+
+def get_image_path(url, size):
+    """Return the path of the resized variant of the image on disk."""
+    digest = hashlib.sha256(url.encode()).hexdigest()
+    return Path(settings.IMAGE_CACHE_DIR) / digest[:2] / f"{digest}_{size}.webp"
+
+
+def get_resized(url, size):
+    """Return the path of the resized image, fetching it on the first request.
+
+    Return None if the image can't be fetched or decoded.
+    """
+    path = get_image_path(url, size)
+    if path.exists():
+        return path
+
+    try:
+        response = requests.get(url, timeout=settings.IMAGE_FETCH_TIMEOUT)
+        response.raise_for_status()
+        image = Image.open(BytesIO(response.content))
+        image.load()
+    except (requests.exceptions.RequestException, UnidentifiedImageError, OSError):
+        logger.warning("Could not fetch image %s", url, exc_info=True)
+        return None
+
+    width = IMAGE_SIZES[size]
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)))
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    # written next to the final path and renamed, so readers never see
+    # a partial file when the same image is requested concurrently
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as file:
+        image.save(file, "WEBP", quality=IMAGE_QUALITY)
+    Path(file.name).chmod(0o644)
+    os.replace(file.name, path)  # noqa: PTH105
+
+    return path
+
+
+def get_etag(path):
+    """Return the ETag of the resized image.
+
+    Built from the name, size and modification time of the file, which change
+    when the image is written again, so the content isn't read to compute it.
+    """
+    stat = path.stat()
+    return f"{path.stem}-{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def prune_cache(max_size):
+    """Delete the least recently read images until the cache fits in max_size.
+
+    Return the number of deleted images.
+    """
+    files = []
+    total = 0
+    for path in Path(settings.IMAGE_CACHE_DIR).glob("*/*.webp"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_atime, stat.st_size, path))
+        total += stat.st_size
+
+    deleted = 0
+    for _, size, path in sorted(files):
+        if total <= max_size:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        deleted += 1
+    return deleted
@@ -0,0 +1,201 @@
+import contextvars
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+# fields identifying an item, the keys of the resolver are tuples of them
+KEY_FIELDS = ("media_id", "source", "media_type", "season_number", "episode_number")
+
+# items kept by a resolver, the oldest are evicted past it so long imports
+# don't hold every item they touched
+MAX_ITEMS = 10_000
+
+# item resolver of the current request or celery task, None outside of them
+current_resolver = contextvars.ContextVar("item_resolver", default=None)
+
+
+class ItemResolver:
+    """Identity map of the items resolved during a request or task."""
+
+    def __init__(self, name):
+        """Initialize an empty identity map."""
+        self.name = name
+        self.items = {}
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, keys):
+        """Return the items of the keys, creating the missing ones.
+
+        The keys map to the defaults of the item if it has to be created.
+        Items not resolved before are read with one query and the missing
+        ones created with one conflict ignoring insert, then read back.
+        """
+        keys = {get_key(*key): defaults or {} for key, defaults in keys.items()}
+        missing = [key for key in keys if key not in self.items]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            found = fetch_items(missing)
+            item_model = apps.get_model("app", "Item")
+            items_to_create = [
+                item_model(**dict(zip(KEY_FIELDS, key, strict=True)), **keys[key])
+                for key in missing
+                if key not in found
+            ]
+            if items_to_create:
+                item_model.objects.bulk_create(items_to_create, ignore_conflicts=True)
+                found |= fetch_items([key for key in missing if key not in found])
+                if len(found) < len(missing):
+                    msg = "Could not create the items of the keys"
+                    raise IntegrityError(msg)
+            self.items |= found
+
+        resolved = {key: self.items[key] for key in keys}
+        for key in list(self.items)[: max(len(self.items) - MAX_ITEMS, 0)]:
+            del self.items[key]
+        return resolved
+
+    def discard(self, item):
+        """Forget an item, so it's read again the next time it's resolved."""
+        key = get_key(*(getattr(item, field) for field in KEY_FIELDS))
+        self.items.pop(key, None)
+
+    def clear(self):
+        """Forget all the resolved items."""
+        self.items.clear()
+
+
+def get_key(
+    media_id,
+    source,
+    media_type,
+    season_number=None,
+    episode_number=None,
+):
+    """Return the resolver key of an item.
+
+    Numbers from request parameters are strings, they're converted so they
+    match the items read from the database.
+    """
+    return (
+        int(media_id),
+        source,
+        media_type,
+        None if season_number is None else int(season_number),
+        None if episode_number is None else int(episode_number),
+    )
+
+
+def fetch_items(keys):
+    """Return the existing items of the keys with a single query."""
+    groups = defaultdict(list)
+    for key in keys:
+        groups[key[1], key[2]].append(key)
+
+    query = Q()
+    for (source, media_type), group in groups.items():
+        group_query = Q(
+            source=source,
+            media_type=media_type,
+            media_id__in={key[0] for key in group},
+        )
+        if media_type in ("season", "episode"):
+            group_query &= Q(season_number__in={key[3] for key in group})
+        if media_type == "episode":
+            group_query &= Q(episode_number__in={key[4] for key in group})
+        query |= group_query
+
+    keys = set(keys)
+    items = {}
+    for item in apps.get_model("app", "Item").objects.filter(query):
+        key = get_key(*(getattr(item, field) for field in KEY_FIELDS))
+        if key in keys:
+            items[key] = item
+    return items
+
+
+def resolve_items(keys):
+    """Return the items of the keys, creating the missing ones in bulk.
+
+    Inside a request or celery task, items already resolved are served from
+    the identity map without a query.
+    """
+    resolver = current_resolver.get() or ItemResolver("unscoped")
+    return resolver.resolve(keys)
+
+
+def resolve_item(defaults=None, **fields):
+    """Return the item with the key fields, creating it with the defaults.
+
+    Used like Item.objects.get_or_create, but through the identity map.
+    """
+    key = get_key(**fields)
+    return resolve_items({key: defaults})[key]
+
+
+def discard_item(item):
+    """Forget a deleted item in the identity map of the current scope."""
+    resolver = current_resolver.get()
+    if resolver is not None:
+        resolver.discard(item)
+
+
+def clear_resolver():
+    """Forget the items resolved in the current scope."""
+    resolver = current_resolver.get()
+    if resolver is not None:
+        resolver.clear()
+
+
+@contextmanager
+def atomic(using=None):
+    """Run the block in a transaction, forgetting the resolved items on rollback.
+
+    Items created in a rolled back transaction no longer exist, they can't
+    be served from the identity map anymore.
+    """
+    try:
+        with transaction.atomic(using=using):
+            yield
+            rolled_back = transaction.get_rollback(using=using)
+    except Exception:
+        clear_resolver()
+        raise
+    if rolled_back:
+        clear_resolver()
+
+
+def start_resolver(name):
+    """Start an identity map of the items and return the token to end it."""
+    return current_resolver.set(ItemResolver(name))
+
+
+def end_resolver(token):
+    """Discard the identity map of the items and log its counters."""
+    resolver = current_resolver.get()
+    current_resolver.reset(token)
+    if resolver is not None:
+        logger.debug(
+            "Item resolver for %s: %s hits, %s misses",
+            resolver.name,
+            resolver.hits,
+            resolver.misses,
+        )
+
+
+@contextmanager
+def item_resolver(name):
+    """Serve repeated item lookups inside the block from the identity map."""
+    token = start_resolver(name)
+    try:
+        yield current_resolver.get()
+    finally:
+        end_resolver(token)
@@ -0,0 +1,146 @@
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.core.cache.backends.redis import RedisSerializer
+from django.core.management.base import BaseCommand
+
+from app.providers import mal, tmdb
+from app.providers.serializers import CompressedSerializer
+from app.tests.helpers import synthetic_tv_response
+
+# recorded provider responses checked in with the test fixtures
+FIXTURES_PATH = Path(__file__).resolve().parents[2] / "tests" / "mock_data"
+
+# functions returning the metadata cached for each recorded response
+RECORDED_FIXTURES = {
+    "metadata_movie_unknown.json": lambda response: [
+        tmdb.process_movie(response, response["id"]),
+    ],
+    "metadata_anime_unknown.json": lambda response: [
+        mal.process_anime(response, response["id"]),
+    ],
+}
+
+
+class Command(BaseCommand):
+    """Compare the cache serializers on the metadata of a long-running show."""
+
+    help = (
+        "Compare the size, encode and decode time of the cache serializers "
+        "on the tv_with_seasons metadata of a long-running TMDB tv show, "
+        "generated with --seasons and --episodes or read with --fixture, or "
+        "with --recorded on the small responses of the test fixtures."
+    )
+
+    def add_arguments(self, parser):
+        """Add the command arguments."""
+        parser.add_argument(
+            "--fixture",
+            type=Path,
+            help=(
+                "recorded TMDB /tv/{id} response with "
+                "append_to_response=recommendations,season/1,... "
+                "instead of a generated one"
+            ),
+        )
+        parser.add_argument(
+            "--recorded",
+            action="store_true",
+            help="use the movie and anime responses of the test fixtures instead",
+        )
+        parser.add_argument("--seasons", type=int, default=30)
+        parser.add_argument("--episodes", type=int, default=24)
+        parser.add_argument("--iterations", type=int, default=50)
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        """Run the benchmark and print a row per serializer."""
+        if options["fixture"]:
+            with options["fixture"].open() as file:
+                entries = cache_entries(json.load(file))
+        elif options["recorded"]:
+            entries = recorded_entries()
+        else:
+            entries = cache_entries(
+                synthetic_tv_response(options["seasons"], options["episodes"]),
+            )
+
+        serializers = {
+            "pickle": RedisSerializer(),
+            "pickle+zlib": CompressedSerializer(),
+            "pickle+zlib level 1": CompressedSerializer(level=1),
+            "pickle+zlib level 9": CompressedSerializer(level=9),
+        }
+
+        self.stdout.write(
+            f"{len(entries)} entries, median of {options['iterations']} runs",
+        )
+        self.stdout.write(
+            f"{'serializer':<22}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}",
+        )
+        for name, serializer in serializers.items():
+            size, encode, decode = measure(
+                serializer,
+                entries,
+                options["iterations"],
+            )
+            self.stdout.write(
+                f"{name:<22}{size:>12,}{encode:>12.2f}{decode:>12.2f}",
+            )
+
+
+def recorded_entries():
+    """Return the entries cached for the recorded provider responses."""
+    values = []
+    for name, process in RECORDED_FIXTURES.items():
+        with (FIXTURES_PATH / name).open() as file:
+            values.extend(process(json.load(file)))
+    return get_envelopes(values)
+
+
+def cache_entries(response):
+    """Return the entries cached for the tv show and its seasons."""
+    tv_metadata = tmdb.process_tv(response)
+    values = [tv_metadata]
+
+    for key, value in response.items():
+        if key.startswith("season/"):
+            season_metadata = tmdb.process_season(value)
+            season_metadata["tv_title"] = tv_metadata["title"]
+            values.append(season_metadata)
+
+    return get_envelopes(values)
+
+
+def get_envelopes(values):
+    """Return the values in the envelope stored by the provider cache."""
+    return [
+        {"value": value, "fetched_at": 0.0, "stale_at": 0.0, "validators": None}
+        for value in values
+    ]
+
+
+def measure(serializer, entries, iterations):
+    """Return the stored size and median encode and decode time in ms."""
+    encoded = [serializer.dumps(entry) for entry in entries]
+    size = sum(len(data) for data in encoded)
+
+    encode_times = []
+    decode_times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        for entry in entries:
+            serializer.dumps(entry)
+        encode_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for data in encoded:
+            serializer.loads(data)
+        decode_times.append(time.perf_counter() - start)
+
+    return (
+        size,
+        statistics.median(encode_times) * 1000,
+        statistics.median(decode_times) * 1000,
+    )
@@ -0,0 +1,74 @@
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+
+from app import items
+from app.models import STATUS_COMPLETED, STATUS_IN_PROGRESS, TV, Item
+from app.providers import services
+from app.tests.helpers import synthetic_tv_metadata
+
+
+class Command(BaseCommand):
+    """Count the queries made to complete a TV show."""
+
+    help = (
+        "Count the database queries made when a TV show is marked as completed, "
+        "for generated shows of each number of seasons and episodes. Each show "
+        "is created in a transaction that is rolled back, and its metadata is "
+        "served from the metadata memo instead of the providers."
+    )
+
+    def add_arguments(self, parser):
+        """Add the command arguments."""
+        parser.add_argument("--seasons", type=int, nargs="+", default=[1, 5, 20])
+        parser.add_argument("--episodes", type=int, nargs="+", default=[12, 24, 100])
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        """Run the benchmark and print a row per show size."""
+        self.stdout.write(f"{'seasons':>8}{'episodes':>10}{'queries':>10}")
+        for seasons in options["seasons"]:
+            for episodes in options["episodes"]:
+                queries = count_queries(seasons, episodes)
+                self.stdout.write(f"{seasons:>8}{episodes:>10}{queries:>10}")
+
+
+def count_queries(seasons, episodes):
+    """Return the queries made to complete a generated TV show."""
+    tv_metadata, tv_with_seasons_metadata = synthetic_tv_metadata(seasons, episodes)
+
+    with items.atomic(), services.metadata_memo("benchmark_tv_completed") as memo:
+        user = get_user_model().objects.create_user(
+            username=f"benchmark-{uuid.uuid4().hex}",
+        )
+        media_id = (Item.objects.aggregate(Max("media_id"))["media_id__max"] or 0) + 1
+        item = Item.objects.create(
+            media_id=media_id,
+            source="tmdb",
+            media_type="tv",
+            title=tv_metadata["title"],
+            image=tv_metadata["image"],
+        )
+        tv = TV.objects.create(item=item, user=user, status=STATUS_IN_PROGRESS)
+
+        # the lookups of TV.completed are answered by the memo
+        memo.entries[services.get_memo_key("tv", media_id, "tmdb")] = tv_metadata
+        memo.entries[
+            services.get_memo_key(
+                "tv_with_seasons",
+                media_id,
+                "tmdb",
+                range(1, seasons + 1),
+            )
+        ] = tv_with_seasons_metadata
+
+        with CaptureQueriesContext(connection) as queries:
+            tv.status = STATUS_COMPLETED
+            tv.save()
+
+        transaction.set_rollback(True)
+
+    return len(queries)
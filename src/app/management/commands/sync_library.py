@@ -0,0 +1,56 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import LIBRARY_MEDIA_TYPES, LibraryEntry, sync_library
+
+# fields of the media stored in their library entries
+ENTRY_FIELDS = ("user_id", "item_id", "status", "score")
+
+
+class Command(BaseCommand):
+    """Rebuild or verify the library index of the users."""
+
+    help = (
+        "Rebuild the library entries of every user from the media tables, "
+        "or with --check only report the media types whose entries differ."
+    )
+
+    def add_arguments(self, parser):
+        """Add the command arguments."""
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="report stale library entries without rebuilding them",
+        )
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        """Rebuild or verify the library entries."""
+        if not options["check"]:
+            for media_type in LIBRARY_MEDIA_TYPES:
+                sync_library(media_type)
+            self.stdout.write(f"Synced {LibraryEntry.objects.count()} library entries")
+            return
+
+        stale = 0
+        for media_type in LIBRARY_MEDIA_TYPES:
+            count = count_stale(media_type)
+            if count:
+                self.stdout.write(f"Stale library entries: {media_type} ({count})")
+            stale += count
+        if stale:
+            msg = f"{stale} stale library entries, run the command without --check"
+            raise CommandError(msg)
+        self.stdout.write("Library entries are up to date")
+
+
+def count_stale(media_type):
+    """Return the number of media missing or differing from their entries."""
+    model = apps.get_model(app_label="app", model_name=media_type)
+    media = set(model.objects.values_list("id", *ENTRY_FIELDS))
+    entries = set(
+        LibraryEntry.objects.filter(media_type=media_type).values_list(
+            "object_id",
+            *ENTRY_FIELDS,
+        ),
+    )
+    return len({row[0] for row in media ^ entries})
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Coalesce
+
+from app.models import (
+    AGGREGATE_FIELDS,
+    TV,
+    Season,
+    update_aggregates,
+    update_tv_aggregates,
+)
+
+
+class Command(BaseCommand):
+    """Backfill or verify the stored aggregates of seasons and tv shows."""
+
+    help = (
+        "Store the progress, repeats, start and end date of every season and "
+        "tv show computed from their episodes, or with --check only report "
+        "the ones that differ."
+    )
+
+    def add_arguments(self, parser):
+        """Add the command arguments."""
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="report stale aggregates without updating them",
+        )
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        """Update or verify the aggregates."""
+        if not options["check"]:
+            update_aggregates(Season.objects.values("id"))
+            # tv shows without seasons aren't updated through them
+            update_tv_aggregates(TV.objects.filter(seasons=None).values("id"))
+            self.stdout.write(
+                f"Updated {Season.objects.count()} seasons "
+                f"and {TV.objects.count()} tv shows",
+            )
+            return
+
+        stale = get_stale(
+            Season.objects.annotate(
+                computed_progress=Count("episodes"),
+                computed_repeats=Coalesce(Max("episodes__repeats"), 0),
+                computed_start_date=Min("episodes__watch_date"),
+                computed_end_date=Max("episodes__watch_date"),
+            ),
+        ) + get_stale(
+            TV.objects.annotate(
+                computed_progress=Coalesce(Sum("seasons__progress"), 0),
+                computed_repeats=Coalesce(Max("seasons__repeats"), 0),
+                computed_start_date=Min("seasons__start_date"),
+                computed_end_date=Max("seasons__end_date"),
+            ),
+        )
+        for media in stale:
+            self.stdout.write(f"Stale aggregates: {media} ({media.id})")
+        if stale:
+            msg = f"{len(stale)} stale aggregates, run the command without --check"
+            raise CommandError(msg)
+        self.stdout.write("Aggregates are up to date")
+
+
+def get_stale(queryset):
+    """Return the media whose stored aggregates differ from the computed ones."""
+    return [
+        media
+        for media in queryset.select_related("item")
+        if any(
+            getattr(media, field) != getattr(media, f"computed_{field}")
+            for field in AGGREGATE_FIELDS
+        )
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-18 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0028_alter_item_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetadataSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('tmdb', 'tmdb'), ('mal', 'mal'), ('mangaupdates', 'mangaupdates'), ('igdb', 'igdb'), ('manual', 'manual')], max_length=20)),
+                ('media_type', models.CharField(choices=[('movie', 'Movie'), ('tv', 'TV Show'), ('season', 'Season'), ('episode', 'Episode'), ('anime', 'Anime'), ('manga', 'Manga'), ('game', 'Game')], max_length=10)),
+                ('media_id', models.CharField(max_length=20)),
+                ('season_number', models.PositiveIntegerField(blank=True, null=True)),
+                ('data', models.JSONField()),
+                ('fetched_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['media_id'], name='app_metadat_media_i_7b9ce0_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('season_number__isnull', True)), fields=('source', 'media_type', 'media_id'), name='unique_snapshot_without_season'), models.UniqueConstraint(condition=models.Q(('season_number__isnull', False)), fields=('source', 'media_type', 'media_id', 'season_number'), name='unique_snapshot_with_season')],
+            },
+        ),
+    ]
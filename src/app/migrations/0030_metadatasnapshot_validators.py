@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0029_metadatasnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metadatasnapshot',
+            name='validators',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
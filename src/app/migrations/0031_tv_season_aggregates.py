@@ -0,0 +1,123 @@
+# Generated by Django 5.1.2 on 2026-10-18 03:59
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def aggregate(queryset, function, field):
+    return Subquery(queryset.annotate(value=function(field)).values('value'))
+
+
+def forward_func(apps, _):
+    Episode = apps.get_model('app', 'Episode')
+    Season = apps.get_model('app', 'Season')
+    TV = apps.get_model('app', 'TV')
+
+    episodes = Episode.objects.filter(related_season=OuterRef('pk')).order_by().values('related_season')
+    Season.objects.update(
+        progress=Coalesce(aggregate(episodes, Count, 'id'), 0),
+        repeats=Coalesce(aggregate(episodes, Max, 'repeats'), 0),
+        start_date=aggregate(episodes, Min, 'watch_date'),
+        end_date=aggregate(episodes, Max, 'watch_date'),
+    )
+
+    seasons = Season.objects.filter(related_tv=OuterRef('pk')).order_by().values('related_tv')
+    TV.objects.update(
+        progress=Coalesce(aggregate(seasons, Sum, 'progress'), 0),
+        repeats=Coalesce(aggregate(seasons, Max, 'repeats'), 0),
+        start_date=aggregate(seasons, Min, 'start_date'),
+        end_date=aggregate(seasons, Max, 'end_date'),
+    )
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0030_metadatasnapshot_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalseason',
+            name='end_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalseason',
+            name='progress',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='historicalseason',
+            name='repeats',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='historicalseason',
+            name='start_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicaltv',
+            name='end_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicaltv',
+            name='progress',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='historicaltv',
+            name='repeats',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='historicaltv',
+            name='start_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='season',
+            name='end_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='season',
+            name='progress',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='season',
+            name='repeats',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='season',
+            name='start_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tv',
+            name='end_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tv',
+            name='progress',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tv',
+            name='repeats',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tv',
+            name='start_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(forward_func, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.2 on 2026-10-18 04:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def forward_func(apps, _):
+    LibraryEntry = apps.get_model('app', 'LibraryEntry')
+
+    for media_type in ['tv', 'season', 'movie', 'anime', 'manga', 'game']:
+        model = apps.get_model('app', media_type)
+        entries = (
+            LibraryEntry(
+                user_id=media['user_id'],
+                item_id=media['item_id'],
+                media_type=media_type,
+                object_id=media['id'],
+                status=media['status'],
+                score=media['score'],
+            )
+            for media in model.objects.values('id', 'user_id', 'item_id', 'status', 'score').iterator()
+        )
+        LibraryEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0031_tv_season_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibraryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('media_type', models.CharField(choices=[('tv', 'TV Show'), ('season', 'Season'), ('movie', 'Movie'), ('anime', 'Anime'), ('manga', 'Manga'), ('game', 'Game')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('status', models.CharField(max_length=12)),
+                ('score', models.DecimalField(blank=True, decimal_places=1, max_digits=3, null=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='library_entries', to='app.item')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='library_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'status', 'media_type'], name='app_library_user_id_ebfde0_idx'), models.Index(fields=['status', 'item'], name='app_library_status_ea0ce9_idx')],
+                'unique_together': {('user', 'item')},
+            },
+        ),
+        migrations.RunPython(forward_func, migrations.RunPython.noop),
+    ]
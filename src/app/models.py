@@ -1,6 +1,7 @@
 import datetime
 import logging
 
+from django.apps import apps
 from django.conf import settings
 from django.core.validators import (
     DecimalValidator,
@@ -8,12 +9,24 @@ from django.core.validators import (
     MinValueValidator,
 )
 from django.db import models
-from django.db.models import CheckConstraint, Max, Q, Sum, UniqueConstraint
+from django.db.models import (
+    CheckConstraint,
+    Count,
+    Max,
+    Min,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    UniqueConstraint,
+)
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from model_utils import FieldTracker
 from simple_history.models import HistoricalRecords
 from simple_history.utils import bulk_create_with_history, bulk_update_with_history
 
+from app.items import get_key, resolve_item, resolve_items
 from app.providers import services, tmdb
 from app.templatetags.app_extras import slug
 
@@ -39,6 +52,12 @@ STATUS_DROPPED = "Dropped"
 
 SOURCES = ["tmdb", "mal", "mangaupdates", "igdb", "manual"]
 
+# fields of seasons and tv shows aggregated from their episodes
+AGGREGATE_FIELDS = ["progress", "repeats", "start_date", "end_date"]
+
+# media types with a user and status, indexed in the library of each user
+LIBRARY_MEDIA_TYPES = ["tv", "season", "movie", "anime", "manga", "game"]
+
 
 class Item(models.Model):
     """Model for items in custom lists."""
@@ -249,7 +268,7 @@ class Media(models.Model):
         if self.progress < 0:
             self.progress = 0
         else:
-            max_progress = services.get_media_metadata(
+            max_progress = services.get_core_metadata(
                 self.item.media_type,
                 self.item.media_id,
                 self.item.source,
@@ -267,7 +286,7 @@ class Media(models.Model):
             if not self.end_date:
                 self.end_date = datetime.datetime.now(tz=settings.TZ).date()
 
-            max_progress = services.get_media_metadata(
+            max_progress = services.get_core_metadata(
                 self.item.media_type,
                 self.item.media_id,
                 self.item.source,
@@ -296,7 +315,7 @@ class Media(models.Model):
 
     def progress_response(self):
         """Return the data needed to update the progress of the media."""
-        media_metadata = services.get_media_metadata(
+        media_metadata = services.get_core_metadata(
             self.item.media_type,
             self.item.media_id,
             self.item.source,
@@ -319,40 +338,15 @@ class TV(Media):
     @tracker  # postpone field reset until after the save
     def save(self, *args, **kwargs):
         """Save the media instance."""
+        exclude_aggregates(self, kwargs)
         super(Media, self).save(*args, **kwargs)
 
         if "status" in self.tracker.changed() and self.status == STATUS_COMPLETED:
             self.completed()
 
-    @property
-    def progress(self):
-        """Return the total episodes watched for the TV show."""
-        return sum(season.progress for season in self.seasons.all())
-
-    @property
-    def repeats(self):
-        """Return the number of max repeated episodes in the TV show."""
-        return max((season.repeats for season in self.seasons.all()), default=0)
-
-    @property
-    def start_date(self):
-        """Return the date of the first episode watched."""
-        return min(
-            (season.start_date for season in self.seasons.all()),
-            default=datetime.date(datetime.MINYEAR, 1, 1),
-        )
-
-    @property
-    def end_date(self):
-        """Return the date of the last episode watched."""
-        return max(
-            (season.end_date for season in self.seasons.all()),
-            default=datetime.date(datetime.MINYEAR, 1, 1),
-        )
-
     def completed(self):
         """Create remaining seasons and episodes for a TV show."""
-        tv_metadata = services.get_media_metadata(
+        tv_metadata = services.get_core_metadata(
             self.item.media_type,
             self.item.media_id,
             self.item.source,
@@ -362,9 +356,6 @@ class TV(Media):
         if not max_progress or self.progress > max_progress:
             return
 
-        seasons_to_update = []
-        episodes_to_create = []
-
         season_numbers = [
             season["season_number"]
             for season in tv_metadata["related"]["seasons"]
@@ -376,44 +367,52 @@ class TV(Media):
             self.item.source,
             season_numbers,
         )
-        for season_number in season_numbers:
-            season_metadata = tv_with_seasons_metadata[f"season/{season_number}"]
+        seasons_metadata = {
+            season_number: tv_with_seasons_metadata[f"season/{season_number}"]
+            for season_number in season_numbers
+        }
+        season_items = get_season_items(self.item, seasons_metadata)
 
-            item, _ = Item.objects.get_or_create(
-                media_id=self.item.media_id,
-                source=self.item.source,
-                media_type="season",
-                season_number=season_number,
-                defaults={
-                    "title": self.item.title,
-                    "image": season_metadata["image"],
-                },
-            )
-            try:
-                season_instance = Season.objects.get(
-                    item=item,
-                    user=self.user,
-                )
+        seasons = {
+            season.item_id: season
+            for season in Season.objects.filter(
+                item__in=season_items.values(),
+                user=self.user,
+            ).select_related("item")
+        }
+        seasons_to_update = []
+        for season in seasons.values():
+            if season.status != STATUS_COMPLETED:
+                season.status = STATUS_COMPLETED
+                seasons_to_update.append(season)
 
-                if season_instance.status != STATUS_COMPLETED:
-                    season_instance.status = STATUS_COMPLETED
-                    seasons_to_update.append(season_instance)
-
-            except Season.DoesNotExist:
-                season_instance = Season(
-                    item=item,
-                    score=None,
-                    status=STATUS_COMPLETED,
-                    notes="",
-                    related_tv=self,
-                    user=self.user,
-                )
-                Season.save_base(season_instance)
-            episodes_to_create.extend(
-                season_instance.get_remaining_eps(season_metadata),
+        seasons_to_create = [
+            Season(
+                item=item,
+                score=None,
+                status=STATUS_COMPLETED,
+                notes="",
+                related_tv=self,
+                user=self.user,
             )
+            for item in season_items.values()
+            if item.id not in seasons
+        ]
+        bulk_create_with_history(seasons_to_create, Season)
         bulk_update_with_history(seasons_to_update, Season, ["status"])
+        # bulk operations don't send the signals keeping the library in sync
+        index_media([*seasons_to_create, *seasons_to_update])
+
+        episodes_to_create = get_remaining_episodes(
+            [
+                (season, seasons_metadata[season.item.season_number])
+                for season in [*seasons.values(), *seasons_to_create]
+            ],
+        )
         bulk_create_with_history(episodes_to_create, Episode)
+        update_aggregates(
+            {episode.related_season_id for episode in episodes_to_create},
+        )
 
 
 class Season(Media):
@@ -446,6 +445,7 @@ class Season(Media):
         if self.related_tv_id is None:
             self.related_tv = self.get_tv()
 
+        exclude_aggregates(self, kwargs)
         super(Media, self).save(*args, **kwargs)
 
         if "status" in self.tracker.changed() and self.status == STATUS_COMPLETED:
@@ -459,11 +459,14 @@ class Season(Media):
                 self.get_remaining_eps(season_metadata),
                 Episode,
             )
+            update_aggregates([self.id])
+            self.refresh_aggregates()
 
-    @property
-    def progress(self):
-        """Return the total episodes watched for the season."""
-        return self.episodes.count()
+    def refresh_aggregates(self):
+        """Reload the aggregates of the season and its loaded TV show."""
+        self.refresh_from_db(fields=AGGREGATE_FIELDS)
+        if Season.related_tv.is_cached(self):
+            self.related_tv.refresh_from_db(fields=AGGREGATE_FIELDS)
 
     @property
     def current_episode(self):
@@ -487,27 +490,6 @@ class Season(Media):
             return sorted_episodes[0]
         return None
 
-    @property
-    def repeats(self):
-        """Return the number of max repeated episodes in the season."""
-        return max((episodes.repeats for episodes in self.episodes.all()), default=0)
-
-    @property
-    def start_date(self):
-        """Return the date of the first episode watched."""
-        return min(
-            (episode.watch_date for episode in self.episodes.all()),
-            default=datetime.date(datetime.MINYEAR, 1, 1),
-        )
-
-    @property
-    def end_date(self):
-        """Return the date of the last episode watched."""
-        return max(
-            (episode.watch_date for episode in self.episodes.all()),
-            default=datetime.date(datetime.MINYEAR, 1, 1),
-        )
-
     def increase_progress(self):
         """Watch the next episode of the season."""
         current_episode = self.current_episode
@@ -566,6 +548,100 @@ class Season(Media):
                 episode,
             )
 
+    def watch_many(self, episode_numbers, watch_date):
+        """Create or add a repeat to several episodes of the season at once.
+
+        The season metadata is fetched once and the episodes are written in
+        bulk, the completion of the season is checked after all of them.
+        """
+        season_metadata = services.get_media_metadata(
+            "season",
+            self.item.media_id,
+            self.item.source,
+            [self.item.season_number],
+        )
+        # like on the season page, only aired episodes are watched in bulk,
+        # manual episodes have no air date
+        episodes = {
+            episode["episode_number"]: episode
+            for episode in season_metadata["episodes"]
+            if self.item.source == "manual" or is_aired(episode)
+        }
+        items = get_episode_items(
+            self.item,
+            [
+                (self.item.season_number, episodes[episode_number])
+                for episode_number in dict.fromkeys(episode_numbers)
+                if episode_number in episodes
+            ],
+        )
+        items = list(items.values())
+        watched = {
+            episode.item_id: episode
+            for episode in Episode.objects.filter(related_season=self, item__in=items)
+        }
+
+        # from the form, watch_date is a string
+        if watch_date == "None":
+            watch_date = None
+
+        episodes_to_update = []
+        episodes_to_create = []
+        for item in items:
+            episode = watched.get(item.id)
+            if episode:
+                episode.watch_date = watch_date
+                episode.repeats += 1
+                episodes_to_update.append(episode)
+            else:
+                episodes_to_create.append(
+                    Episode(related_season=self, item=item, watch_date=watch_date),
+                )
+        bulk_update_with_history(episodes_to_update, Episode, ["watch_date", "repeats"])
+        bulk_create_with_history(episodes_to_create, Episode)
+        update_aggregates([self.id])
+        self.refresh_aggregates()
+        logger.info(
+            "%s episodes of %s watched, %s of them rewatched.",
+            len(items),
+            self,
+            len(episodes_to_update),
+        )
+
+        if self.status in (STATUS_IN_PROGRESS, STATUS_REPEATING):
+            self.update_status(season_metadata)
+
+    def update_status(self, season_metadata=None):
+        """Complete the season and its TV show if every episode is watched."""
+        if not season_metadata:
+            season_metadata = services.get_media_metadata(
+                "season",
+                self.item.media_id,
+                self.item.source,
+                [self.item.season_number],
+            )
+        max_progress = len(season_metadata["episodes"])
+        total_repeats = self.episodes.aggregate(
+            total_repeats=Sum("repeats"),
+        )["total_repeats"]
+
+        total_watches = self.progress + total_repeats
+
+        if total_watches >= max_progress * (self.repeats + 1):
+            self.status = STATUS_COMPLETED
+            self.save_base(update_fields=["status"])
+
+            tv_metadata = services.get_core_metadata(
+                "tv",
+                self.item.media_id,
+                self.item.source,
+            )
+            last_season = tv_metadata["related"]["seasons"][-1]["season_number"]
+            # mark the TV show as completed if it's the last season
+            if self.item.season_number == last_season:
+                self.related_tv.status = STATUS_COMPLETED
+                self.related_tv.save_base(update_fields=["status"])
+
     def decrease_progress(self):
         """Unwatch the current episode of the season."""
         episode_number = self.current_episode.item.episode_number
@@ -634,7 +710,7 @@ class Season(Media):
                 user=self.user,
             )
         except TV.DoesNotExist:
-            tv_metadata = services.get_media_metadata(
+            tv_metadata = services.get_core_metadata(
                 "tv",
                 self.item.media_id,
                 self.item.source,
@@ -649,7 +725,7 @@ class Season(Media):
             else:
                 status = self.status
 
-            item, _ = Item.objects.get_or_create(
+            item = resolve_item(
                 media_id=self.item.media_id,
                 source="tmdb",
                 media_type="tv",
@@ -673,31 +749,7 @@ class Season(Media):
 
     def get_remaining_eps(self, season_metadata):
         """Return episodes needed to complete a season."""
-        max_episode_number = Episode.objects.filter(related_season=self).aggregate(
-            max_episode_number=Max("item__episode_number"),
-        )["max_episode_number"]
-
-        if max_episode_number is None:
-            max_episode_number = 0
-
-        episodes_to_create = []
-        today = datetime.datetime.now(tz=settings.TZ).date()
-
-        # Create Episode objects for the remaining episodes
-        for episode in reversed(season_metadata["episodes"]):
-            if episode["episode_number"] <= max_episode_number:
-                break
-
-            item = self.get_episode_item(episode["episode_number"], season_metadata)
-
-            episode_db = Episode(
-                related_season=self,
-                item=item,
-                watch_date=today,
-            )
-            episodes_to_create.append(episode_db)
-
-        return episodes_to_create
+        return get_remaining_episodes([(self, season_metadata)])
 
     def get_episode_item(self, episode_number, season_metadata=None):
         """Get the episode item instance, create it if it doesn't exist."""
@@ -709,16 +761,7 @@ class Season(Media):
                 [self.item.season_number],
             )
 
-        image = settings.IMG_NONE
-        for episode in season_metadata["episodes"]:
-            if episode["episode_number"] == episode_number:
-                if episode.get("still_path"):
-                    image = f"http://image.tmdb.org/t/p/original{episode['still_path']}"
-                else:
-                    image = episode["image"]
-                break
-
-        item, _ = Item.objects.get_or_create(
+        return resolve_item(
             media_id=self.item.media_id,
             source=self.item.source,
             media_type="episode",
@@ -726,11 +769,108 @@ class Season(Media):
             episode_number=episode_number,
             defaults={
                 "title": self.item.title,
-                "image": image,
+                "image": get_episode_image(
+                    next(
+                        (
+                            episode
+                            for episode in season_metadata["episodes"]
+                            if episode["episode_number"] == episode_number
+                        ),
+                        {},
+                    ),
+                ),
             },
         )
 
-        return item
+
+def get_remaining_episodes(seasons_metadata):
+    """Return the episodes needed to complete the seasons of a TV show.
+
+    The seasons are (season, season metadata) pairs, the last watched episode
+    of every season is read in one query.
+    """
+    if not seasons_metadata:
+        return []
+
+    max_episode_numbers = dict(
+        Episode.objects.filter(
+            related_season__in=[season for season, _ in seasons_metadata],
+        )
+        .order_by()
+        .values_list("related_season")
+        .annotate(Max("item__episode_number")),
+    )
+    remaining = [
+        (season, episode)
+        for season, season_metadata in seasons_metadata
+        for episode in season_metadata["episodes"]
+        if episode["episode_number"] > max_episode_numbers.get(season.id, 0)
+    ]
+    items = get_episode_items(
+        seasons_metadata[0][0].item,
+        [(season.item.season_number, episode) for season, episode in remaining],
+    )
+
+    today = datetime.datetime.now(tz=settings.TZ).date()
+    return [
+        Episode(
+            related_season=season,
+            item=items[season.item.season_number, episode["episode_number"]],
+            watch_date=today,
+        )
+        for season, episode in remaining
+    ]
+
+
+def get_season_items(show_item, seasons_metadata):
+    """Return the season items of the TV show by season number.
+
+    The seasons metadata is by season number, missing items are created.
+    """
+    items = resolve_items(
+        {
+            get_key(show_item.media_id, show_item.source, "season", season_number): {
+                "title": show_item.title,
+                "image": season_metadata["image"],
+            }
+            for season_number, season_metadata in seasons_metadata.items()
+        },
+    )
+    return {key[3]: item for key, item in items.items()}
+
+
+def get_episode_items(show_item, episodes):
+    """Return the episode items of the TV show by season and episode number.
+
+    The episodes are (season number, episode metadata) pairs, missing items
+    are created.
+    """
+    items = resolve_items(
+        {
+            get_key(
+                show_item.media_id,
+                show_item.source,
+                "episode",
+                season_number,
+                episode["episode_number"],
+            ): {"title": show_item.title, "image": get_episode_image(episode)}
+            for season_number, episode in episodes
+        },
+    )
+    return {key[3:]: item for key, item in items.items()}
+
+
+def is_aired(episode):
+    """Return whether the episode from the season metadata has aired."""
+    today = datetime.datetime.now(tz=settings.TZ).date().isoformat()
+    return bool(episode.get("air_date")) and episode["air_date"] <= today
+
+
+def get_episode_image(episode):
+    """Return the image of the episode from its season metadata."""
+    if episode.get("still_path"):
+        return f"http://image.tmdb.org/t/p/original{episode['still_path']}"
+    return episode.get("image", settings.IMG_NONE)
 
 
 class Episode(models.Model):
@@ -766,34 +906,87 @@ class Episode(models.Model):
     def save(self, *args, **kwargs):
         """Save the episode instance."""
         super().save(*args, **kwargs)
+        update_aggregates([self.related_season_id])
+        self.related_season.refresh_aggregates()
 
         if self.related_season.status in (STATUS_IN_PROGRESS, STATUS_REPEATING):
-            season_number = self.item.season_number
-            tv_with_seasons_metadata = services.get_media_metadata(
-                "tv_with_seasons",
-                self.item.media_id,
-                self.item.source,
-                [season_number],
-            )
-            season_metadata = tv_with_seasons_metadata[f"season/{season_number}"]
-            max_progress = len(season_metadata["episodes"])
-            total_repeats = self.related_season.episodes.aggregate(
-                total_repeats=Sum("repeats"),
-            )["total_repeats"]
-
-            total_watches = self.related_season.progress + total_repeats
+            self.related_season.update_status()
+
+    def delete(self, *args, **kwargs):
+        """Delete the episode and update the aggregates of its season."""
+        deleted = super().delete(*args, **kwargs)
+        update_aggregates([self.related_season_id])
+        return deleted
+
+
+def exclude_aggregates(media, kwargs):
+    """Leave the aggregates out of the update of a saved season or TV show.
+
+    They are only written by update_aggregates, a full save of an instance
+    loaded before its episodes changed would store its old aggregates.
+    """
+    if media._state.adding or kwargs.get("update_fields") is not None:  # noqa: SLF001
+        return
+    kwargs["update_fields"] = [
+        field.name
+        for field in media._meta.concrete_fields  # noqa: SLF001
+        if not field.primary_key and field.name not in AGGREGATE_FIELDS
+    ]
+
+
+def update_aggregates(season_ids):
+    """Store the aggregates of the episodes of the seasons and their TV shows.
+
+    Called after episodes are created, changed or deleted, so the aggregates
+    can be sorted and filtered in SQL.
+    """
+    episodes = (
+        Episode.objects.filter(related_season=OuterRef("pk"))
+        .order_by()
+        .values("related_season")
+    )
+    Season.objects.filter(id__in=season_ids).update(
+        progress=Coalesce(
+            Subquery(episodes.annotate(value=Count("id")).values("value")),
+            0,
+        ),
+        repeats=Coalesce(
+            Subquery(episodes.annotate(value=Max("repeats")).values("value")),
+            0,
+        ),
+        start_date=Subquery(
+            episodes.annotate(value=Min("watch_date")).values("value"),
+        ),
+        end_date=Subquery(
+            episodes.annotate(value=Max("watch_date")).values("value"),
+        ),
+    )
+    update_tv_aggregates(
+        Season.objects.filter(id__in=season_ids).values("related_tv"),
+    )
 
-            if total_watches >= max_progress * (self.related_season.repeats + 1):
-                self.related_season.status = STATUS_COMPLETED
-                self.related_season.save_base(update_fields=["status"])
 
-                last_season = tv_with_seasons_metadata["related"]["seasons"][-1][
-                    "season_number"
-                ]
-                # mark the TV show as completed if it's the last season
-                if season_number == last_season:
-                    self.related_season.related_tv.status = STATUS_COMPLETED
-                    self.related_season.related_tv.save_base(update_fields=["status"])
+def update_tv_aggregates(tv_ids):
+    """Store the aggregates of the seasons of the TV shows."""
+    seasons = (
+        Season.objects.filter(related_tv=OuterRef("pk"))
+        .order_by()
+        .values("related_tv")
+    )
+    TV.objects.filter(id__in=tv_ids).update(
+        progress=Coalesce(
+            Subquery(seasons.annotate(value=Sum("progress")).values("value")),
+            0,
+        ),
+        repeats=Coalesce(
+            Subquery(seasons.annotate(value=Max("repeats")).values("value")),
+            0,
+        ),
+        start_date=Subquery(
+            seasons.annotate(value=Min("start_date")).values("value"),
+        ),
+        end_date=Subquery(seasons.annotate(value=Max("end_date")).values("value")),
+    )
 
 
 class Manga(Media):
@@ -830,3 +1023,142 @@ class Game(Media):
         self.progress -= 30
         self.save()
         logger.info("Unwatched %s E%s", self, self.progress + 1)
+
+
+class LibraryEntry(models.Model):
+    """Model for the index of the media tracked by each user.
+
+    Kept in sync with the media tables by signals, so the media of a user
+    across all types is read with a single indexed query.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="library_entries",
+    )
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="library_entries",
+    )
+    media_type = models.CharField(
+        max_length=10,
+        choices=[
+            (media_type, READABLE_MEDIA_TYPES[media_type])
+            for media_type in LIBRARY_MEDIA_TYPES
+        ],
+    )
+    object_id = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=12)
+    score = models.DecimalField(
+        null=True,
+        blank=True,
+        max_digits=3,
+        decimal_places=1,
+    )
+
+    class Meta:
+        """Meta options for the model."""
+
+        unique_together = ["user", "item"]
+        indexes = [
+            models.Index(fields=["user", "status", "media_type"]),
+            models.Index(fields=["status", "item"]),
+        ]
+
+    def __str__(self):
+        """Return the item and user of the entry."""
+        return f"{self.item} ({self.user})"
+
+
+def index_media(media_list):
+    """Store the library entries of the media, replacing the existing ones."""
+    entries = [
+        LibraryEntry(
+            user_id=media.user_id,
+            item_id=media.item_id,
+            media_type=media._meta.model_name,  # noqa: SLF001
+            object_id=media.id,
+            status=media.status,
+            score=media.score,
+        )
+        for media in media_list
+    ]
+    LibraryEntry.objects.bulk_create(
+        entries,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["user", "item"],
+        update_fields=["media_type", "object_id", "status", "score"],
+    )
+
+
+def sync_library(media_type, user=None):
+    """Rebuild the library entries of the media type from its table.
+
+    Used after media is created without signals or ids, like in the bulk
+    imports, and to backfill or repair the index.
+    """
+    if media_type not in LIBRARY_MEDIA_TYPES:
+        return
+
+    model = apps.get_model(app_label="app", model_name=media_type)
+    media = model.objects.only("id", "user", "item", "status", "score")
+    entries = LibraryEntry.objects.filter(media_type=media_type)
+    if user is not None:
+        media = media.filter(user=user)
+        entries = entries.filter(user=user)
+
+    entries.exclude(object_id__in=media.values("id")).delete()
+    index_media(media.iterator(chunk_size=2000))
+
+
+class MetadataSnapshot(models.Model):
+    """Model for the provider metadata persisted from the cache.
+
+    Read when the metadata is missing from Redis, so an evicted or restarted
+    cache is rebuilt from the database instead of from the providers.
+    """
+
+    source = models.CharField(
+        max_length=20,
+        choices=[(source, source) for source in SOURCES],
+    )
+    media_type = models.CharField(
+        max_length=10,
+        choices=[
+            (media_type, READABLE_MEDIA_TYPES[media_type]) for media_type in MEDIA_TYPES
+        ],
+    )
+    media_id = models.CharField(max_length=20)
+    season_number = models.PositiveIntegerField(null=True, blank=True)
+    data = models.JSONField()
+    fetched_at = models.DateTimeField()
+    validators = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        """Meta options for the model."""
+
+        constraints = [
+            UniqueConstraint(
+                fields=["source", "media_type", "media_id"],
+                condition=Q(season_number__isnull=True),
+                name="unique_snapshot_without_season",
+            ),
+            UniqueConstraint(
+                fields=["source", "media_type", "media_id", "season_number"],
+                condition=Q(season_number__isnull=False),
+                name="unique_snapshot_with_season",
+            ),
+        ]
+        indexes = [models.Index(fields=["media_id"])]
+
+    def __str__(self):
+        """Return the lookup of the snapshot."""
+        return " ".join(str(field) for field in self.lookup if field is not None)
+
+    @property
+    def lookup(self):
+        """Return the fields identifying the metadata of the snapshot."""
+        return (self.source, self.media_type, self.media_id, self.season_number)
@@ -0,0 +1,597 @@
+import builtins
+import contextvars
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from uuid import uuid4
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache as redis_cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import DatabaseError, transaction
+
+from app.providers import metrics
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "yamtrack_provider_cache_invalidation"
+
+# seconds a process holds the lock to fetch a missing key before it expires
+SINGLE_FLIGHT_LEASE = 30
+# seconds other processes wait for that fetch before fetching themselves
+SINGLE_FLIGHT_WAIT = 15
+
+# key prefixes of provider metadata with their source and media type,
+# metadata is served stale after the soft TTL while a background task
+# refreshes it and is persisted in the database to survive Redis evictions
+METADATA_KEY_FAMILIES = {
+    "movie_": ("tmdb", "movie"),
+    "tv_": ("tmdb", "tv"),
+    "season_": ("tmdb", "season"),
+    "mal_anime_": ("mal", "anime"),
+    "mal_manga_": ("mal", "manga"),
+    "mangaupdates_manga_": ("mangaupdates", "manga"),
+    "game_": ("igdb", "game"),
+}
+METADATA_KEY_PREFIXES = tuple(METADATA_KEY_FAMILIES)
+
+# TMDB entries are refreshed when they show up in the change feeds,
+# so they only need the longer soft TTL as a fallback
+TMDB_KEY_PREFIXES = tuple(
+    prefix
+    for prefix, (source, _) in METADATA_KEY_FAMILIES.items()
+    if source == "tmdb"
+)
+
+
+class LocalCache:
+    """Size and TTL bounded LRU cache kept in the memory of the process.
+
+    Values are stored pickled so callers can't modify the cached copy.
+    """
+
+    def __init__(self, max_size, ttl):
+        """Initialize an empty cache."""
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Return the value for the key or None if missing or expired."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return pickle.loads(value)  # noqa: S301 written by this process
+
+    def set(self, key, value, ttl=None):
+        """Store the value, evicting the least recently used entries if full."""
+        if self.max_size <= 0:
+            return
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove the key from the cache."""
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Return the counters of the cache."""
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+# local tier of this process, created on first use so the module can be
+# imported before the settings are configured
+local_cache = None
+local_cache_lock = threading.Lock()
+
+# pid of the process that started the invalidation listener,
+# gunicorn preloads the app so each forked worker has to start its own
+listener_pid = None
+listener_lock = threading.Lock()
+
+# upstream fetches made and avoided by single_flight() in this process
+flight_stats = {"fetches": 0, "coalesced": 0, "timeouts": 0}
+
+# writes buffered by deferred_writes(), None when writing straight through
+pending_writes = contextvars.ContextVar("pending_writes", default=None)
+
+# keys of stale entries read inside track_stale(), None when not tracking
+stale_keys = contextvars.ContextVar("stale_keys", default=None)
+
+# keys reported as missing inside refreshing() so providers fetch them again
+refreshing_keys = contextvars.ContextVar("refreshing_keys", default=frozenset())
+
+# whether Redis misses are read from the database, see without_snapshots()
+snapshot_reads = contextvars.ContextVar("snapshot_reads", default=True)
+
+
+def get_local_cache():
+    """Return the local tier of this process, creating it on first use."""
+    global local_cache  # noqa: PLW0603
+
+    if local_cache is None:
+        with local_cache_lock:
+            if local_cache is None:
+                local_cache = LocalCache(
+                    settings.PROVIDER_CACHE_LOCAL_SIZE,
+                    settings.PROVIDER_CACHE_LOCAL_TTL,
+                )
+    return local_cache
+
+
+def get(key):
+    """Return the cached value from the local tier or Redis."""
+    entry = get_entries([key]).get(key)
+    return None if entry is None else entry["value"]
+
+
+def get_many(keys):
+    """Return a dict with the cached values of the keys found in either tier."""
+    return {key: entry["value"] for key, entry in get_entries(keys).items()}
+
+
+def get_entries(keys):
+    """Return the cache entries of the keys found in either tier.
+
+    Keys missing from the local tier are read from Redis with a single MGET.
+    Keys being refreshed are reported as missing so they are fetched again.
+    """
+    ensure_listener()
+    refreshing = refreshing_keys.get()
+    entries = {}
+    tiers = {}
+    for key in keys:
+        entry = None if key in refreshing else get_local_cache().get(key)
+        if entry is not None:
+            entries[key] = entry
+            tiers[key] = "local"
+
+    missing = [key for key in keys if key not in entries and key not in refreshing]
+    if missing:
+        from_redis = redis_cache.get_many(missing)
+        for key, entry in from_redis.items():
+            get_local_cache().set(key, entry)
+            tiers[key] = "redis"
+        entries.update(from_redis)
+
+    missing = [key for key in missing if key not in entries]
+    if missing and snapshot_reads.get():
+        from_database = read_snapshots(missing)
+        tiers.update(dict.fromkeys(from_database, "database"))
+        entries.update(from_database)
+
+    for key in keys:
+        metrics.increment(
+            "yamtrack_cache_requests_total",
+            family=metrics.key_family(key),
+            result=tiers.get(key, "refresh" if key in refreshing else "miss"),
+        )
+
+    record_stale(entries)
+    return entries
+
+
+def peek(key):
+    """Return the entry of the key in either tier, even while it's refreshed.
+
+    Used to revalidate the entry with the provider instead of fetching it.
+    """
+    entry = get_local_cache().get(key)
+    if entry is None:
+        entry = redis_cache.get(key)
+    return entry
+
+
+def set(key, value, timeout=DEFAULT_TIMEOUT, validators=None):  # noqa: A001
+    """Store the value in both tiers and invalidate it in other workers.
+
+    Metadata stored with the default timeout becomes stale after the soft TTL
+    and is kept until the hard TTL, other values expire after the timeout.
+    Validators of the response (ETag, Last-Modified) are kept with the value
+    for conditional requests.
+    """
+    now = time.time()
+    entry = {
+        "value": value,
+        "fetched_at": now,
+        "stale_at": None,
+        "validators": validators,
+    }
+
+    if timeout is DEFAULT_TIMEOUT and key.startswith(METADATA_KEY_PREFIXES):
+        entry["stale_at"] = now + get_soft_ttl(key)
+        timeout = settings.PROVIDER_CACHE_HARD_TTL
+
+    get_local_cache().set(key, entry, None if timeout is DEFAULT_TIMEOUT else timeout)
+
+    writes = pending_writes.get()
+    if writes is not None:
+        writes[key] = (entry, timeout)
+        return
+
+    redis_cache.set(key, entry, timeout)
+    publish_invalidation(key)
+    write_snapshots({key: entry})
+
+
+def get_soft_ttl(key):
+    """Return the seconds the metadata of the key is served before it's stale."""
+    if key.startswith(TMDB_KEY_PREFIXES):
+        return settings.PROVIDER_CACHE_TMDB_SOFT_TTL
+    return settings.PROVIDER_CACHE_SOFT_TTL
+
+
+def add(key, value, timeout):
+    """Store the value in Redis only if the key is missing, for shared locks."""
+    return redis_cache.add(key, value, timeout)
+
+
+def set_many(mapping, timeout=DEFAULT_TIMEOUT):
+    """Store many values with a single pipelined MSET."""
+    with deferred_writes():
+        for key, value in mapping.items():
+            set(key, value, timeout)
+
+
+@contextmanager
+def deferred_writes():
+    """Buffer the writes made inside the block and flush them together.
+
+    The buffer is shared with threads started with a copy of the context,
+    so writes made while fetching in parallel end up in the same MSET.
+    """
+    if pending_writes.get() is not None:
+        # already buffering, the outermost block flushes
+        yield
+        return
+
+    writes = {}
+    token = pending_writes.set(writes)
+    try:
+        yield
+    finally:
+        pending_writes.reset(token)
+        flush_writes(writes)
+
+
+def flush_writes(writes):
+    """Write buffered values to Redis, one MSET per timeout."""
+    by_timeout = defaultdict(dict)
+    for key, (entry, timeout) in writes.items():
+        by_timeout[timeout][key] = entry
+
+    for timeout, mapping in by_timeout.items():
+        redis_cache.set_many(mapping, timeout)
+
+    if writes:
+        publish_invalidation(*writes)
+        write_snapshots({key: entry for key, (entry, _) in writes.items()})
+
+
+def is_stale(entry):
+    """Return whether the entry is past its soft TTL."""
+    return entry["stale_at"] is not None and entry["stale_at"] <= time.time()
+
+
+def record_stale(entries):
+    """Add the stale entries to the keys collected by track_stale()."""
+    collected = stale_keys.get()
+    if collected is not None:
+        collected.update(key for key, entry in entries.items() if is_stale(entry))
+
+
+@contextmanager
+def track_stale():
+    """Collect the keys of the stale entries read inside the block."""
+    collected = builtins.set()  # set is shadowed by this module's set()
+    token = stale_keys.set(collected)
+    try:
+        yield collected
+    finally:
+        stale_keys.reset(token)
+
+
+@contextmanager
+def refreshing(keys):
+    """Treat the keys as missing inside the block so they are fetched again."""
+    token = refreshing_keys.set(refreshing_keys.get() | frozenset(keys))
+    try:
+        yield
+    finally:
+        refreshing_keys.reset(token)
+
+
+@contextmanager
+def single_flight(key):
+    """Let a single process at a time fetch a missing key.
+
+    Other processes missing the same key wait until the lock is released and
+    should read the key again inside the block, where it's usually already
+    filled by the process that held the lock. If the wait is over, the block
+    runs anyway so a stuck process can't block the others.
+    """
+    lock_key = f"lock_{key}"
+    token = uuid4().hex
+    deadline = time.monotonic() + SINGLE_FLIGHT_WAIT
+    waited = False
+
+    acquired = redis_cache.add(lock_key, token, SINGLE_FLIGHT_LEASE)
+    while not acquired and time.monotonic() < deadline:
+        waited = True
+        time.sleep(0.1)
+        acquired = redis_cache.add(lock_key, token, SINGLE_FLIGHT_LEASE)
+
+    if not acquired:
+        result = "timeouts"
+        logger.warning("Timed out waiting for another process to fetch %s", key)
+    elif waited and get_entries([key]):
+        result = "coalesced"
+        logger.debug("Fetch of %s coalesced with another process", key)
+    else:
+        result = "fetches"
+
+    flight_stats[result] += 1
+    metrics.increment(
+        "yamtrack_cache_fetches_total",
+        family=metrics.key_family(key),
+        result=result,
+    )
+
+    try:
+        yield
+    finally:
+        if acquired and redis_cache.get(lock_key) == token:
+            redis_cache.delete(lock_key)
+
+
+def delete(key):
+    """Remove the value from both tiers and from other workers."""
+    redis_cache.delete(key)
+    get_local_cache().delete(key)
+    publish_invalidation(key)
+
+    lookup = parse_metadata_key(key)
+    if lookup is not None:
+        get_snapshot_model().objects.filter(**lookup).delete()
+
+
+def parse_metadata_key(key):
+    """Return the snapshot fields of a metadata key, None for other keys."""
+    for prefix, (source, media_type) in METADATA_KEY_FAMILIES.items():
+        if key.startswith(prefix):
+            media_id = key.removeprefix(prefix)
+            season_number = None
+            if media_type == "season":
+                media_id, season_number = media_id.rsplit("_", 1)
+                season_number = int(season_number)
+            return {
+                "source": source,
+                "media_type": media_type,
+                "media_id": media_id,
+                "season_number": season_number,
+            }
+    return None
+
+
+def get_snapshot_model():
+    """Return the MetadataSnapshot model, app.models imports the providers."""
+    return apps.get_model("app", "MetadataSnapshot")
+
+
+def read_snapshots(keys):
+    """Return the entries of the metadata keys persisted in the database.
+
+    Found entries are copied back to both tiers, so a cold Redis is rebuilt
+    from the database instead of from the providers.
+    """
+    lookups = {}
+    for key in keys:
+        lookup = parse_metadata_key(key)
+        if lookup is not None:
+            lookups[tuple(lookup.values())] = key
+    if not lookups:
+        return {}
+
+    snapshots = get_snapshot_model().objects.filter(
+        media_id__in={lookup[2] for lookup in lookups},
+    )
+    entries = {}
+    try:
+        for snapshot in snapshots:
+            key = lookups.get(snapshot.lookup)
+            if key is not None:
+                fetched_at = snapshot.fetched_at.timestamp()
+                entries[key] = {
+                    "value": snapshot.data,
+                    "fetched_at": fetched_at,
+                    "stale_at": fetched_at + get_soft_ttl(key),
+                    "validators": snapshot.validators,
+                }
+    except DatabaseError:
+        logger.exception("Could not read metadata snapshots")
+        return {}
+
+    if entries:
+        redis_cache.set_many(entries, settings.PROVIDER_CACHE_HARD_TTL)
+        for key, entry in entries.items():
+            get_local_cache().set(key, entry)
+    return entries
+
+
+def write_snapshots(entries):
+    """Persist the metadata entries so they survive Redis evictions."""
+    rows = {}
+    for key, entry in entries.items():
+        lookup = parse_metadata_key(key)
+        if lookup is not None:
+            rows[tuple(lookup.values())] = {
+                **lookup,
+                "data": entry["value"],
+                "fetched_at": datetime.fromtimestamp(entry["fetched_at"], tz=UTC),
+                "validators": entry.get("validators"),
+            }
+    if not rows:
+        return
+
+    snapshot_model = get_snapshot_model()
+    try:
+        # savepoint, so a failed write doesn't break the caller's transaction
+        with transaction.atomic():
+            existing = snapshot_model.objects.filter(
+                media_id__in={lookup[2] for lookup in rows},
+            )
+            to_update = []
+            for snapshot in existing:
+                row = rows.pop(snapshot.lookup, None)
+                if row is not None:
+                    snapshot.data = row["data"]
+                    snapshot.fetched_at = row["fetched_at"]
+                    snapshot.validators = row["validators"]
+                    to_update.append(snapshot)
+
+            snapshot_model.objects.bulk_update(
+                to_update,
+                ["data", "fetched_at", "validators"],
+            )
+            snapshot_model.objects.bulk_create(
+                [snapshot_model(**row) for row in rows.values()],
+                ignore_conflicts=True,
+            )
+    except DatabaseError:
+        # Redis still has the entries, the snapshot is written on the next fetch
+        logger.exception("Could not write metadata snapshots")
+
+
+@contextmanager
+def without_snapshots():
+    """Skip reading the database on Redis misses inside the block.
+
+    Used by worker threads, which would otherwise each open a connection to
+    read keys that the calling thread already looked up.
+    """
+    token = snapshot_reads.set(False)
+    try:
+        yield
+    finally:
+        snapshot_reads.reset(token)
+
+
+def stats():
+    """Return the counters of the local tier and of the coalesced fetches."""
+    return {**get_local_cache().stats(), **flight_stats}
+
+
+def get_redis_client():
+    """Return the Redis client used by the default cache."""
+    return redis_cache._cache.get_client(write=True)  # noqa: SLF001
+
+
+def publish_invalidation(*keys):
+    """Tell the other processes to drop their local copy of the keys."""
+    if get_local_cache().max_size <= 0:
+        return
+
+    try:
+        pipeline = get_redis_client().pipeline(transaction=False)
+        for key in keys:
+            pipeline.publish(INVALIDATION_CHANNEL, f"{os.getpid()}:{key}")
+        pipeline.execute()
+    except Exception:
+        # entries expire from the local tier anyway, don't fail the request
+        logger.exception("Could not publish cache invalidation for %s", keys)
+
+
+def handle_invalidation(message):
+    """Drop the local copy of a key refreshed by another process."""
+    data = message["data"]
+    if isinstance(data, bytes):
+        data = data.decode()
+
+    pid, key = data.split(":", 1)
+    if pid != str(os.getpid()):
+        get_local_cache().delete(key)
+
+
+def ensure_listener():
+    """Subscribe this process to invalidations from the other processes."""
+    global listener_pid  # noqa: PLW0603
+
+    if (
+        listener_pid == os.getpid()
+        or get_local_cache().max_size <= 0
+        or not settings.PROVIDER_CACHE_INVALIDATIONS
+    ):
+        return
+
+    with listener_lock:
+        if listener_pid == os.getpid():
+            return
+
+        # entries copied from the parent process missed its invalidations
+        get_local_cache().clear()
+        listener_pid = os.getpid()
+
+        try:
+            pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{INVALIDATION_CHANNEL: handle_invalidation})
+            pubsub.run_in_thread(
+                sleep_time=1,
+                daemon=True,
+                exception_handler=handle_listener_error,
+            )
+        except Exception:
+            logger.exception("Could not subscribe to provider cache invalidations")
+
+
+def handle_listener_error(error, pubsub, thread):  # noqa: ARG001
+    """Log a lost invalidation subscription and back off before resubscribing."""
+    logger.warning("Provider cache invalidation listener error: %s", error)
+    time.sleep(5)
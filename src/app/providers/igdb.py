@@ -1,12 +1,28 @@
 from datetime import datetime
 
 from django.conf import settings
-from django.core.cache import cache
 
-from app.providers import services
+from app.providers import cache, search_index, services
 
 base_url = "https://api.igdb.com/v4"
 
+game_fields = (
+    "fields name,cover.image_id,summary,category,first_release_date,"
+    "genres.name,themes.name,platforms.name,involved_companies.company.name,"
+    "parent_game.name,parent_game.cover.image_id,"
+    "remasters.name,remasters.cover.image_id,"
+    "remakes.name,remakes.cover.image_id,"
+    "expansions.name,expansions.cover.image_id,"
+    "standalone_expansions.name,standalone_expansions.cover.image_id,"
+    "expanded_games.name,expanded_games.cover.image_id,"
+    "similar_games.name,similar_games.cover.image_id;"
+)
+
+# games per query and queries per /multiquery request when fetching in bulk,
+# 10 queries is the maximum allowed by IGDB
+GAMES_PER_QUERY = 100
+QUERIES_PER_REQUEST = 10
+
 
 def get_access_token():
     """Return the access token for the IGDB API."""
@@ -30,7 +46,8 @@ def get_access_token():
 
 def search(query):
     """Search for games on IGDB."""
-    data = cache.get(f"search_games_{query}")
+    key = search_index.get_search_key("games", query)
+    data = cache.get(key)
     if data is None:
         access_token = get_access_token()
         url = f"{base_url}/games"
@@ -61,7 +78,7 @@ def search(query):
             }
             for media in response
         ]
-        cache.set(f"search_games_{query}", data)
+        cache.set(key, data)
     return data
 
 
@@ -69,58 +86,113 @@ def game(media_id):
     """Return the metadata for the selected game from IGDB."""
     data = cache.get(f"game_{media_id}")
     if data is None:
-        access_token = get_access_token()
-        url = f"{base_url}/games"
-        data = (
-            "fields name,cover.image_id,summary,category,first_release_date,"
-            "genres.name,themes.name,platforms.name,involved_companies.company.name,"
-            "parent_game.name,parent_game.cover.image_id,"
-            "remasters.name,remasters.cover.image_id,"
-            "remakes.name,remakes.cover.image_id,"
-            "expansions.name,expansions.cover.image_id,"
-            "standalone_expansions.name,standalone_expansions.cover.image_id,"
-            "expanded_games.name,expanded_games.cover.image_id,"
-            "similar_games.name,similar_games.cover.image_id;"
-            f"where id = {media_id};"
-        )
-        headers = {
-            "Client-ID": settings.IGDB_ID,
-            "Authorization": f"Bearer {access_token}",
-        }
-        response = services.api_request("IGDB", "POST", url, data=data, headers=headers)
-        response = response[0]  # response is a list with a single element
-        data = {
-            "media_id": response["id"],
-            "source": "igdb",
-            "media_type": "game",
-            "title": response["name"],
-            "max_progress": None,
-            "image": get_image_url(response),
-            "synopsis": response["summary"],
-            "details": {
-                "format": get_category(response["category"]),
-                "release_date": get_start_date(response),
-                "genres": get_str_list(response, "genres"),
-                "themes": get_str_list(response, "themes"),
-                "platforms": get_str_list(response, "platforms"),
-                "companies": get_companies(response),
-            },
-            "related": {
-                "parent_game": get_parent(response.get("parent_game")),
-                "remasters": get_related(response.get("remasters")),
-                "remakes": get_related(response.get("remakes")),
-                "expansions": get_related(response.get("expansions")),
-                "standalone_expansions": get_related(
-                    response.get("standalone_expansions"),
-                ),
-                "expanded_games": get_related(response.get("expanded_games")),
-                "recommendations": get_related(response.get("similar_games")),
-            },
+        with cache.single_flight(f"game_{media_id}"):
+            # another process may have fetched it while waiting for the lock
+            data = cache.get(f"game_{media_id}")
+            if data is None:
+                access_token = get_access_token()
+                url = f"{base_url}/games"
+                data = f"{game_fields}where id = {media_id};"
+                headers = {
+                    "Client-ID": settings.IGDB_ID,
+                    "Authorization": f"Bearer {access_token}",
+                }
+                response = services.api_request(
+                    "IGDB",
+                    "POST",
+                    url,
+                    data=data,
+                    headers=headers,
+                )
+                # response is a list with a single element
+                data = process_game(response[0])
+                cache.set(f"game_{media_id}", data)
+    return data
+
+
+def games(media_ids):
+    """Return the metadata for many games from IGDB, keyed by their id.
+
+    Uncached games are fetched with /multiquery, each query filtering up to
+    GAMES_PER_QUERY ids, and stored in the game_{id} entries read by game().
+    Games not found on IGDB are left out.
+    """
+    keys = {int(media_id): f"game_{media_id}" for media_id in media_ids}
+    cached = cache.get_many(list(keys.values()))
+    data = {media_id: cached[key] for media_id, key in keys.items() if key in cached}
+    missing = [media_id for media_id in keys if media_id not in data]
+
+    batch_size = GAMES_PER_QUERY * QUERIES_PER_REQUEST
+    for start in range(0, len(missing), batch_size):
+        fetched = {
+            response["id"]: process_game(response)
+            for response in multiquery_games(missing[start : start + batch_size])
         }
-        cache.set(f"game_{media_id}", data)
+        cache.set_many({keys[media_id]: value for media_id, value in fetched.items()})
+        data.update(fetched)
+
     return data
 
 
+def multiquery_games(media_ids):
+    """Return the responses of the games fetched with a single /multiquery."""
+    access_token = get_access_token()
+    url = f"{base_url}/multiquery"
+    queries = []
+    for start in range(0, len(media_ids), GAMES_PER_QUERY):
+        query_ids = media_ids[start : start + GAMES_PER_QUERY]
+        ids = ",".join(str(media_id) for media_id in query_ids)
+        queries.append(
+            f'query games "games_{start}" {{'
+            f"{game_fields}where id = ({ids});limit {GAMES_PER_QUERY};"
+            "};",
+        )
+    headers = {
+        "Client-ID": settings.IGDB_ID,
+        "Authorization": f"Bearer {access_token}",
+    }
+    response = services.api_request(
+        "IGDB",
+        "POST",
+        url,
+        data="".join(queries),
+        headers=headers,
+    )
+    return [game for query in response for game in query["result"]]
+
+
+def process_game(response):
+    """Process the metadata for the selected game from IGDB."""
+    return {
+        "media_id": response["id"],
+        "source": "igdb",
+        "media_type": "game",
+        "title": response["name"],
+        "max_progress": None,
+        "image": get_image_url(response),
+        "synopsis": response["summary"],
+        "details": {
+            "format": get_category(response["category"]),
+            "release_date": get_start_date(response),
+            "genres": get_str_list(response, "genres"),
+            "themes": get_str_list(response, "themes"),
+            "platforms": get_str_list(response, "platforms"),
+            "companies": get_companies(response),
+        },
+        "related": {
+            "parent_game": get_parent(response.get("parent_game")),
+            "remasters": get_related(response.get("remasters")),
+            "remakes": get_related(response.get("remakes")),
+            "expansions": get_related(response.get("expansions")),
+            "standalone_expansions": get_related(
+                response.get("standalone_expansions"),
+            ),
+            "expanded_games": get_related(response.get("expanded_games")),
+            "recommendations": get_related(response.get("similar_games")),
+        },
+    }
+
+
 def get_image_url(response):
     """Return the image URL for the media."""
     # when no image, cover is not present in the response
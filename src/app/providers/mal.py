@@ -3,17 +3,18 @@ from zoneinfo import ZoneInfo
 
 import requests
 from django.conf import settings
-from django.core.cache import cache
 
-from app.providers import services
+from app.providers import cache, search_index, services
 
 base_url = "https://api.myanimelist.net/v2"
 base_fields = "title,main_picture,media_type,start_date,end_date,synopsis,status,genres,recommendations"  # noqa: E501
+core_fields = "title,main_picture,media_type,start_date,end_date,status"
 
 
 def search(media_type, query):
     """Search for media on MyAnimeList."""
-    data = cache.get(f"search_mal_{media_type}_{query}")
+    key = search_index.get_search_key(f"mal_{media_type}", query)
+    data = cache.get(key)
 
     if data is None:
         url = f"{base_url}/{media_type}"
@@ -50,7 +51,7 @@ def search(media_type, query):
             for media in response
         ]
 
-        cache.set(f"search_mal_{media_type}_{query}", data)
+        cache.set(key, data)
 
     return data
 
@@ -60,98 +61,190 @@ def anime(media_id):
     data = cache.get(f"mal_anime_{media_id}")
 
     if data is None:
-        url = f"{base_url}/anime/{media_id}"
-        params = {
-            "fields": f"{base_fields},num_episodes,average_episode_duration,studios,start_season,broadcast,source,related_anime",  # noqa: E501
-        }
-        response = services.api_request(
-            "MAL",
-            "GET",
-            url,
-            params=params,
-            headers={"X-MAL-CLIENT-ID": settings.MAL_API},
-        )
-
-        num_episodes = get_number_of_episodes(response)
-
-        data = {
-            "media_id": media_id,
-            "source": "mal",
-            "media_type": "anime",
-            "title": response["title"],
-            "max_progress": num_episodes,
-            "image": get_image_url(response),
-            "synopsis": get_synopsis(response),
-            "details": {
-                "format": get_format(response),
-                "start_date": response.get("start_date"),
-                "end_date": response.get("end_date"),
-                "status": get_readable_status(response),
-                "number_of_episodes": num_episodes,
-                "runtime": get_runtime(response),
-                "studios": get_studios(response),
-                "season": get_season(response),
-                "broadcast": get_broadcast(response),
-                "source": get_source(response),
-                "genres": get_genres(response),
-            },
-            "related": {
-                "related_anime": get_related(response.get("related_anime")),
-                "recommendations": get_related(response.get("recommendations")),
-            },
-        }
-
-        cache.set(f"mal_anime_{media_id}", data)
+        with cache.single_flight(f"mal_anime_{media_id}"):
+            # another process may have fetched it while waiting for the lock
+            data = cache.get(f"mal_anime_{media_id}")
+
+            if data is None:
+                url = f"{base_url}/anime/{media_id}"
+                params = {
+                    "fields": f"{base_fields},num_episodes,average_episode_duration,studios,start_season,broadcast,source,related_anime",  # noqa: E501
+                }
+                response = services.api_request(
+                    "MAL",
+                    "GET",
+                    url,
+                    params=params,
+                    headers={"X-MAL-CLIENT-ID": settings.MAL_API},
+                )
+                data = process_anime(response, media_id)
+                cache.set(f"mal_anime_{media_id}", data)
 
     return data
 
 
+def process_anime(response, media_id):
+    """Process the metadata for the selected anime from MyAnimeList."""
+    num_episodes = get_number_of_episodes(response)
+
+    return {
+        "media_id": media_id,
+        "source": "mal",
+        "media_type": "anime",
+        "title": response["title"],
+        "max_progress": num_episodes,
+        "image": get_image_url(response),
+        "synopsis": get_synopsis(response),
+        "details": {
+            "format": get_format(response),
+            "start_date": response.get("start_date"),
+            "end_date": response.get("end_date"),
+            "status": get_readable_status(response),
+            "number_of_episodes": num_episodes,
+            "runtime": get_runtime(response),
+            "studios": get_studios(response),
+            "season": get_season(response),
+            "broadcast": get_broadcast(response),
+            "source": get_source(response),
+            "genres": get_genres(response),
+        },
+        "related": {
+            "related_anime": get_related(response.get("related_anime")),
+            "recommendations": get_related(response.get("recommendations")),
+        },
+    }
+
+
+def anime_core(media_id):
+    """Return the core metadata for the selected anime from MyAnimeList."""
+    return services.get_cached_core(
+        f"mal_anime_{media_id}",
+        lambda: process_anime_core(
+            services.api_request(
+                "MAL",
+                "GET",
+                f"{base_url}/anime/{media_id}",
+                params={"fields": f"{core_fields},num_episodes"},
+                headers={"X-MAL-CLIENT-ID": settings.MAL_API},
+            ),
+            media_id,
+        ),
+    )
+
+
+def process_anime_core(response, media_id):
+    """Process the core metadata for the selected anime, see process_anime."""
+    num_episodes = get_number_of_episodes(response)
+
+    return {
+        "media_id": media_id,
+        "source": "mal",
+        "media_type": "anime",
+        "title": response["title"],
+        "max_progress": num_episodes,
+        "image": get_image_url(response),
+        "details": {
+            "format": get_format(response),
+            "start_date": response.get("start_date"),
+            "end_date": response.get("end_date"),
+            "status": get_readable_status(response),
+            "number_of_episodes": num_episodes,
+        },
+    }
+
+
 def manga(media_id):
     """Return the metadata for the selected anime or manga from MyAnimeList."""
     data = cache.get(f"mal_manga_{media_id}")
 
     if data is None:
-        url = f"{base_url}/manga/{media_id}"
-        params = {
-            "fields": f"{base_fields},num_chapters,related_manga,recommendations",
-        }
-        response = services.api_request(
-            "MAL",
-            "GET",
-            url,
-            params=params,
-            headers={"X-MAL-CLIENT-ID": settings.MAL_API},
-        )
-
-        num_chapters = get_number_of_episodes(response)
-
-        data = {
-            "media_id": media_id,
-            "source": "mal",
-            "media_type": "manga",
-            "title": response["title"],
-            "image": get_image_url(response),
-            "synopsis": get_synopsis(response),
-            "max_progress": num_chapters,
-            "details": {
-                "format": get_format(response),
-                "start_date": response.get("start_date"),
-                "end_date": response.get("end_date"),
-                "status": get_readable_status(response),
-                "number_of_chapters": num_chapters,
-                "genres": get_genres(response),
-            },
-            "related": {
-                "related_manga": get_related(response.get("related_manga")),
-                "recommendations": get_related(response.get("recommendations")),
-            },
-        }
-
-        cache.set(f"mal_manga_{media_id}", data)
+        with cache.single_flight(f"mal_manga_{media_id}"):
+            # another process may have fetched it while waiting for the lock
+            data = cache.get(f"mal_manga_{media_id}")
+
+            if data is None:
+                url = f"{base_url}/manga/{media_id}"
+                params = {
+                    "fields": f"{base_fields},num_chapters,related_manga,recommendations",  # noqa: E501
+                }
+                response = services.api_request(
+                    "MAL",
+                    "GET",
+                    url,
+                    params=params,
+                    headers={"X-MAL-CLIENT-ID": settings.MAL_API},
+                )
+                data = process_manga(response, media_id)
+                cache.set(f"mal_manga_{media_id}", data)
 
     return data
 
 
+def process_manga(response, media_id):
+    """Process the metadata for the selected manga from MyAnimeList."""
+    num_chapters = get_number_of_episodes(response)
+
+    return {
+        "media_id": media_id,
+        "source": "mal",
+        "media_type": "manga",
+        "title": response["title"],
+        "image": get_image_url(response),
+        "synopsis": get_synopsis(response),
+        "max_progress": num_chapters,
+        "details": {
+            "format": get_format(response),
+            "start_date": response.get("start_date"),
+            "end_date": response.get("end_date"),
+            "status": get_readable_status(response),
+            "number_of_chapters": num_chapters,
+            "genres": get_genres(response),
+        },
+        "related": {
+            "related_manga": get_related(response.get("related_manga")),
+            "recommendations": get_related(response.get("recommendations")),
+        },
+    }
+
+
+def manga_core(media_id):
+    """Return the core metadata for the selected manga from MyAnimeList."""
+    return services.get_cached_core(
+        f"mal_manga_{media_id}",
+        lambda: process_manga_core(
+            services.api_request(
+                "MAL",
+                "GET",
+                f"{base_url}/manga/{media_id}",
+                params={"fields": f"{core_fields},num_chapters"},
+                headers={"X-MAL-CLIENT-ID": settings.MAL_API},
+            ),
+            media_id,
+        ),
+    )
+
+
+def process_manga_core(response, media_id):
+    """Process the core metadata for the selected manga, see process_manga."""
+    num_chapters = get_number_of_episodes(response)
+
+    return {
+        "media_id": media_id,
+        "source": "mal",
+        "media_type": "manga",
+        "title": response["title"],
+        "image": get_image_url(response),
+        "max_progress": num_chapters,
+        "details": {
+            "format": get_format(response),
+            "start_date": response.get("start_date"),
+            "end_date": response.get("end_date"),
+            "status": get_readable_status(response),
+            "number_of_chapters": num_chapters,
+        },
+    }
+
+
 def get_format(response):
     """Return the original type of the media."""
     media_format = response["media_type"]
@@ -1,19 +1,42 @@
 import asyncio
+import atexit
+import logging
+import os
 import re
+import threading
+import time
+from urllib.parse import urlparse
 
 import aiohttp
 import requests
 from django.conf import settings
-from django.core.cache import cache
 
-from app.providers import services
+from app.providers import cache, metrics, ratelimit, search_index, services
+
+logger = logging.getLogger(__name__)
 
 base_url = "https://api.mangaupdates.com/v1"
 
+# requests for the related series of a manga running at once
+SERIES_CONCURRENCY = 8
+
+# seconds web requests wait for the images of the related series, the
+# series not fetched by then are shown with the placeholder image
+SERIES_IMAGES_TIMEOUT = 3
+
+# event loop thread with the pooled session of this process, gunicorn
+# preloads the app so each forked worker has to start its own
+client_pid = None
+client_loop = None
+client_lock = threading.Lock()
+client_session = None
+client_semaphore = None
+
 
 def search(query):
     """Search for media on MangaUpdates."""
-    data = cache.get(f"search_mangaupdates_{query}")
+    key = search_index.get_search_key("mangaupdates", query)
+    data = cache.get(key)
 
     if data is None:
         url = f"{base_url}/series/search"
@@ -48,57 +71,74 @@ def search(query):
             for media in response
         ]
 
-        cache.set(f"search_mangaupdates_{query}", data)
+        cache.set(key, data)
 
     return data
 
 
 def manga(media_id):
     """Get metadata for a manga from MangaUpdates."""
-    return asyncio.run(async_manga(media_id))
-
-
-async def async_manga(media_id):
-    """Asynchronous implementation of manga metadata retrieval."""
     data = cache.get(f"mangaupdates_manga_{media_id}")
 
     if data is None:
-        url = f"{base_url}/series/{media_id}"
-        response = services.api_request("MANGAUPDATES", "GET", url)
+        with cache.single_flight(f"mangaupdates_manga_{media_id}"):
+            # another process may have fetched it while waiting for the lock
+            data = cache.get(f"mangaupdates_manga_{media_id}")
 
-        # Run related_manga and recommendations concurrently
-        related_task = asyncio.create_task(
-            get_related_series(response["related_series"]),
-        )
-        recommendations_task = asyncio.create_task(
-            get_recommendations(response["recommendations"]),
-        )
+            if data is None:
+                data, complete = fetch_manga(media_id)
+                # placeholders of timed out images would be cached until the
+                # entry is stale, the fetched images are cached on their own
+                if complete:
+                    cache.set(f"mangaupdates_manga_{media_id}", data)
 
-        data = {
-            "media_id": media_id,
-            "source": "mangaupdates",
-            "media_type": "manga",
-            "title": response["title"],
-            "image": get_image_url(response),
-            "synopsis": response["description"],
-            "max_progress": get_max_progress(response),
-            "details": {
-                "format": response["type"],
-                "authors": get_authors(response["authors"]),
-                "year": response["year"],
-                "status_in_country_of_origin": get_status(response["status"]),
-                "latest_chapter_translated": response["latest_chapter"],
-                "genres": get_genres(response["genres"]),
-            },
-            "related": {
-                "related_manga": await related_task,
-                "recommendations": await recommendations_task,
-            },
-        }
+    return data
 
-        cache.set(f"mangaupdates_manga_{media_id}", data)
 
-    return data
+def fetch_manga(media_id):
+    """Fetch the metadata of the manga with the images of its related series.
+
+    Return the metadata and whether every image of the series was fetched.
+    """
+    url = f"{base_url}/series/{media_id}"
+    response = services.api_request("MANGAUPDATES", "GET", url)
+
+    related = [
+        (item["related_series_id"], item["related_series_name"])
+        for item in response["related_series"]
+        if item["related_series_name"]
+    ]
+    recommendations = [
+        (item["series_id"], item["series_name"])
+        for item in response["recommendations"]
+        if item["series_name"]
+    ]
+    images, complete = get_series_images(
+        [series_id for series_id, _ in related + recommendations],
+    )
+
+    data = {
+        "media_id": media_id,
+        "source": "mangaupdates",
+        "media_type": "manga",
+        "title": response["title"],
+        "image": get_image_url(response),
+        "synopsis": response["description"],
+        "max_progress": get_max_progress(response),
+        "details": {
+            "format": response["type"],
+            "authors": get_authors(response["authors"]),
+            "year": response["year"],
+            "status_in_country_of_origin": get_status(response["status"]),
+            "latest_chapter_translated": response["latest_chapter"],
+            "genres": get_genres(response["genres"]),
+        },
+        "related": {
+            "related_manga": get_related(related, images),
+            "recommendations": get_related(recommendations, images),
+        },
+    }
+    return data, complete
 
 
 def get_image_url(response):
@@ -135,43 +175,162 @@ def get_status(status):
     return status
 
 
-async def get_related_series(related):
-    """Return list of related media for the selected media asynchronously."""
-    async with aiohttp.ClientSession() as session:
-        tasks = [
-            fetch_series_data(
-                session,
-                f"{base_url}/series/{item['related_series_id']}",
-                item,
-            )
-            for item in related
-            if item["related_series_name"]
-        ]
-        results = await asyncio.gather(*tasks)
-    return [item for item in results if item is not None]
-
-
-async def get_recommendations(recommendations):
-    """Return list of recommended media for the selected media asynchronously."""
-    async with aiohttp.ClientSession() as session:
-        tasks = [
-            fetch_series_data(session, f"{base_url}/series/{item['series_id']}", item)
-            for item in recommendations
-            if item["series_name"]
-        ]
-        results = await asyncio.gather(*tasks)
-    return [item for item in results if item is not None]
-
-
-async def fetch_series_data(session, url, item):
-    """Fetch series data asynchronously."""
-    async with session.get(url) as response:
-        if response.status == requests.codes.ok:
-            data = await response.json()
-            image = get_image_url(data)
-            return {
-                "media_id": item.get("related_series_id") or item.get("series_id"),
-                "title": item.get("related_series_name") or item.get("series_name"),
-                "image": image,
-            }
-    return None
+def get_related(series, images):
+    """Return the related series that have their image, as in search results."""
+    return [
+        {"media_id": series_id, "title": title, "image": images[series_id]}
+        for series_id, title in series
+        if series_id in images
+    ]
+
+
+def get_series_images(series_ids):
+    """Return the image URLs of the series, fetching the uncached ones.
+
+    Also return whether all of them were fetched, the series not fetched
+    before the timeout get the placeholder image.
+    """
+    keys = {
+        series_id: f"mangaupdates_series_thumb_{series_id}" for series_id in series_ids
+    }
+    cached = cache.get_many(list(keys.values()))
+    images = {
+        series_id: cached[key] for series_id, key in keys.items() if key in cached
+    }
+
+    missing = list(dict.fromkeys(key for key in series_ids if key not in images))
+    complete = True
+    if missing:
+        lane = services.get_lane()
+        # filled as the images arrive, so a timeout keeps the fetched ones
+        results = {}
+        future = asyncio.run_coroutine_threadsafe(
+            fetch_series_images(missing, lane, results),
+            get_client_loop(),
+        )
+        timeout = (
+            SERIES_IMAGES_TIMEOUT if lane == "interactive" else settings.REQUEST_TIMEOUT
+        )
+        try:
+            future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            logger.warning("Timed out fetching the images of series %s", missing)
+        except Exception:
+            # the images are optional, don't fail the page of the manga
+            logger.exception("Could not fetch the images of series %s", missing)
+
+        fetched = {
+            series_id: image
+            for series_id, image in dict(results).items()
+            if image is not None
+        }
+        cache.set_many({keys[series_id]: image for series_id, image in fetched.items()})
+        images.update(fetched)
+        timed_out = [series_id for series_id in missing if series_id not in results]
+        images.update(dict.fromkeys(timed_out, settings.IMG_NONE))
+        complete = not timed_out
+
+    return images, complete
+
+
+def get_client_loop():
+    """Return the event loop of the pooled client, starting it if needed."""
+    global client_pid, client_loop, client_session  # noqa: PLW0603
+
+    with client_lock:
+        if client_pid != os.getpid():
+            # a session inherited from the parent process is bound to its loop
+            client_session = None
+            client_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=client_loop.run_forever,
+                name="mangaupdates_client",
+                daemon=True,
+            ).start()
+            client_pid = os.getpid()
+            atexit.register(close_client)
+    return client_loop
+
+
+def close_client():
+    """Close the pooled session when the process exits."""
+    if client_session is not None:
+        future = asyncio.run_coroutine_threadsafe(client_session.close(), client_loop)
+        future.result(5)
+
+
+def get_client_session():
+    """Return the pooled session, created inside the client event loop."""
+    global client_session, client_semaphore  # noqa: PLW0603
+
+    if client_session is None:
+        client_session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=settings.REQUEST_TIMEOUT),
+        )
+        client_semaphore = asyncio.Semaphore(SERIES_CONCURRENCY)
+    return client_session
+
+
+async def fetch_series_images(series_ids, lane, results):
+    """Fetch the image URLs of the series into results, None for failed ones."""
+    session = get_client_session()
+    await asyncio.gather(
+        *(
+            fetch_series_image(session, series_id, lane, results)
+            for series_id in series_ids
+        ),
+    )
+
+
+async def fetch_series_image(session, series_id, lane, results):
+    """Fetch the image URL of a series within the shared rate limit."""
+    results[series_id] = await request_series_image(session, series_id, lane)
+
+
+async def request_series_image(session, series_id, lane):
+    """Return the image URL of a series, None if it can't be fetched."""
+    url = f"{base_url}/series/{series_id}"
+
+    async with client_semaphore:
+        # the limiter may call Redis, keep it off the event loop
+        ready = await asyncio.to_thread(ratelimit.take, urlparse(url).netloc, lane)
+        await asyncio.sleep(max(0, ready - time.time()))
+
+        start = time.monotonic()
+        status = None
+        data = None
+        try:
+            async with session.get(url) as response:
+                status = response.status
+                if status == requests.codes.ok:
+                    data = await response.json()
+        except (aiohttp.ClientError, TimeoutError) as error:
+            logger.warning("Could not fetch series %s: %s", series_id, error)
+
+    # the metrics may be flushed to Redis, keep them off the event loop
+    await asyncio.to_thread(
+        record_request,
+        url,
+        status,
+        time.monotonic() - start,
+    )
+    return None if data is None else get_image_url(data)
+
+
+def record_request(url, status, duration):
+    """Record the metrics of a request for the image of a series."""
+    endpoint = metrics.get_endpoint(url)
+    if status is not None:
+        metrics.increment(
+            "yamtrack_provider_requests_total",
+            provider="mangaupdates",
+            endpoint=endpoint,
+            status=status,
+        )
+    metrics.observe(
+        "yamtrack_provider_request_duration_seconds",
+        duration,
+        provider="mangaupdates",
+        endpoint=endpoint,
+    )
@@ -0,0 +1,197 @@
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from app.providers import cache
+
+logger = logging.getLogger(__name__)
+
+# hash shared by every web and celery process, values are incremented on flush
+METRICS_KEY = "yamtrack_metrics"
+
+# seconds between flushes of the counters of this process to Redis
+FLUSH_INTERVAL = 10
+
+METRICS = {
+    "yamtrack_provider_requests_total": (
+        "counter",
+        "Requests made to the providers by status code.",
+    ),
+    "yamtrack_provider_request_duration_seconds": (
+        "histogram",
+        "Time spent waiting for the response of the providers.",
+    ),
+    "yamtrack_provider_retries_total": (
+        "counter",
+        "Requests to the providers retried by reason.",
+    ),
+    "yamtrack_rate_limit_wait_seconds_total": (
+        "counter",
+        "Time requests spent blocked by the rate limiter or a Retry-After.",
+    ),
+    "yamtrack_cache_requests_total": (
+        "counter",
+        "Provider cache lookups by key family and the tier that answered.",
+    ),
+    "yamtrack_cache_fetches_total": (
+        "counter",
+        "Fetches of missing cache keys, fetched or coalesced with another one.",
+    ),
+}
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# cache key prefixes reported as their own family, longest first
+KEY_FAMILIES = (
+    "mangaupdates_series_thumb_",
+    "core_",
+    "mangaupdates_manga_",
+    "mal_anime_",
+    "mal_manga_",
+    "season_",
+    "search_",
+    "movie_",
+    "game_",
+    "tv_",
+)
+
+samples = defaultdict(float)
+samples_lock = threading.Lock()
+last_flush = time.monotonic()
+
+
+def increment(name, value=1, **labels):
+    """Increment the counter with the given labels."""
+    with samples_lock:
+        samples[format_sample(name, labels)] += value
+    flush_if_due()
+
+
+def observe(name, value, **labels):
+    """Record the value in the histogram with the given labels."""
+    with samples_lock:
+        for bucket in DURATION_BUCKETS:
+            if value <= bucket:
+                samples[format_sample(f"{name}_bucket", {**labels, "le": bucket})] += 1
+        samples[format_sample(f"{name}_bucket", {**labels, "le": "+Inf"})] += 1
+        samples[format_sample(f"{name}_sum", labels)] += value
+        samples[format_sample(f"{name}_count", labels)] += 1
+    flush_if_due()
+
+
+def format_sample(name, labels):
+    """Return the sample name with its labels in the Prometheus format."""
+    if not labels:
+        return name
+    formatted = ",".join(
+        f'{label}="{escape_label(value)}"' for label, value in labels.items()
+    )
+    return f"{name}{{{formatted}}}"
+
+
+def escape_label(value):
+    """Escape the label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def key_family(key):
+    """Return the family of a cache key used as metric label."""
+    for prefix in KEY_FAMILIES:
+        if key.startswith(prefix):
+            return prefix.removesuffix("_")
+    return "other"
+
+
+def get_endpoint(url):
+    """Return the path of the URL with the ids replaced, as metric label."""
+    # the first segment is the API version, e.g. /3/tv/1668
+    return re.sub(r"(?<=\w)/\d+", "/{id}", urlparse(url).path)
+
+
+def response_hook(provider):
+    """Return a requests hook that records the response of a provider.
+
+    The hook is created right before sending the request, so the time not
+    spent on the network is the wait for the rate limiter bucket.
+    """
+    start = time.monotonic()
+
+    def hook(response, *args, **kwargs):  # noqa: ARG001
+        total = time.monotonic() - start
+        elapsed = min(response.elapsed.total_seconds(), total)
+        endpoint = get_endpoint(response.url)
+        provider_label = provider.lower()
+
+        increment(
+            "yamtrack_provider_requests_total",
+            provider=provider_label,
+            endpoint=endpoint,
+            status=response.status_code,
+        )
+        observe(
+            "yamtrack_provider_request_duration_seconds",
+            elapsed,
+            provider=provider_label,
+            endpoint=endpoint,
+        )
+        increment(
+            "yamtrack_rate_limit_wait_seconds_total",
+            total - elapsed,
+            provider=provider_label,
+            source="bucket",
+        )
+
+    return hook
+
+
+def flush_if_due():
+    """Flush the counters if the flush interval is over."""
+    if time.monotonic() - last_flush >= FLUSH_INTERVAL:
+        flush()
+
+
+def flush():
+    """Add the counters of this process to the shared ones in Redis."""
+    global last_flush  # noqa: PLW0603
+
+    with samples_lock:
+        pending = dict(samples)
+        samples.clear()
+        last_flush = time.monotonic()
+
+    if not pending:
+        return
+
+    try:
+        pipeline = cache.get_redis_client().pipeline(transaction=False)
+        for sample, value in pending.items():
+            pipeline.hincrbyfloat(METRICS_KEY, sample, value)
+        pipeline.execute()
+    except Exception:
+        # metrics are best effort, don't fail the request
+        logger.exception("Could not flush provider metrics")
+
+
+def render():
+    """Return the metrics of every process in the Prometheus text format."""
+    flush()
+    stored = cache.get_redis_client().hgetall(METRICS_KEY)
+
+    by_metric = defaultdict(list)
+    for sample, value in stored.items():
+        sample = sample.decode()  # noqa: PLW2901
+        name = sample.split("{", 1)[0]
+        metric = re.sub(r"_(bucket|sum|count)$", "", name)
+        if metric not in METRICS:
+            metric = name
+        by_metric[metric].append(f"{sample} {float(value)}")
+
+    lines = []
+    for metric, (metric_type, description) in METRICS.items():
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        lines.extend(sorted(by_metric.get(metric, [])))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from redis.exceptions import WatchError
+
+from app.providers import cache
+
+logger = logging.getLogger(__name__)
+
+# requests per second allowed for each host, DEFAULT_RATE for the others
+HOST_RATES = {
+    "api.myanimelist.net": 30 / 60,
+    "graphql.anilist.co": 85 / 60,
+    "api.igdb.com": 3,
+}
+DEFAULT_RATE = 5
+
+# requests per second allowed across all the hosts
+GLOBAL_RATE = 5
+GLOBAL_TAT_KEY = "ratelimit_tat_all"
+
+# share of the rate of a host guaranteed to web requests and to celery tasks
+# while the other lane is busy, so an import can't starve page loads; a lane
+# gets the whole rate while the other one is idle
+LANE_SHARES = {"interactive": 0.3, "background": 0.7}
+
+# seconds of requests that can be made at once after being idle
+BURST_SECONDS = 1
+
+# bounds of the rate adapted from the response headers, relative to the
+# default of the host, the adapted rate decays back after RATE_TTL seconds
+MIN_RATE_FACTOR = 0.1
+MAX_RATE_FACTOR = 4
+RATE_TTL = 60 * 10
+
+# seconds of the rate of a lane leased by a process at once, the leased
+# requests are spent without calling Redis until the lease runs out
+LEASE_SECONDS = 1
+
+# rates adapted by this process, to skip writes that wouldn't change them
+adapted_rates = {}
+
+# times the requests leased by this process can be made at, by host and lane
+leases = {}
+leases_lock = threading.Lock()
+
+
+def get_default_rate(host):
+    """Return the configured requests per second of the host."""
+    return HOST_RATES.get(host, DEFAULT_RATE)
+
+
+def acquire(host, lane):
+    """Wait until the host can be called again from the lane."""
+    wait = take(host, lane) - time.time()
+    if wait > 0:
+        logger.debug("Waiting %.2fs for the %s rate limit of %s", wait, lane, host)
+        time.sleep(wait)
+
+
+def take(host, lane):
+    """Return the time the next request to the host can be made at.
+
+    Requests are taken from the lease of this process, a new lease is only
+    reserved in Redis once it's spent.
+    """
+    with leases_lock:
+        lease = leases.get((host, lane))
+        now = time.time()
+        # requests left unused for too long would allow a burst over the limit
+        while lease and lease[0] < now - LEASE_SECONDS:
+            lease.popleft()
+
+        if not lease:
+            lease = deque(reserve(host, lane, get_lease_size(host, lane)))
+            leases[host, lane] = lease
+        return lease.popleft()
+
+
+def get_lease_size(host, lane):
+    """Return the number of requests to lease from the lane at once."""
+    rate = adapted_rates.get(host, get_default_rate(host))
+    return max(1, int(rate * LANE_SHARES[lane] * LEASE_SECONDS))
+
+
+def reserve(host, lane, count):
+    """Reserve requests to the host and return the times they can be made at.
+
+    The buckets are theoretical arrival times shared in Redis by every
+    process (GCRA), one for each lane of the host and one for all hosts,
+    so a reservation is a single optimistic transaction.
+    """
+    tat_key = f"ratelimit_tat_{host}_{lane}"
+    other_key = f"ratelimit_tat_{host}_{get_other_lane(lane)}"
+    rate_key = f"ratelimit_rate_{host}"
+    client = cache.get_redis_client()
+
+    while True:
+        with client.pipeline() as pipeline:
+            try:
+                pipeline.watch(tat_key, GLOBAL_TAT_KEY)
+                tat, other_tat, global_tat, rate = pipeline.mget(
+                    tat_key,
+                    other_key,
+                    GLOBAL_TAT_KEY,
+                    rate_key,
+                )
+                rate = float(rate) if rate else get_default_rate(host)
+                adapted_rates[host] = rate
+
+                now = time.time()
+                # the other lane lends its share while it has nothing reserved
+                if float(other_tat or 0) > now:
+                    rate *= LANE_SHARES[lane]
+                new_tat, ready = schedule(tat, rate, count, now)
+                new_global_tat, global_ready = schedule(
+                    global_tat,
+                    GLOBAL_RATE,
+                    count,
+                    now,
+                )
+
+                pipeline.multi()
+                pipeline.set(tat_key, new_tat, ex=int(new_tat - now) + 1)
+                pipeline.set(
+                    GLOBAL_TAT_KEY,
+                    new_global_tat,
+                    ex=int(new_global_tat - now) + 1,
+                )
+                pipeline.execute()
+            except WatchError:
+                # another process reserved in the meantime, read the buckets again
+                continue
+
+        return [max(times) for times in zip(ready, global_ready, strict=True)]
+
+
+def schedule(tat, rate, count, now):
+    """Return the new arrival time of a bucket and the times of the requests."""
+    interval = 1 / rate
+    burst = max(1, BURST_SECONDS / interval)
+    start = max(float(tat or 0), now)
+    return (
+        start + count * interval,
+        [start + (index + 1 - burst) * interval for index in range(count)],
+    )
+
+
+def get_other_lane(lane):
+    """Return the lane sharing the rate of the hosts with the lane."""
+    return "background" if lane == "interactive" else "interactive"
+
+
+def release(host, rate):
+    """Give back the leased requests to the host not due yet.
+
+    Called when the rate changes, so the next lease uses the new rate. The
+    requests are given back at the whole rate, the least they could take.
+    """
+    now = time.time()
+    with leases_lock:
+        for lane in LANE_SHARES:
+            lease = leases.pop((host, lane), None)
+            unused = sum(1 for ready in lease or () if ready > now)
+            if unused:
+                give_back(f"ratelimit_tat_{host}_{lane}", unused / rate)
+
+
+def give_back(tat_key, seconds):
+    """Move the arrival time of the bucket back by the seconds.
+
+    Written with its expiry like in reserve, a bucket that expired in the
+    meantime has nothing to give back and is left missing.
+    """
+    client = cache.get_redis_client()
+
+    while True:
+        with client.pipeline() as pipeline:
+            try:
+                pipeline.watch(tat_key)
+                tat = pipeline.get(tat_key)
+                if tat is None:
+                    return
+
+                now = time.time()
+                new_tat = float(tat) - seconds
+                pipeline.multi()
+                if new_tat > now:
+                    pipeline.set(tat_key, new_tat, ex=int(new_tat - now) + 1)
+                else:
+                    pipeline.delete(tat_key)
+                pipeline.execute()
+            except WatchError:
+                continue
+        return
+
+
+def update(host, response):
+    """Adapt the rate of the host to the rate limit headers of the response."""
+    default = get_default_rate(host)
+    current = adapted_rates.get(host, default)
+    headers = response.headers
+
+    if response.status_code == 429 or "Retry-After" in headers:  # noqa: PLR2004
+        # over the limit, slow down for every lane
+        rate = current / 2
+    elif "X-RateLimit-Remaining" in headers and "X-RateLimit-Reset" in headers:
+        try:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset = float(headers["X-RateLimit-Reset"])
+        except ValueError:
+            return
+        if reset > time.time():
+            # reset given as a timestamp instead of seconds
+            reset -= time.time()
+        rate = remaining / max(reset, 1)
+    elif current < default:
+        # no limit reported, recover towards the default
+        rate = current + default * MIN_RATE_FACTOR
+    else:
+        return
+
+    rate = min(max(rate, default * MIN_RATE_FACTOR), default * MAX_RATE_FACTOR)
+    if abs(rate - current) > current * 0.05:
+        logger.debug("Adapting the rate of %s to %.2f/s", host, rate)
+        release(host, current)
+        adapted_rates[host] = rate
+        cache.get_redis_client().set(f"ratelimit_rate_{host}", rate, ex=RATE_TTL)
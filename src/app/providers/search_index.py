@@ -0,0 +1,117 @@
+import bisect
+import threading
+import time
+
+from django.apps import apps
+from unidecode import unidecode
+
+# seconds before an index is rebuilt from the tracked items, which also
+# drops the search results added to it since
+INDEX_TTL = 60 * 5
+
+# tracked items loaded in an index, most recently added first
+INDEX_MAX_ITEMS = 5000
+
+# indexes of this process by media type and source
+indexes = {}
+indexes_lock = threading.Lock()
+
+
+def normalize(text):
+    """Return the text case folded, with collapsed whitespace and no accents.
+
+    Used for search cache keys and prefix lookups. Only Latin text is
+    transliterated, unidecode would merge unrelated queries in other scripts.
+    """
+    text = " ".join(text.split()).casefold()
+    if all(ord(character) < 0x250 for character in text):  # noqa: PLR2004 Latin blocks
+        text = unidecode(text)
+    return text
+
+
+def get_search_key(name, query):
+    """Return the cache key of a search, shared by equivalent queries."""
+    return f"search_{name}_{normalize(query)}"
+
+
+def add_results(media_type, source, results):
+    """Add the results of a provider search to the index."""
+    with indexes_lock:
+        index = get_index(media_type, source)
+        for result in results:
+            add_entry(index, result)
+        index["keys"].sort()
+
+
+def suggest(media_type, source, query, limit=10):
+    """Return indexed results with a word of their title starting with the query.
+
+    Answered from recent searches and tracked items, without calling the
+    provider, for type-ahead queries.
+    """
+    prefix = normalize(query)
+    if not prefix:
+        return []
+
+    with indexes_lock:
+        index = get_index(media_type, source)
+        keys = index["keys"]
+        suggestions = {}
+        position = bisect.bisect_left(keys, (prefix,))
+        while position < len(keys) and len(suggestions) < limit:
+            key, title = keys[position]
+            if not key.startswith(prefix):
+                break
+            suggestions.setdefault(title, index["entries"][title])
+            position += 1
+
+    return list(suggestions.values())
+
+
+def get_index(media_type, source):
+    """Return the index of the media type and source, rebuilding it if expired.
+
+    Must be called with the indexes lock held.
+    """
+    index = indexes.get((media_type, source))
+    if index is None or index["expires_at"] <= time.monotonic():
+        index = {
+            "expires_at": time.monotonic() + INDEX_TTL,
+            "entries": {},
+            "keys": [],
+        }
+        item_model = apps.get_model("app", "Item")
+        items = (
+            item_model.objects.filter(
+                media_type=media_type,
+                source=source,
+            )
+            .order_by("-id")
+            .values("media_id", "source", "media_type", "title", "image")
+        )
+        for item in items[:INDEX_MAX_ITEMS]:
+            add_entry(index, item)
+        index["keys"].sort()
+        indexes[media_type, source] = index
+    return index
+
+
+def add_entry(index, result):
+    """Index the result under the start of each word of its title.
+
+    The keys have to be sorted again after adding entries.
+    """
+    title = normalize(result["title"])
+    if title in index["entries"]:
+        return
+
+    index["entries"][title] = {
+        "media_id": result["media_id"],
+        "source": result["source"],
+        "media_type": result["media_type"],
+        "title": result["title"],
+        "image": result["image"],
+    }
+    words = title.split(" ")
+    for position in range(len(words)):
+        index["keys"].append((" ".join(words[position:]), title))
@@ -0,0 +1,37 @@
+import pickle
+import zlib
+
+from django.conf import settings
+from django.core.cache.backends.redis import RedisSerializer
+
+# first byte of compressed values, pickles of protocol 2+ start with \x80
+COMPRESSED_MARKER = b"Z"
+
+
+class CompressedSerializer(RedisSerializer):
+    """Pickle cache values and compress the large ones with zlib.
+
+    Values below the size threshold are stored as plain pickles, so small
+    entries don't pay for compression and remain readable by RedisSerializer.
+    """
+
+    def __init__(self, protocol=None, min_size=None, level=None):
+        """Initialize the serializer with the compression settings."""
+        super().__init__(protocol)
+        self.min_size = (
+            settings.PROVIDER_CACHE_COMPRESS_MIN_SIZE if min_size is None else min_size
+        )
+        self.level = settings.PROVIDER_CACHE_COMPRESS_LEVEL if level is None else level
+
+    def dumps(self, obj):
+        """Serialize the value, compressing it if it's above the threshold."""
+        data = super().dumps(obj)
+        if isinstance(data, int) or len(data) < self.min_size:
+            return data
+        return COMPRESSED_MARKER + zlib.compress(data, self.level)
+
+    def loads(self, data):
+        """Deserialize a value stored by this serializer or RedisSerializer."""
+        if data[:1] == COMPRESSED_MARKER:
+            return pickle.loads(zlib.decompress(data[1:]))  # noqa: S301
+        return super().loads(data)
@@ -1,74 +1,249 @@
+import contextvars
 import logging
+import math
+import random
 import time
-from functools import wraps
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import partial, wraps
+from urllib.parse import urlparse
 
 import requests
+from celery import current_task
 from django.conf import settings
-from django.core.cache import cache
-from pyrate_limiter import RedisBucket
-from redis import ConnectionPool
-from requests_ratelimiter import LimiterAdapter, LimiterSession
-
-from app.providers import igdb, mal, mangaupdates, manual, tmdb
+from django.db import close_old_connections
+
+from app import tasks
+from app.providers import (
+    cache,
+    igdb,
+    mal,
+    mangaupdates,
+    manual,
+    metrics,
+    ratelimit,
+    search_index,
+    tmdb,
+)
 
 logger = logging.getLogger(__name__)
 
+# metadata memo of the current request or celery task, None outside of them
+current_memo = contextvars.ContextVar("metadata_memo", default=None)
+
+# parallel upstream requests per provider when fetching metadata in bulk
+METADATA_FETCH_CONCURRENCY = {"tmdb": 4, "mal": 2, "mangaupdates": 2, "igdb": 2}
+
+# provider searched by default for each media type
+SEARCH_SOURCES = {
+    "tv": "tmdb",
+    "movie": "tmdb",
+    "anime": "mal",
+    "manga": "mal",
+    "game": "igdb",
+}
+
+# searches of the federated search page waiting for their provider at once,
+# a search that times out keeps running here to cache its results
+search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search")
+
+# seconds before a stale entry can be queued for refresh again
+REFRESH_LOCK_TIMEOUT = 60 * 10
+
+# fields of the core metadata, enough for progress, statuses and calendar
+# dates, cached apart from the full metadata only needed by details pages
+CORE_FIELDS = ("media_id", "source", "media_type", "title", "image", "max_progress")
+CORE_DETAILS = (
+    "format",
+    "status",
+    "release_date",
+    "start_date",
+    "end_date",
+    "first_air_date",
+    "last_air_date",
+    "number_of_seasons",
+    "number_of_episodes",
+    "number_of_chapters",
+)
 
-def get_redis_connection():
-    """Return a Redis connection pool."""
-    if settings.TESTING:
-        import fakeredis
+# attempts and seconds a provider request can take, including the waits;
+# web requests give up quickly to serve cached or degraded pages, celery
+# tasks wait longer and are re-queued with a countdown after that
+RETRY_POLICIES = {
+    "interactive": {"attempts": 2, "deadline": 3},
+    "background": {"attempts": 4, "deadline": 30},
+}
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10
 
-        return fakeredis.FakeStrictRedis().connection_pool
-    return ConnectionPool.from_url(settings.REDIS_URL)
+# failures of a provider within the window that pause its requests
+CIRCUIT_FAILURES = 5
+CIRCUIT_WINDOW = 60
+CIRCUIT_COOLDOWN = 30
+# seconds the state of a closed circuit read from Redis is reused
+CIRCUIT_CHECK_INTERVAL = 1
 
+# circuit state of the providers read by this process, the monotonic times
+# until which it's reused and until which the circuit is open
+circuit_states = {}
 
-redis_pool = get_redis_connection()
 
-session = LimiterSession(
-    per_second=5,
-    bucket_class=RedisBucket,
-    bucket_kwargs={"redis_pool": redis_pool, "bucket_name": "api"},
-)
-session.mount(
-    "https://api.myanimelist.net/v2",
-    LimiterAdapter(per_minute=30),
-)
-session.mount(
-    "https://graphql.anilist.co",
-    LimiterAdapter(per_minute=85),
-)
-session.mount(
-    "https://api.igdb.com/v4",
-    LimiterAdapter(per_second=3),
-)
+class RateLimitedSession(requests.Session):
+    """Session that waits for the rate limit of the host before each request."""
+
+    def send(self, request, **kwargs):
+        """Send the request within the rate limit and adapt it to the response."""
+        host = urlparse(request.url).netloc
+        ratelimit.acquire(host, get_lane())
+        response = super().send(request, **kwargs)
+        ratelimit.update(host, response)
+        return response
+
+
+session = RateLimitedSession()
+
+
+def get_lane():
+    """Return whether requests are made for a web request or a celery task."""
+    if current_task and not current_task.request.called_directly:
+        return "background"
+    return "interactive"
+
+
+class ProviderUnavailableError(requests.exceptions.RequestException):
+    """Raised when a provider can't answer before the retry deadline."""
+
+    def __init__(self, provider, retry_after):
+        """Initialize the error with the seconds to wait before retrying."""
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"{provider} unavailable, retry in {retry_after} seconds")
+
+
+def get_retry_policy():
+    """Return the retry policy of the current celery task or web request."""
+    return RETRY_POLICIES[get_lane()]
+
+
+def get_backoff(attempt):
+    """Return the exponential backoff with full jitter for the attempt."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))  # noqa: S311
+
+
+def is_retryable(error):
+    """Return whether the error is a transient failure of the provider."""
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response.status_code >= requests.codes.server_error
+    return isinstance(
+        error,
+        requests.exceptions.ConnectionError | requests.exceptions.Timeout,
+    )
+
+
+def get_circuit_key(provider):
+    """Return the Redis key set while the circuit of the provider is open."""
+    return f"circuit_open_{provider}"
+
+
+def check_circuit(provider):
+    """Raise ProviderUnavailableError if the circuit of the provider is open.
+
+    The state is read from Redis at most once per CIRCUIT_CHECK_INTERVAL,
+    or once the circuit closes, instead of on every request.
+    """
+    now = time.monotonic()
+    checked_until, open_until = circuit_states.get(provider, (0, 0))
+    if now >= checked_until:
+        retry_after = cache.get_redis_client().ttl(get_circuit_key(provider))
+        open_until = now + max(retry_after, 0)
+        circuit_states[provider] = (
+            max(open_until, now + CIRCUIT_CHECK_INTERVAL),
+            open_until,
+        )
+
+    if open_until > now:
+        raise ProviderUnavailableError(provider, math.ceil(open_until - now))
+
+
+def open_circuit(provider, seconds):
+    """Stop every process from calling the provider for the given seconds."""
+    logger.warning("Pausing requests to %s for %s seconds", provider, seconds)
+    seconds = max(int(seconds), 1)
+    cache.get_redis_client().set(get_circuit_key(provider), 1, ex=seconds)
+    open_until = time.monotonic() + seconds
+    circuit_states[provider] = (open_until, open_until)
+
+
+def record_failure(provider):
+    """Count a failure of the provider, opening its circuit after too many."""
+    client = cache.get_redis_client()
+    key = f"circuit_failures_{provider}"
+    failures = client.incr(key)
+    if failures == 1:
+        client.expire(key, CIRCUIT_WINDOW)
+
+    if failures >= CIRCUIT_FAILURES:
+        open_circuit(provider, CIRCUIT_COOLDOWN)
+        client.delete(key)
 
 
-def retry_on_error(delay=1):
-    """Retry a function if it raises a RequestException."""
+def retry_on_error(func):
+    """Retry transient errors of a provider within the deadline of the policy.
 
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
+    Retries wait with exponential backoff and jitter, or the Retry-After of a
+    rate limited response. When the wait doesn't fit in the deadline, web
+    requests fail fast and celery tasks are re-queued with a countdown, both
+    through ProviderUnavailableError.
+    """
+
+    @wraps(func)
+    def wrapper(provider, *args, **kwargs):
+        policy = get_retry_policy()
+        deadline = time.monotonic() + policy["deadline"]
+        attempt = 1
+
+        while True:
+            check_circuit(provider)
             try:
-                return func(*args, **kwargs)
-            except requests.exceptions.RequestException:
-                msg = f"Request failed. Retrying in {delay} seconds."
-                logger.warning(msg)
-                time.sleep(delay)
-                try:
-                    return func(*args, **kwargs)
-                except requests.exceptions.RequestException:
-                    msg = "Request failed after retry. Raising error."
-                    logger.error(msg)  # noqa: TRY400
+                return func(provider, *args, **kwargs)
+            except ProviderUnavailableError as error:
+                # rate limited, the provider told how long to wait
+                wait = error.retry_after + get_backoff(0)
+                reason = "rate_limited"
+                if attempt >= policy["attempts"] or time.monotonic() + wait > deadline:
+                    open_circuit(provider, error.retry_after)
+                    raise
+            except requests.exceptions.RequestException as error:
+                if not is_retryable(error):
                     raise
 
-        return wrapper
+                if not isinstance(error, requests.exceptions.ConnectionError):
+                    # connection errors are usually on this side of the network
+                    record_failure(provider)
+
+                wait = get_backoff(attempt)
+                reason = "error"
+                if attempt >= policy["attempts"] or time.monotonic() + wait > deadline:
+                    logger.error("Request to %s failed: %s", provider, error)  # noqa: TRY400
+                    raise ProviderUnavailableError(
+                        provider,
+                        CIRCUIT_COOLDOWN,
+                    ) from error
+
+            logger.warning("Request to %s failed, retrying in %.1fs", provider, wait)
+            metrics.increment(
+                "yamtrack_provider_retries_total",
+                provider=provider.lower(),
+                reason=reason,
+            )
+            time.sleep(wait)
+            attempt += 1
 
-    return decorator
+    return wrapper
 
 
-@retry_on_error(delay=1)
+@retry_on_error
 def api_request(provider, method, url, params=None, data=None, headers=None):  # noqa: PLR0913
     """Make a request to the API and return the response as a dictionary."""
     try:
@@ -76,6 +251,7 @@ def api_request(provider, method, url, params=None, data=None, headers=None):  #
             "url": url,
             "headers": headers,
             "timeout": settings.REQUEST_TIMEOUT,
+            "hooks": {"response": metrics.response_hook(provider)},
         }
 
         if method == "GET":
@@ -97,6 +273,50 @@ def api_request(provider, method, url, params=None, data=None, headers=None):  #
     return json_response
 
 
+@retry_on_error
+def conditional_api_request(provider, url, params=None, validators=None):
+    """Make a conditional GET request to the API.
+
+    Return the response as a dictionary with its validators, or None with
+    the given validators when the provider answered 304 Not Modified.
+    """
+    headers = {}
+    if validators:
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    try:
+        response = session.get(
+            url=url,
+            params=params,
+            headers=headers,
+            timeout=settings.REQUEST_TIMEOUT,
+            hooks={"response": metrics.response_hook(provider)},
+        )
+        if response.status_code == requests.codes.not_modified:
+            return None, validators
+
+        response.raise_for_status()
+        return response.json(), get_validators(response)
+
+    except requests.exceptions.HTTPError as error:
+        # retried without the validators, so the response is always complete
+        args = (provider, "GET", url, params, None, None)
+        return request_error_handling(error, *args), None
+
+
+def get_validators(response):
+    """Return the cache validators of the response, None if it has none."""
+    validators = {}
+    if response.headers.get("ETag"):
+        validators["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        validators["last_modified"] = response.headers["Last-Modified"]
+    return validators or None
+
+
 def request_error_handling(error, *args):
     """Handle errors when making a request to the API."""
     # unpack the arguments
@@ -105,25 +325,27 @@ def request_error_handling(error, *args):
     error_resp = error.response
     status_code = error_resp.status_code
 
-    # handle rate limiting
+    # handle rate limiting, retry_on_error decides whether to wait for it
     if status_code == requests.codes.too_many_requests:
-        seconds_to_wait = int(error_resp.headers["Retry-After"])
-        logger.warning("Rate limited, waiting %s seconds", seconds_to_wait)
-        time.sleep(seconds_to_wait + 3)
-        logger.info("Retrying request")
-        return api_request(
-            provider,
-            method,
-            url,
-            params=params,
-            data=data,
-            headers=headers,
+        seconds_to_wait = int(error_resp.headers.get("Retry-After", CIRCUIT_COOLDOWN))
+        logger.warning("%s rate limited for %s seconds", provider, seconds_to_wait)
+        metrics.increment(
+            "yamtrack_rate_limit_wait_seconds_total",
+            seconds_to_wait,
+            provider=provider.lower(),
+            source="retry_after",
         )
+        raise ProviderUnavailableError(provider, seconds_to_wait) from error
 
     if provider == "IGDB":
         # invalid access token, expired or revoked
         if status_code == requests.codes.unauthorized:
             logger.warning("Invalid IGDB access token, refreshing")
+            metrics.increment(
+                "yamtrack_provider_retries_total",
+                provider=provider.lower(),
+                reason="token_refresh",
+            )
             cache.delete("igdb_access_token")
             igdb.get_access_token()
 
@@ -161,8 +383,169 @@ def request_error_handling(error, *args):
     raise error  # re-raise the error if it's not handled
 
 
+class MetadataMemo:
+    """Metadata lookups memoized for the duration of a request or task."""
+
+    def __init__(self, name):
+        """Initialize an empty memo."""
+        self.name = name
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Return the hit and miss counters of the memo."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+
+def start_memo(name):
+    """Start memoizing metadata lookups and return the token to end it."""
+    return current_memo.set(MetadataMemo(name))
+
+
+def end_memo(token):
+    """Stop memoizing metadata lookups and log the memo counters."""
+    memo = current_memo.get()
+    current_memo.reset(token)
+    if memo is not None:
+        logger.debug(
+            "Metadata memo for %s: %s hits, %s misses",
+            memo.name,
+            memo.hits,
+            memo.misses,
+        )
+
+
+@contextmanager
+def metadata_memo(name):
+    """Serve identical metadata lookups inside the block from process memory."""
+    token = start_memo(name)
+    try:
+        yield current_memo.get()
+    finally:
+        end_memo(token)
+
+
+def search(media_type, query, source=None):
+    """Return the search results of the provider of the media type.
+
+    The results are added to the prefix index used for suggestions.
+    """
+    source = get_search_source(media_type, source)
+    if source == "mangaupdates":
+        results = mangaupdates.search(query)
+    elif source == "mal":
+        results = mal.search(media_type, query)
+    elif source == "tmdb":
+        results = tmdb.search(media_type, query)
+    else:
+        results = igdb.search(query)
+
+    search_index.add_results(media_type, source, results)
+    return results
+
+
+def suggest(media_type, query, source=None):
+    """Return search suggestions from recent results and tracked items."""
+    return search_index.suggest(
+        media_type,
+        get_search_source(media_type, source),
+        query,
+    )
+
+
+def get_search_source(media_type, source=None):
+    """Return the source searched for the media type."""
+    if media_type == "manga" and source == "mangaupdates":
+        return source
+    return SEARCH_SOURCES[media_type]
+
+
+def search_with_timeout(media_type, query, source=None):
+    """Return the search results, raising TimeoutError if the provider is slow.
+
+    The search keeps running in the background after the timeout, so trying
+    again later is served from the cache.
+    """
+    future = search_executor.submit(run_search, media_type, query, source)
+    return future.result(settings.SEARCH_PROVIDER_TIMEOUT)
+
+
+def run_search(media_type, query, source=None):
+    """Search in a thread of the search executor.
+
+    Django only closes the database connections of request threads, the
+    connection of the pool thread is closed here like at the end of a request.
+    """
+    close_old_connections()
+    try:
+        return search(media_type, query, source)
+    finally:
+        close_old_connections()
+
+
 def get_media_metadata(media_type, media_id, source, season_numbers=None):
-    """Return the metadata for the selected media."""
+    """Return the metadata for the selected media.
+
+    Inside a request or celery task, results are memoized so repeated lookups
+    of the same media don't go to the cache again. The returned metadata is
+    shared between those lookups and must not be modified.
+    """
+    memo = current_memo.get()
+
+    # manual metadata is built from the database, which can change mid-request
+    if memo is None or source == "manual":
+        return retrieve_metadata(media_type, media_id, source, season_numbers)
+
+    key = get_memo_key(media_type, media_id, source, season_numbers)
+    if key in memo.entries:
+        memo.hits += 1
+        return memo.entries[key]
+
+    memo.misses += 1
+    metadata = retrieve_metadata(media_type, media_id, source, season_numbers)
+    memo.entries[key] = metadata
+    return metadata
+
+
+def retrieve_metadata(media_type, media_id, source, season_numbers=None):
+    """Return the metadata for the selected media from its provider.
+
+    Stale cache entries are returned as they are and refreshed in the background.
+    """
+    with cache.track_stale() as stale_keys:
+        metadata = provider_metadata(media_type, media_id, source, season_numbers)
+
+    if stale_keys:
+        schedule_refresh(media_type, media_id, source, season_numbers, stale_keys)
+    return metadata
+
+
+def schedule_refresh(media_type, media_id, source, season_numbers, cache_keys):
+    """Queue a task to fetch stale entries again, once per entry."""
+    cache_keys = sorted(
+        key
+        for key in cache_keys
+        if cache.add(f"refresh_lock_{key}", 1, REFRESH_LOCK_TIMEOUT)
+    )
+    if not cache_keys:
+        return
+
+    try:
+        tasks.refresh_metadata.delay(
+            media_type,
+            media_id,
+            source,
+            season_numbers,
+            cache_keys,
+        )
+    except Exception:
+        # the stale entries are still served until the hard TTL
+        logger.exception("Could not schedule the refresh of %s", cache_keys)
+
+
+def provider_metadata(media_type, media_id, source, season_numbers=None):
+    """Return the metadata for the selected media from its provider module."""
     if source == "manual":
         if media_type == "season":
             return manual.season(media_id, media_type, season_numbers[0])
@@ -177,10 +560,337 @@ def get_media_metadata(media_type, media_id, source, season_numbers=None):
         else mal.manga(media_id),
         "tv": lambda: tmdb.tv(media_id),
         "tv_with_seasons": lambda: tmdb.tv_with_seasons(media_id, season_numbers),
-        "season": lambda: tmdb.tv_with_seasons(media_id, season_numbers)[
+        "season": lambda: tmdb.seasons(media_id, season_numbers)[
             f"season/{season_numbers[0]}"
         ],
         "movie": lambda: tmdb.movie(media_id),
         "game": lambda: igdb.game(media_id),
     }
     return metadata_retrievers[media_type]()
+
+
+def get_core_metadata(media_type, media_id, source):
+    """Return the core metadata of the media, see CORE_FIELDS.
+
+    Memoized like get_media_metadata, full metadata already memoized is
+    reused instead of looking up the core entry.
+    """
+    memo = current_memo.get()
+
+    if memo is None or source == "manual":
+        return core_metadata(media_type, media_id, source)
+
+    full_key = get_memo_key(media_type, media_id, source)
+    if full_key in memo.entries:
+        memo.hits += 1
+        return get_core(memo.entries[full_key])
+
+    key = ("core", *full_key)
+    if key in memo.entries:
+        memo.hits += 1
+        return memo.entries[key]
+
+    memo.misses += 1
+    metadata = core_metadata(media_type, media_id, source)
+    memo.entries[key] = metadata
+    return metadata
+
+
+def core_metadata(media_type, media_id, source):
+    """Return the core metadata of the media from its provider module.
+
+    Providers without a lightweight request get it from the full metadata.
+    """
+    core_retrievers = {
+        ("tmdb", "movie"): tmdb.movie_core,
+        ("tmdb", "tv"): tmdb.tv_core,
+        ("mal", "anime"): mal.anime_core,
+        ("mal", "manga"): mal.manga_core,
+    }
+    retriever = core_retrievers.get((source, media_type))
+    if retriever is None:
+        return get_core(get_media_metadata(media_type, media_id, source))
+    return retriever(media_id)
+
+
+def get_cached_core(key, fetch):
+    """Return the core metadata of the full metadata cache key.
+
+    It's read from its own entry, or taken from the full metadata when that
+    is cached and fresh, before calling fetch for the lightweight request.
+    """
+    cached = read_cores([key])
+    if key in cached:
+        return cached[key]
+
+    core_key = f"core_{key}"
+    with cache.single_flight(core_key):
+        # another process may have fetched it while waiting for the lock
+        data = cache.get(core_key)
+
+        if data is None:
+            data = fetch()
+            cache.set(core_key, data)
+
+    return data
+
+
+def read_cores(keys):
+    """Return the cached core metadata of the full metadata cache keys.
+
+    The core and full entries of every key are read with a single MGET.
+    """
+    entries = cache.get_entries([f"core_{key}" for key in keys] + list(keys))
+    cores = {}
+    for key in keys:
+        if f"core_{key}" in entries:
+            cores[key] = entries[f"core_{key}"]["value"]
+        elif key in entries and not cache.is_stale(entries[key]):
+            cores[key] = get_core(entries[key]["value"])
+    return cores
+
+
+def get_core(metadata):
+    """Return the core fields of the full metadata."""
+    core = {field: metadata[field] for field in CORE_FIELDS if field in metadata}
+    core["details"] = {
+        field: value
+        for field, value in metadata.get("details", {}).items()
+        if field in CORE_DETAILS
+    }
+    if "seasons" in metadata.get("related", {}):
+        core["related"] = {"seasons": metadata["related"]["seasons"]}
+    return core
+
+
+def get_memo_key(media_type, media_id, source, season_numbers=None):
+    """Return a hashable key identifying a metadata lookup."""
+    return (
+        media_type,
+        str(media_id),
+        source,
+        tuple(str(number) for number in season_numbers or ()),
+    )
+
+
+def get_metadata_cache_key(media_type, media_id, source, season_numbers=None):
+    """Return the cache key of the metadata, None if not cached as one entry."""
+    if source == "tmdb" and media_type == "season":
+        return f"season_{media_id}_{season_numbers[0]}"
+
+    cache_keys = {
+        ("tmdb", "movie"): f"movie_{media_id}",
+        ("tmdb", "tv"): f"tv_{media_id}",
+        ("mal", "anime"): f"mal_anime_{media_id}",
+        ("mal", "manga"): f"mal_manga_{media_id}",
+        ("mangaupdates", "manga"): f"mangaupdates_manga_{media_id}",
+        ("igdb", "game"): f"game_{media_id}",
+    }
+    return cache_keys.get((source, media_type))
+
+
+def get_media_metadata_many(lookups):
+    """Return the metadata of many media in a dict keyed by their lookup.
+
+    Each lookup is a (media_type, media_id, source) tuple, with a tuple of
+    season_numbers as a fourth element for seasons. Cached entries are read
+    with a single MGET, duplicated lookups are fetched once, and misses are
+    fetched in parallel per provider and written back with a single MSET.
+    Lookups that fail upstream are logged and left out of the result.
+    """
+    memo = current_memo.get()
+    unique_lookups = {}
+    for lookup in lookups:
+        unique_lookups.setdefault(get_memo_key(*lookup), lookup)
+    resolved = {}
+
+    if memo is not None:
+        for key in unique_lookups:
+            if key in memo.entries:
+                memo.hits += 1
+                resolved[key] = memo.entries[key]
+
+    cache_keys = {}
+    for key, lookup in unique_lookups.items():
+        cache_key = get_metadata_cache_key(*lookup)
+        if key not in resolved and cache_key:
+            cache_keys[cache_key] = key
+
+    with cache.track_stale() as stale_keys:
+        cached = cache.get_many(list(cache_keys))
+
+    for cache_key, metadata in cached.items():
+        resolved[cache_keys[cache_key]] = metadata
+
+    for cache_key in stale_keys:
+        lookup = unique_lookups[cache_keys[cache_key]]
+        season_numbers = lookup[3] if len(lookup) > 3 else None  # noqa: PLR2004
+        schedule_refresh(*lookup[:3], season_numbers, [cache_key])
+
+    misses = {
+        key: lookup for key, lookup in unique_lookups.items() if key not in resolved
+    }
+    fetched = fetch_metadata_many(misses)
+    resolved.update(fetched)
+
+    if memo is not None:
+        memo.misses += len(fetched)
+        memo.entries.update(
+            (key, metadata) for key, metadata in fetched.items() if key[2] != "manual"
+        )
+
+    return {
+        lookup: resolved[get_memo_key(*lookup)]
+        for lookup in lookups
+        if get_memo_key(*lookup) in resolved
+    }
+
+
+def get_core_metadata_many(lookups):
+    """Return the core metadata of many media in a dict keyed by their lookup.
+
+    Like get_media_metadata_many for (media_type, media_id, source) lookups,
+    cached entries are read with a single MGET and the misses are fetched in
+    parallel with the lightweight requests.
+    """
+    memo = current_memo.get()
+    unique_lookups = {}
+    for lookup in lookups:
+        unique_lookups.setdefault(get_memo_key(*lookup), lookup)
+    resolved = {}
+
+    if memo is not None:
+        for key in unique_lookups:
+            if ("core", *key) in memo.entries:
+                memo.hits += 1
+                resolved[key] = memo.entries["core", *key]
+
+    cache_keys = {}
+    for key, lookup in unique_lookups.items():
+        cache_key = get_metadata_cache_key(*lookup)
+        if key not in resolved and cache_key:
+            cache_keys[key] = cache_key
+
+    cached = read_cores(list(cache_keys.values()))
+    for key, cache_key in cache_keys.items():
+        if cache_key in cached:
+            resolved[key] = cached[cache_key]
+
+    misses = {
+        key: lookup for key, lookup in unique_lookups.items() if key not in resolved
+    }
+    fetched = fetch_metadata_many(misses, core=True)
+    resolved.update(fetched)
+
+    if memo is not None:
+        memo.misses += len(fetched)
+        memo.entries.update(
+            (("core", *key), metadata)
+            for key, metadata in fetched.items()
+            if key[2] != "manual"
+        )
+
+    return {
+        lookup: resolved[get_memo_key(*lookup)]
+        for lookup in lookups
+        if get_memo_key(*lookup) in resolved
+    }
+
+
+def fetch_metadata_many(lookups, *, core=False):
+    """Fetch uncached metadata from the providers with bounded concurrency.
+
+    With core, the core metadata of the lookups is fetched instead.
+    """
+    jobs = defaultdict(list)
+    seasons = defaultdict(dict)
+    games = {}
+
+    for key, lookup in lookups.items():
+        media_type, media_id, source = lookup[:3]
+        if source == "tmdb" and media_type == "season":
+            # all the seasons of a show are appended to the same tv request
+            seasons[media_id][key] = lookup[3][0]
+        elif source == "igdb" and media_type == "game":
+            # games are fetched together with a /multiquery request
+            games[key] = media_id
+        else:
+            jobs[source].append(partial(fetch_metadata, key, lookup, core=core))
+
+    for media_id, season_keys in seasons.items():
+        jobs["tmdb"].append(partial(fetch_seasons, media_id, season_keys))
+
+    if games:
+        jobs["igdb"].append(partial(fetch_games, games, core=core))
+
+    fetched = {}
+
+    # manual metadata is read from the database, keep it in this thread
+    for job in jobs.pop("manual", []):
+        fetched.update(job())
+
+    # the lookups were already read from every cache tier in this thread
+    with cache.deferred_writes(), cache.without_snapshots():
+        executors = []
+        futures = []
+        try:
+            for source, source_jobs in jobs.items():
+                executor = ThreadPoolExecutor(
+                    max_workers=METADATA_FETCH_CONCURRENCY.get(source, 1),
+                    thread_name_prefix=f"metadata_{source}",
+                )
+                executors.append(executor)
+                futures.extend(
+                    # each job needs its own context copy to share the write buffer
+                    executor.submit(contextvars.copy_context().run, job)
+                    for job in source_jobs
+                )
+
+            for future in as_completed(futures):
+                fetched.update(future.result())
+        finally:
+            for executor in executors:
+                executor.shutdown()
+
+    return fetched
+
+
+def fetch_metadata(key, lookup, *, core=False):
+    """Fetch the metadata of a single lookup for fetch_metadata_many."""
+    try:
+        if core:
+            return {key: core_metadata(*lookup)}
+        return {key: retrieve_metadata(*lookup)}
+    except requests.exceptions.RequestException as error:
+        logger.warning("Could not fetch metadata for %s: %s", lookup, error)
+        return {}
+
+
+def fetch_games(game_keys, *, core=False):
+    """Fetch the metadata of many games for fetch_metadata_many."""
+    try:
+        data = igdb.games(list(game_keys.values()))
+    except requests.exceptions.RequestException as error:
+        logger.warning("Could not fetch IGDB games: %s", error)
+        return {}
+
+    fetched = {}
+    for key, media_id in game_keys.items():
+        metadata = data.get(int(media_id))
+        if metadata is not None:
+            fetched[key] = get_core(metadata) if core else metadata
+    return fetched
+
+
+def fetch_seasons(media_id, season_keys):
+    """Fetch the metadata of many seasons of a show for fetch_metadata_many."""
+    try:
+        data = tmdb.seasons(media_id, list(season_keys.values()))
+    except requests.exceptions.RequestException as error:
+        logger.warning("Could not fetch seasons of TMDB %s: %s", media_id, error)
+        return {}
+
+    return {
+        key: data[f"season/{season_number}"]
+        for key, season_number in season_keys.items()
+    }
@@ -1,7 +1,10 @@
+import logging
+
 from django.conf import settings
-from django.core.cache import cache
 
-from app.providers import services
+from app.providers import cache, search_index, services
+
+logger = logging.getLogger(__name__)
 
 base_url = "https://api.themoviedb.org/3"
 base_params = {
@@ -12,7 +15,8 @@ base_params = {
 
 def search(media_type, query):
     """Search for media on TMDB."""
-    data = cache.get(f"search_{media_type}_{query}")
+    key = search_index.get_search_key(media_type, query)
+    data = cache.get(key)
 
     if data is None:
         url = f"{base_url}/search/{media_type}"
@@ -39,7 +43,7 @@ def search(media_type, query):
             for media in response
         ]
 
-        cache.set(f"search_{media_type}_{query}", data)
+        cache.set(key, data)
 
     return data
 
@@ -49,98 +53,190 @@ def movie(media_id):
     data = cache.get(f"movie_{media_id}")
 
     if data is None:
-        url = f"{base_url}/movie/{media_id}"
-        params = {
-            **base_params,
-            "append_to_response": "recommendations",
-        }
-        response = services.api_request("TMDB", "GET", url, params=params)
-        data = {
-            "media_id": media_id,
-            "source": "tmdb",
-            "media_type": "movie",
-            "title": response["title"],
-            "max_progress": 1,
-            "image": get_image_url(response["poster_path"]),
-            "synopsis": get_synopsis(response["overview"]),
-            "details": {
-                "format": "Movie",
-                "release_date": get_start_date(response["release_date"]),
-                "status": response["status"],
-                "runtime": get_readable_duration(response["runtime"]),
-                "genres": get_genres(response["genres"]),
-                "studios": get_companies(response["production_companies"]),
-                "country": get_country(response["production_countries"]),
-                "languages": get_languages(response["spoken_languages"]),
-            },
-            "related": {
-                "recommendations": get_related(
-                    response["recommendations"]["results"][:15],
-                ),
-            },
-        }
+        with cache.single_flight(f"movie_{media_id}"):
+            # another process may have fetched it while waiting for the lock
+            data = cache.get(f"movie_{media_id}")
+
+            if data is None:
+                data = revalidate(
+                    f"movie_{media_id}",
+                    f"{base_url}/movie/{media_id}",
+                    {**base_params, "append_to_response": "recommendations"},
+                    lambda response: process_movie(response, media_id),
+                )
+
+    return data
 
-        cache.set(f"movie_{media_id}", data)
 
+def revalidate(key, url, params, process):
+    """Fetch the metadata of the key, reusing the cached entry if unchanged.
+
+    The request is conditional on the validators of the previous entry,
+    a 304 response extends that entry without downloading it again.
+    """
+    entry = cache.peek(key)
+    validators = entry.get("validators") if entry else None
+
+    response, validators = services.conditional_api_request(
+        "TMDB",
+        url,
+        params=params,
+        validators=validators,
+    )
+
+    if response is None:
+        logger.debug("%s not modified, extending the cached entry", key)
+        data = entry["value"]
+    else:
+        data = process(response)
+
+    cache.set(key, data, validators=validators)
     return data
 
 
-def tv_with_seasons(media_id, season_numbers):
-    """Return the metadata for the tv show with a season appended to the response."""
-    url = f"{base_url}/tv/{media_id}"
-    params = {
-        **base_params,
-        "append_to_response": "recommendations",
+def process_movie(response, media_id):
+    """Process the metadata for the selected movie from The Movie Database."""
+    return {
+        "media_id": media_id,
+        "source": "tmdb",
+        "media_type": "movie",
+        "title": response["title"],
+        "max_progress": 1,
+        "image": get_image_url(response["poster_path"]),
+        "synopsis": get_synopsis(response["overview"]),
+        "details": {
+            "format": "Movie",
+            "release_date": get_start_date(response["release_date"]),
+            "status": response["status"],
+            "runtime": get_readable_duration(response["runtime"]),
+            "genres": get_genres(response["genres"]),
+            "studios": get_companies(response["production_companies"]),
+            "country": get_country(response["production_countries"]),
+            "languages": get_languages(response["spoken_languages"]),
+        },
+        "related": {
+            "recommendations": get_related(
+                response["recommendations"]["results"][:15],
+            ),
+        },
     }
 
-    data = cache.get(f"tv_{media_id}")
-    if data is None:
-        response = services.api_request("TMDB", "GET", url, params=params)
-        data = process_tv(response)
-        cache.set(f"tv_{media_id}", data)
 
-    uncached_seasons = []
-    for season_number in season_numbers:
-        season_data = cache.get(f"season_{media_id}_{season_number}")
+def movie_core(media_id):
+    """Return the core metadata for the selected movie from The Movie Database.
 
-        if season_data:
-            data[f"season/{season_number}"] = season_data
-        else:
-            uncached_seasons.append(season_number)
+    TMDB can't select fields, the core request leaves out the recommendations.
+    """
+    return services.get_cached_core(
+        f"movie_{media_id}",
+        lambda: process_movie_core(
+            services.api_request(
+                "TMDB",
+                "GET",
+                f"{base_url}/movie/{media_id}",
+                params=base_params,
+            ),
+            media_id,
+        ),
+    )
 
-    # tmdb max remote request is 20
-    max_seasons_per_request = 20
-    for i in range(0, len(uncached_seasons), max_seasons_per_request):
-        season_subset = uncached_seasons[i : i + max_seasons_per_request]
-        append_text = ",".join([f"season/{season}" for season in season_subset])
-        params["append_to_response"] = f"{append_text}"
 
-        response = services.api_request("TMDB", "GET", url, params=params)
+def process_movie_core(response, media_id):
+    """Process the core metadata for the selected movie, see process_movie."""
+    return {
+        "media_id": media_id,
+        "source": "tmdb",
+        "media_type": "movie",
+        "title": response["title"],
+        "max_progress": 1,
+        "image": get_image_url(response["poster_path"]),
+        "details": {
+            "format": "Movie",
+            "release_date": get_start_date(response["release_date"]),
+            "status": response["status"],
+        },
+    }
 
-        # add seasons metadata to the response
-        for season_number in season_subset:
-            season_data = process_season(
-                response[f"season/{season_number}"],
-            )
-            season_data["tv_title"] = data["title"]
-            cache.set(f"season_{media_id}_{season_number}", season_data)
-            data[f"season/{season_number}"] = season_data
+
+def tv_with_seasons(media_id, season_numbers):
+    """Return the metadata for the tv show with a season appended to the response."""
+    data = tv(media_id)
+    data.update(seasons(media_id, season_numbers))
     return data
 
 
+def seasons(tv_id, season_numbers):
+    """Return the metadata for the seasons keyed by season/{number}.
+
+    Uncached seasons are appended to tv show requests, which also have the
+    title of the show.
+    """
+    url = f"{base_url}/tv/{tv_id}"
+    params = {**base_params}
+
+    season_keys = {
+        season_number: f"season_{tv_id}_{season_number}"
+        for season_number in season_numbers
+    }
+    cached_seasons = cache.get_many(list(season_keys.values()))
+    uncached_seasons = [
+        season_number
+        for season_number, key in season_keys.items()
+        if key not in cached_seasons
+    ]
+
+    if uncached_seasons:
+        lock_key = "_".join(season_keys[number] for number in uncached_seasons)
+        with cache.single_flight(lock_key):
+            # another process may have fetched them while waiting for the lock
+            cached_seasons.update(
+                cache.get_many([season_keys[number] for number in uncached_seasons]),
+            )
+            uncached_seasons = [
+                number
+                for number in uncached_seasons
+                if season_keys[number] not in cached_seasons
+            ]
+            # tmdb max remote request is 20
+            max_seasons_per_request = 20
+            for i in range(0, len(uncached_seasons), max_seasons_per_request):
+                season_subset = uncached_seasons[i : i + max_seasons_per_request]
+                append_text = ",".join([f"season/{season}" for season in season_subset])
+                params["append_to_response"] = f"{append_text}"
+
+                response = services.api_request("TMDB", "GET", url, params=params)
+
+                # add seasons metadata to the response
+                for season_number in season_subset:
+                    season_data = process_season(
+                        response[f"season/{season_number}"],
+                    )
+                    season_data["tv_title"] = response["name"]
+                    cache.set(season_keys[season_number], season_data)
+                    cached_seasons[season_keys[season_number]] = season_data
+
+    return {
+        f"season/{season_number}": cached_seasons[key]
+        for season_number, key in season_keys.items()
+    }
+
+
 def tv(media_id):
     """Return the metadata for the selected tv show from The Movie Database."""
     data = cache.get(f"tv_{media_id}")
 
     if data is None:
-        url = f"{base_url}/tv/{media_id}"
-        params = {
-            **base_params,
-            "append_to_response": "recommendations",
-        }
-        response = services.api_request("TMDB", "GET", url, params=params)
-        data = process_tv(response)
-        cache.set(f"tv_{media_id}", data)
+        with cache.single_flight(f"tv_{media_id}"):
+            # another process may have fetched it while waiting for the lock
+            data = cache.get(f"tv_{media_id}")
+
+            if data is None:
+                data = revalidate(
+                    f"tv_{media_id}",
+                    f"{base_url}/tv/{media_id}",
+                    {**base_params, "append_to_response": "recommendations"},
+                    process_tv,
+                )
 
     return data
 
@@ -178,15 +274,64 @@ def process_tv(response):
     }
 
 
+def tv_core(media_id):
+    """Return the core metadata for the selected tv show from The Movie Database.
+
+    TMDB can't select fields, the core request leaves out the recommendations.
+    """
+    return services.get_cached_core(
+        f"tv_{media_id}",
+        lambda: process_tv_core(
+            services.api_request(
+                "TMDB",
+                "GET",
+                f"{base_url}/tv/{media_id}",
+                params=base_params,
+            ),
+        ),
+    )
+
+
+def process_tv_core(response):
+    """Process the core metadata for the selected tv show, see process_tv."""
+    num_episodes = response["number_of_episodes"]
+    return {
+        "media_id": response["id"],
+        "source": "tmdb",
+        "media_type": "tv",
+        "title": response["name"],
+        "max_progress": num_episodes,
+        "image": get_image_url(response["poster_path"]),
+        "details": {
+            "format": "TV",
+            "first_air_date": get_start_date(response["first_air_date"]),
+            "last_air_date": response["last_air_date"],
+            "status": response["status"],
+            "number_of_seasons": response["number_of_seasons"],
+            "number_of_episodes": num_episodes,
+        },
+        "related": {
+            "seasons": get_related(response["seasons"], response["id"]),
+        },
+    }
+
+
 def season(tv_id, season_number):
     """Return the metadata for the selected season from The Movie Database."""
     data = cache.get(f"season_{tv_id}_{season_number}")
 
     if data is None:
-        url = f"{base_url}/tv/{tv_id}/season/{season_number}"
-        response = services.api_request("TMDB", "GET", url, params=base_params)
-        data = process_season(response)
-        cache.set(f"season_{tv_id}_{season_number}", data)
+        with cache.single_flight(f"season_{tv_id}_{season_number}"):
+            # another process may have fetched it while waiting for the lock
+            data = cache.get(f"season_{tv_id}_{season_number}")
+
+            if data is None:
+                data = revalidate(
+                    f"season_{tv_id}_{season_number}",
+                    f"{base_url}/tv/{tv_id}/season/{season_number}",
+                    base_params,
+                    process_season,
+                )
 
     return data
 
@@ -209,6 +354,32 @@ def process_season(response):
     }
 
 
+def changes(media_type, start_date):
+    """Return the ids of the movies or tv shows changed since the start date.
+
+    Changes to seasons and episodes are reported as changes of their show.
+    """
+    url = f"{base_url}/{media_type}/changes"
+    params = {"api_key": settings.TMDB_API, "start_date": start_date.isoformat()}
+    changed_ids = set()
+    page = 1
+
+    while True:
+        response = services.api_request(
+            "TMDB",
+            "GET",
+            url,
+            params={**params, "page": page},
+        )
+        changed_ids.update(result["id"] for result in response["results"])
+
+        if page >= response["total_pages"]:
+            break
+        page += 1
+
+    return changed_ids
+
+
 def get_format(media_type):
     """Return media_type capitalized."""
     if media_type == "tv":
@@ -1,9 +1,20 @@
-from celery import states
-from celery.signals import before_task_publish
+from celery import current_app, states
+from celery.signals import before_task_publish, task_postrun, task_prerun
+from django.apps import apps
 from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django_celery_results.models import TaskResult
 
+from app import items, models
+from app.providers import services
+
+# tokens of the metadata memos started for the running tasks
+task_memo_tokens = {}
+
+# tokens of the item resolvers started for the running tasks
+task_resolver_tokens = {}
+
 
 @receiver(connection_created)
 def setup_sqlite_pragmas(sender, connection, **kwargs):  # noqa: ARG001
@@ -24,6 +35,11 @@ def create_task_result_on_publish(sender=None, headers=None, body=None, **kwargs
     if "task" not in headers:
         return
 
+    # background tasks like metadata refreshes don't show up in the tasks page
+    task = current_app.tasks.get(headers["task"])
+    if task is not None and task.ignore_result:
+        return
+
     TaskResult.objects.store_result(
         content_type="application/json",
         content_encoding="utf-8",
@@ -34,3 +50,67 @@ def create_task_result_on_publish(sender=None, headers=None, body=None, **kwargs
         task_args=headers.get("argsrepr", ""),
         task_kwargs=headers.get("kwargsrepr", ""),
     )
+
+
+@task_prerun.connect
+def start_task_metadata_memo(sender=None, task_id=None, **kwargs):  # noqa: ARG001
+    """Memoize media metadata lookups for the duration of the task."""
+    task_memo_tokens[task_id] = services.start_memo(sender.name)
+
+
+@task_postrun.connect
+def end_task_metadata_memo(sender=None, task_id=None, **kwargs):  # noqa: ARG001
+    """Discard the metadata memo of the finished task."""
+    token = task_memo_tokens.pop(task_id, None)
+    if token is not None:
+        services.end_memo(token)
+
+
+@task_prerun.connect
+def start_task_item_resolver(sender=None, task_id=None, **kwargs):  # noqa: ARG001
+    """Keep an identity map of the items for the duration of the task."""
+    task_resolver_tokens[task_id] = items.start_resolver(sender.name)
+
+
+@task_postrun.connect
+def end_task_item_resolver(sender=None, task_id=None, **kwargs):  # noqa: ARG001
+    """Discard the identity map of the items of the finished task."""
+    token = task_resolver_tokens.pop(task_id, None)
+    if token is not None:
+        items.end_resolver(token)
+
+
+def index_saved_media(sender, instance, **kwargs):  # noqa: ARG001
+    """Store the library entry of the saved media."""
+    models.index_media([instance])
+
+
+def unindex_deleted_media(sender, instance, **kwargs):  # noqa: ARG001
+    """Remove the library entry of the deleted media."""
+    models.LibraryEntry.objects.filter(
+        user_id=instance.user_id,
+        item_id=instance.item_id,
+    ).delete()
+
+
+@receiver(post_delete, sender=models.Season)
+def update_deleted_season_tv(sender, instance, **kwargs):  # noqa: ARG001
+    """Update the aggregates of the TV show of the deleted season.
+
+    Also sent when the season is deleted in cascade, like with its item.
+    """
+    models.update_tv_aggregates([instance.related_tv_id])
+
+
+@receiver(post_delete, sender=models.Item)
+def discard_deleted_item(sender, instance, **kwargs):  # noqa: ARG001
+    """Forget the deleted item in the identity map of the current scope."""
+    items.discard_item(instance)
+
+
+# connected to each media model, a receiver for every sender would stop
+# the deletes of the other models from being done in bulk
+for media_type in models.LIBRARY_MEDIA_TYPES:
+    media_model = apps.get_model(app_label="app", model_name=media_type)
+    post_save.connect(index_saved_media, sender=media_model)
+    post_delete.connect(unindex_deleted_media, sender=media_model)
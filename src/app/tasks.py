@@ -0,0 +1,172 @@
+import logging
+from datetime import timedelta
+
+import requests
+from celery import Task, shared_task
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache as redis_cache
+from django.utils import timezone
+
+from app import images
+from app.providers import cache, services, tmdb
+
+logger = logging.getLogger(__name__)
+
+# time of the last poll of the TMDB change feeds
+CHANGES_SINCE_KEY = "tmdb_changes_since"
+
+# days covered by the TMDB change feeds
+CHANGES_MAX_DAYS = 14
+
+
+class ProviderTask(Task):
+    """Task re-queued with a countdown while a provider is unavailable.
+
+    The worker is freed for other tasks instead of sleeping until the
+    provider answers again. Only used for short idempotent tasks, long ones
+    skip the media they can't fetch instead of starting over.
+    """
+
+    max_retries = 5
+
+    def __call__(self, *args, **kwargs):
+        """Run the task, retrying it later if a provider is unavailable."""
+        try:
+            return super().__call__(*args, **kwargs)
+        except services.ProviderUnavailableError as error:
+            logger.warning(
+                "Retrying %s in %s seconds: %s",
+                self.name,
+                error.retry_after,
+                error,
+            )
+            raise self.retry(exc=error, countdown=error.retry_after) from error
+
+
+@shared_task(
+    base=ProviderTask,
+    name="Refresh metadata",
+    ignore_result=True,
+)
+def refresh_metadata(media_type, media_id, source, season_numbers, cache_keys):
+    """Fetch stale metadata entries again from their provider."""
+    refresh(media_type, media_id, source, season_numbers, cache_keys)
+
+
+@shared_task(
+    base=ProviderTask,
+    name="Refresh changed metadata",
+    ignore_result=True,
+)
+def refresh_changed_metadata():
+    """Refresh the TMDB metadata of tracked media changed since the last poll.
+
+    Unchanged entries are served until PROVIDER_CACHE_TMDB_SOFT_TTL instead.
+    """
+    now = timezone.now()
+    since = redis_cache.get(CHANGES_SINCE_KEY) or now - timedelta(
+        seconds=settings.PROVIDER_CACHE_TMDB_SOFT_TTL,
+    )
+    since = max(since, now - timedelta(days=CHANGES_MAX_DAYS))
+    item_model = apps.get_model("app", "Item")
+
+    # the feeds only have dates, so changes of the current day are refreshed
+    # on every poll, conditional requests keep that cheap when unchanged.
+    # They can have tens of thousands of ids, too many for an IN clause, so
+    # the tracked ids are loaded and intersected with them instead.
+    changed_movies = tmdb.changes("movie", since.date())
+    movie_ids = changed_movies.intersection(
+        item_model.objects.filter(source="tmdb", media_type="movie")
+        .values_list("media_id", flat=True)
+        .distinct(),
+    )
+    for media_id in movie_ids:
+        refresh_changed("movie", media_id, None, [f"movie_{media_id}"])
+
+    changed_tv = tmdb.changes("tv", since.date())
+    tracked_tv = {}
+    for media_id, season_number in (
+        item_model.objects.filter(source="tmdb", media_type__in=("tv", "season"))
+        .values_list("media_id", "season_number")
+        .distinct()
+    ):
+        if media_id not in changed_tv:
+            continue
+        season_numbers = tracked_tv.setdefault(media_id, set())
+        if season_number is not None:
+            season_numbers.add(season_number)
+
+    for media_id, season_numbers in tracked_tv.items():
+        refresh_changed(
+            "tv_with_seasons",
+            media_id,
+            sorted(season_numbers),
+            [f"tv_{media_id}"]
+            + [f"season_{media_id}_{number}" for number in sorted(season_numbers)],
+        )
+
+    redis_cache.set(CHANGES_SINCE_KEY, now, None)
+    logger.info(
+        "Refreshed %s changed movies and %s changed tv shows",
+        len(movie_ids),
+        len(tracked_tv),
+    )
+
+
+def refresh_changed(media_type, media_id, season_numbers, cache_keys):
+    """Refresh the entries of a changed TMDB media, logging failed lookups."""
+    try:
+        refresh(media_type, media_id, "tmdb", season_numbers, cache_keys)
+    except services.ProviderUnavailableError:
+        raise
+    except requests.exceptions.RequestException as error:
+        logger.warning("Could not refresh changed TMDB %s: %s", media_id, error)
+
+
+def refresh(media_type, media_id, source, season_numbers, cache_keys):
+    """Fetch the metadata entries again with the lookups owning them."""
+    lookups = {}
+    for key in cache_keys:
+        lookup = get_owner(key, media_type, media_id, source, season_numbers)
+        group_key = (*lookup[:3], tuple(lookup[3] or ()))
+        lookups.setdefault(group_key, (lookup, []))[1].append(key)
+
+    for lookup, keys in lookups.values():
+        with cache.refreshing(keys):
+            services.provider_metadata(*lookup)
+
+    # core entries are taken from the refreshed metadata on their next read
+    for key in cache_keys:
+        cache.delete(f"core_{key}")
+
+    logger.info("Refreshed metadata: %s", ", ".join(cache_keys))
+
+
+def get_owner(key, media_type, media_id, source, season_numbers):
+    """Return the lookup fetching the entry of the key.
+
+    Lookups also read entries they don't fetch, like the TV show entry read
+    by season lookups, those are fetched by a lookup of their own media.
+    """
+    fields = cache.parse_metadata_key(key)
+    owned_types = ("tv", "season") if media_type == "tv_with_seasons" else (media_type,)
+    if fields is None or (
+        fields["media_type"] in owned_types and fields["media_id"] == str(media_id)
+    ):
+        return media_type, media_id, source, season_numbers
+
+    season_number = fields["season_number"]
+    return (
+        fields["media_type"],
+        fields["media_id"],
+        fields["source"],
+        None if season_number is None else [season_number],
+    )
+
+
+@shared_task(name="Prune image cache", ignore_result=True)
+def prune_image_cache():
+    """Keep the resized images within IMAGE_CACHE_MAX_SIZE."""
+    deleted = images.prune_cache(settings.IMAGE_CACHE_MAX_SIZE)
+    logger.info("Pruned %s images from the image cache", deleted)
@@ -1,7 +1,7 @@
 from django import template
 from unidecode import unidecode
 
-from app import helpers
+from app import helpers, images
 
 register = template.Library()
 
@@ -38,3 +38,9 @@ def slug(arg1):
 def format_time(total_minutes):
     """Convert total minutes to HH:MM format."""
     return helpers.minutes_to_hhmm(total_minutes)
+
+
+@register.filter()
+def image_url(url, size):
+    """Return the URL of the image at the size of the template context."""
+    return images.get_image_url(url, size)
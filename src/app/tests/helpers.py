@@ -0,0 +1,100 @@
+import random
+
+from app.providers import tmdb
+
+WORDS = (
+    "the a of and to in is was he she they his her their with for on at by from "
+    "detective family secret night city return war love truth house game last "
+    "first new old dark road home friend enemy mother father brother sister"
+).split()
+
+
+def synthetic_tv_response(seasons, episodes):
+    """Return a TMDB shaped tv response with every season appended."""
+    rng = random.Random(0)  # noqa: S311 deterministic sample data
+
+    def text(words):
+        return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+    def person(index):
+        return {
+            "id": 1000 + index,
+            "name": text(2).title(),
+            "original_name": text(2).title(),
+            "character": text(2).title(),
+            "credit_id": f"{rng.getrandbits(96):024x}",
+            "order": index,
+            "gender": rng.randint(0, 2),
+            "known_for_department": "Acting",
+            "popularity": round(rng.uniform(0, 50), 3),
+            "profile_path": f"/{rng.getrandbits(64):016x}.jpg",
+            "adult": False,
+        }
+
+    response = {
+        "id": 1,
+        "name": text(3).title(),
+        "overview": text(60),
+        "poster_path": "/poster.jpg",
+        "first_air_date": "2000-01-01",
+        "last_air_date": "2024-01-01",
+        "status": "Returning Series",
+        "number_of_seasons": seasons,
+        "number_of_episodes": seasons * episodes,
+        "episode_run_time": [45],
+        "genres": [{"id": 18, "name": "Drama"}],
+        "production_companies": [{"id": 1, "name": text(2).title()}],
+        "production_countries": [{"iso_3166_1": "US", "name": "United States"}],
+        "spoken_languages": [{"english_name": "English", "name": "English"}],
+        "seasons": [],
+        "recommendations": {"results": []},
+    }
+
+    for season_number in range(1, seasons + 1):
+        season = {
+            "id": season_number,
+            "name": f"Season {season_number}",
+            "overview": text(40),
+            "poster_path": f"/season{season_number}.jpg",
+            "season_number": season_number,
+            "air_date": f"{1999 + season_number}-01-01",
+            "episode_count": episodes,
+        }
+        response["seasons"].append(season)
+        response[f"season/{season_number}"] = {
+            **season,
+            "episodes": [
+                {
+                    "id": season_number * 1000 + episode_number,
+                    "name": text(4).title(),
+                    "overview": text(50),
+                    "air_date": f"{1999 + season_number}-01-{episode_number:02}",
+                    "episode_number": episode_number,
+                    "episode_type": "standard",
+                    "production_code": "",
+                    "runtime": 45,
+                    "season_number": season_number,
+                    "show_id": 1,
+                    "still_path": f"/{rng.getrandbits(64):016x}.jpg",
+                    "vote_average": round(rng.uniform(5, 9), 1),
+                    "vote_count": rng.randint(0, 500),
+                    "crew": [person(index) for index in range(4)],
+                    "guest_stars": [person(index) for index in range(6)],
+                }
+                for episode_number in range(1, episodes + 1)
+            ],
+        }
+
+    return response
+
+
+def synthetic_tv_metadata(seasons, episodes):
+    """Return the core and tv_with_seasons metadata of a generated tv show."""
+    response = synthetic_tv_response(seasons, episodes)
+    tv_metadata = tmdb.process_tv(response)
+    tv_with_seasons_metadata = dict(tv_metadata)
+    for season_number in range(1, seasons + 1):
+        tv_with_seasons_metadata[f"season/{season_number}"] = tmdb.process_season(
+            response[f"season/{season_number}"],
+        )
+    return tv_metadata, tv_with_seasons_metadata
@@ -1,12 +1,20 @@
 import datetime
 from datetime import date
+from io import StringIO
 from pathlib import Path
+from unittest.mock import patch
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from app.models import TV, Anime, Episode, Item, Season
+from app import database, items
+from app.models import TV, Anime, Episode, Item, LibraryEntry, Season
+from app.providers import services
+from app.tests.helpers import synthetic_tv_metadata
 
 mock_path = Path(__file__).resolve().parent / "mock_data"
 
@@ -440,3 +448,415 @@ class EpisodeModel(TestCase):
 
         # if when all episodes are created, the season status should be "Completed"
         self.assertEqual(self.season.status, "Completed")
+
+
+class Aggregates(TestCase):
+    """Test the stored aggregates of seasons and TV shows."""
+
+    def setUp(self):
+        """Create a TV show with two planned seasons."""
+        self.credentials = {"username": "test", "password": "12345"}
+        self.user = get_user_model().objects.create_user(**self.credentials)
+
+        item_tv = Item.objects.create(
+            media_id=1668,
+            source="tmdb",
+            media_type="tv",
+            title="Friends",
+            image="http://example.com/image.jpg",
+        )
+        self.tv = TV.objects.create(item=item_tv, user=self.user, status="Planning")
+
+        # planned seasons don't check the metadata when watching episodes
+        self.seasons = []
+        for season_number in (1, 2):
+            item_season = Item.objects.create(
+                media_id=1668,
+                source="tmdb",
+                media_type="season",
+                title="Friends",
+                image="http://example.com/image.jpg",
+                season_number=season_number,
+            )
+            self.seasons.append(
+                Season.objects.create(
+                    item=item_season,
+                    related_tv=self.tv,
+                    user=self.user,
+                    status="Planning",
+                ),
+            )
+
+    def watch(self, season, episode_number, watch_date, repeats=0):
+        """Create a watched episode of the season."""
+        item = Item.objects.create(
+            media_id=1668,
+            source="tmdb",
+            media_type="episode",
+            title="Friends",
+            image="http://example.com/image.jpg",
+            season_number=season.item.season_number,
+            episode_number=episode_number,
+        )
+        return Episode.objects.create(
+            item=item,
+            related_season=season,
+            watch_date=watch_date,
+            repeats=repeats,
+        )
+
+    def test_updated_on_watch(self):
+        """Watching episodes updates the season and the TV show."""
+        self.watch(self.seasons[0], 1, date(2023, 6, 1))
+        self.watch(self.seasons[0], 2, date(2023, 6, 2), repeats=2)
+        self.watch(self.seasons[1], 1, date(2023, 6, 4))
+
+        season = Season.objects.get(id=self.seasons[0].id)
+        self.assertEqual(season.progress, 2)
+        self.assertEqual(season.repeats, 2)
+        self.assertEqual(season.start_date, date(2023, 6, 1))
+        self.assertEqual(season.end_date, date(2023, 6, 2))
+
+        tv = TV.objects.get(id=self.tv.id)
+        self.assertEqual(tv.progress, 3)
+        self.assertEqual(tv.repeats, 2)
+        self.assertEqual(tv.start_date, date(2023, 6, 1))
+        self.assertEqual(tv.end_date, date(2023, 6, 4))
+        # the loaded instances are refreshed
+        self.assertEqual(self.tv.progress, 3)
+
+    def test_updated_on_delete(self):
+        """Deleting episodes and seasons updates the aggregates."""
+        episode = self.watch(self.seasons[0], 1, date(2023, 6, 1))
+        self.watch(self.seasons[1], 1, date(2023, 6, 4))
+
+        episode.delete()
+        self.assertEqual(Season.objects.get(id=self.seasons[0].id).progress, 0)
+        self.assertEqual(TV.objects.get(id=self.tv.id).start_date, date(2023, 6, 4))
+
+        self.seasons[1].delete()
+        tv = TV.objects.get(id=self.tv.id)
+        self.assertEqual(tv.progress, 0)
+        self.assertIsNone(tv.end_date)
+
+    def test_updated_on_item_delete(self):
+        """Seasons deleted in cascade with their item update the TV show."""
+        self.watch(self.seasons[0], 1, date(2023, 6, 1))
+
+        self.seasons[0].item.delete()
+
+        self.assertEqual(TV.objects.get(id=self.tv.id).progress, 0)
+
+    def test_stale_save(self):
+        """Saving an instance loaded before the episodes keeps the aggregates."""
+        season = Season.objects.get(id=self.seasons[0].id)
+        tv = TV.objects.get(id=self.tv.id)
+        self.watch(self.seasons[0], 1, date(2023, 6, 1))
+
+        season.notes = "Rewatch"
+        season.save()
+        tv.score = 9
+        tv.save()
+
+        season = Season.objects.get(id=self.seasons[0].id)
+        self.assertEqual((season.notes, season.progress), ("Rewatch", 1))
+        tv = TV.objects.get(id=self.tv.id)
+        self.assertEqual((tv.score, tv.progress), (9, 1))
+
+    def test_sorted_in_sql(self):
+        """TV shows are sorted by their aggregates in the database."""
+        self.watch(self.seasons[0], 1, date(2023, 6, 1))
+        item_tv = Item.objects.create(
+            media_id=1399,
+            source="tmdb",
+            media_type="tv",
+            title="Game of Thrones",
+            image="http://example.com/image.jpg",
+        )
+        TV.objects.create(item=item_tv, user=self.user, status="Planning")
+
+        media_list = database.get_media_list(self.user, "tv", ["All"], "start_date")
+        # a queryset instead of a list sorted in Python
+        self.assertEqual(media_list[0].id, self.tv.id)
+        self.assertEqual(media_list.count(), 2)
+
+    def test_command(self):
+        """The command backfills and verifies the aggregates."""
+        self.watch(self.seasons[0], 1, date(2023, 6, 1))
+        TV.objects.update(progress=0)
+        Season.objects.update(end_date=None)
+
+        with self.assertRaises(CommandError):
+            call_command("update_aggregates", "--check", stdout=StringIO())
+
+        call_command("update_aggregates", stdout=StringIO())
+        call_command("update_aggregates", "--check", stdout=StringIO())
+        self.assertEqual(TV.objects.get(id=self.tv.id).progress, 1)
+
+
+class TVCompletedQueries(TestCase):
+    """Test the queries made to complete a TV show."""
+
+    def setUp(self):
+        """Create a user."""
+        self.user = get_user_model().objects.create_user(username="test")
+
+    def count_queries(self, seasons, episodes):
+        """Return the queries made to complete a generated TV show."""
+        tv_metadata, tv_with_seasons_metadata = synthetic_tv_metadata(
+            seasons,
+            episodes,
+        )
+
+        item = Item.objects.create(
+            media_id=seasons * 1000 + episodes,
+            source="manual",
+            media_type="tv",
+            title=tv_metadata["title"],
+            image=tv_metadata["image"],
+        )
+        tv = TV.objects.create(item=item, user=self.user, status="In progress")
+
+        with (
+            patch.object(services, "get_core_metadata", return_value=tv_metadata),
+            patch.object(
+                services,
+                "get_media_metadata",
+                return_value=tv_with_seasons_metadata,
+            ),
+            CaptureQueriesContext(connection) as queries,
+        ):
+            tv.status = "Completed"
+            tv.save()
+
+        return len(queries)
+
+    def test_constant_queries(self):
+        """The queries don't grow with the number of seasons and episodes.
+
+        Only the batches of the bulk inserts do on large shows.
+        """
+        self.assertEqual(self.count_queries(2, 3), self.count_queries(6, 10))
+
+    def test_benchmark_command(self):
+        """The benchmark reports the same queries for each show size."""
+        out = StringIO()
+        call_command(
+            "benchmark_tv_completed",
+            seasons=[1, 3],
+            episodes=[2, 5],
+            stdout=out,
+        )
+
+        rows = [line.split() for line in out.getvalue().splitlines()[1:]]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(len({queries for _, _, queries in rows}), 1)
+
+
+class ItemResolver(TestCase):
+    """Test the bulk resolution of items."""
+
+    def setUp(self):
+        """Create an existing item."""
+        self.item = Item.objects.create(
+            media_id=1668,
+            source="tmdb",
+            media_type="tv",
+            title="Friends",
+            image="http://example.com/image.jpg",
+        )
+
+    def test_resolve_items(self):
+        """Existing items are read and missing ones created in bulk."""
+        keys = {
+            (1668, "tmdb", "tv"): None,
+            (1668, "tmdb", "season", 1): {"title": "Friends", "image": "season.jpg"},
+            (1668, "tmdb", "episode", 1, 1): {"title": "Friends", "image": "ep.jpg"},
+        }
+        with self.assertNumQueries(3):
+            resolved = items.resolve_items(keys)
+
+        self.assertEqual(resolved[1668, "tmdb", "tv", None, None], self.item)
+        season_item = resolved[1668, "tmdb", "season", 1, None]
+        self.assertEqual(season_item.image, "season.jpg")
+        self.assertEqual(Item.objects.count(), 3)
+
+    def test_identity_map(self):
+        """Items resolved before in the scope are served without a query."""
+        with items.item_resolver("test") as resolver:
+            item = items.resolve_item(media_id="1668", source="tmdb", media_type="tv")
+            with self.assertNumQueries(0):
+                repeated = items.resolve_item(
+                    media_id=1668,
+                    source="tmdb",
+                    media_type="tv",
+                )
+
+        self.assertIs(item, repeated)
+        self.assertEqual(item, self.item)
+        self.assertEqual((resolver.hits, resolver.misses), (1, 1))
+        self.assertIsNone(items.current_resolver.get())
+
+    @patch("app.items.MAX_ITEMS", 2)
+    def test_eviction(self):
+        """The oldest items are evicted past the size limit."""
+        keys = [(1668, "tmdb", "season", number) for number in (1, 2, 3)]
+        with items.item_resolver("test") as resolver:
+            for key in keys:
+                items.resolve_items({key: {"title": "Friends", "image": "s.jpg"}})
+
+        self.assertEqual(
+            list(resolver.items),
+            [items.get_key(*key) for key in keys[1:]],
+        )
+
+    def test_rollback(self):
+        """Items created in a rolled back transaction are forgotten."""
+        with items.item_resolver("test") as resolver:
+            with self.assertRaises(ValueError), items.atomic():
+                items.resolve_item(
+                    {"title": "Friends", "image": "season.jpg"},
+                    media_id=1668,
+                    source="tmdb",
+                    media_type="season",
+                    season_number=1,
+                )
+                raise ValueError
+
+            self.assertEqual(resolver.items, {})
+            season_item = items.resolve_item(
+                {"title": "Friends", "image": "season.jpg"},
+                media_id=1668,
+                source="tmdb",
+                media_type="season",
+                season_number=1,
+            )
+
+        self.assertTrue(Item.objects.filter(pk=season_item.pk).exists())
+
+    def test_deleted_item(self):
+        """Deleted items are forgotten by the identity map."""
+        with items.item_resolver("test") as resolver:
+            items.resolve_item(media_id=1668, source="tmdb", media_type="tv")
+            self.item.delete()
+
+            self.assertEqual(resolver.items, {})
+
+
+class Library(TestCase):
+    """Test the library index of the tracked media."""
+
+    def setUp(self):
+        """Create a planned manual anime, its metadata is read from the database."""
+        self.credentials = {"username": "test", "password": "12345"}
+        self.user = get_user_model().objects.create_user(**self.credentials)
+
+        item_anime = Item.objects.create(
+            media_id=1,
+            source="manual",
+            media_type="anime",
+            title="Cowboy Bebop",
+            image="http://example.com/image.jpg",
+        )
+        self.anime = Anime.objects.create(
+            item=item_anime,
+            user=self.user,
+            status="Planning",
+        )
+
+    def test_synced_by_signals(self):
+        """Saving and deleting media updates its library entry."""
+        entry = LibraryEntry.objects.get(user=self.user)
+        self.assertEqual(
+            (entry.media_type, entry.object_id, entry.status),
+            ("anime", self.anime.id, "Planning"),
+        )
+
+        self.anime.status = "In progress"
+        self.anime.score = 9
+        self.anime.save()
+        entry = LibraryEntry.objects.get(user=self.user)
+        self.assertEqual((entry.status, entry.score), ("In progress", 9))
+
+        self.anime.delete()
+        self.assertFalse(LibraryEntry.objects.exists())
+
+    def test_in_progress(self):
+        """The queries don't grow with the in progress media.
+
+        One on the index, one per media type and the episodes of seasons.
+        """
+        self.anime.status = "In progress"
+        self.anime.save()
+        item_tv = Item.objects.create(
+            media_id=2,
+            source="manual",
+            media_type="tv",
+            title="Friends",
+            image="http://example.com/image.jpg",
+        )
+        tv = TV.objects.create(item=item_tv, user=self.user, status="In progress")
+        seasons = []
+        for season_number in (1, 2):
+            item_season = Item.objects.create(
+                media_id=2,
+                source="manual",
+                media_type="season",
+                title="Friends",
+                image="http://example.com/image.jpg",
+                season_number=season_number,
+            )
+            seasons.append(
+                Season.objects.create(
+                    item=item_season,
+                    related_tv=tv,
+                    user=self.user,
+                    status="In progress",
+                ),
+            )
+        # the second episode keeps the season in progress
+        item_episodes = [
+            Item.objects.create(
+                media_id=2,
+                source="manual",
+                media_type="episode",
+                title="Friends",
+                image="http://example.com/image.jpg",
+                season_number=1,
+                episode_number=episode_number,
+            )
+            for episode_number in (1, 2)
+        ]
+        episode = Episode.objects.create(
+            item=item_episodes[0],
+            related_season=seasons[0],
+            watch_date=date(2023, 6, 1),
+        )
+
+        with self.assertNumQueries(5):
+            list_by_type = database.get_in_progress(self.user)
+            # read like on the home page
+            titles = [
+                media.item.title
+                for media_list in list_by_type.values()
+                for media in media_list
+            ]
+            current_episodes = [
+                season.current_episode for season in list_by_type["season"]
+            ]
+        self.assertEqual(list(list_by_type), ["season", "anime"])
+        self.assertEqual(list_by_type["anime"], [self.anime])
+        self.assertCountEqual(list_by_type["season"], seasons)
+        self.assertEqual(titles, ["Friends", "Friends", "Cowboy Bebop"])
+        self.assertCountEqual(current_episodes, [episode, None])
+
+    def test_command(self):
+        """The command rebuilds and verifies the library entries."""
+        LibraryEntry.objects.all().delete()
+
+        with self.assertRaises(CommandError):
+            call_command("sync_library", "--check", stdout=StringIO())
+
+        call_command("sync_library", stdout=StringIO())
+        call_command("sync_library", "--check", stdout=StringIO())
+        self.assertEqual(LibraryEntry.objects.get().item, self.anime.item)
@@ -1,11 +1,33 @@
+import asyncio
+import datetime
 import json
+import time
+from io import StringIO
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import ANY, patch
 
+import requests
 from django.conf import settings
-from django.test import TestCase
+from django.core.cache import cache as django_cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-from app.providers import igdb, mal, tmdb
+from app import tasks
+from app.models import Item, MetadataSnapshot
+from app.providers import (
+    cache,
+    igdb,
+    mal,
+    mangaupdates,
+    metrics,
+    ratelimit,
+    search_index,
+    services,
+    tmdb,
+)
+from app.providers.serializers import COMPRESSED_MARKER, CompressedSerializer
 
 mock_path = Path(__file__).resolve().parent / "mock_data"
 
@@ -53,6 +75,81 @@ class Search(TestCase):
         for game in response:
             self.assertTrue(all(key in game for key in required_keys))
 
+    @patch("app.providers.services.close_old_connections")
+    @patch("app.providers.services.search")
+    def test_search_thread_closes_connections(self, mock_search, mock_close):
+        """The search threads close their database connections."""
+        mock_search.return_value = []
+
+        self.assertEqual(services.search_with_timeout("tv", "Breaking Bad"), [])
+        self.assertEqual(mock_close.call_count, 2)
+
+
+class SearchIndex(TestCase):
+    """Test the normalized search keys and the prefix index."""
+
+    def setUp(self):
+        """Start with empty indexes."""
+        search_index.indexes.clear()
+
+    def tearDown(self):
+        """Clear the indexes and the cached searches."""
+        search_index.indexes.clear()
+        cache.delete(search_index.get_search_key("tv", "breaking bad"))
+
+    def test_normalized_key(self):
+        """Equivalent queries share the same cache key."""
+        key = search_index.get_search_key("tv", "breaking bad")
+
+        self.assertEqual(search_index.get_search_key("tv", "Breaking Bad"), key)
+        self.assertEqual(search_index.get_search_key("tv", " breaking  bad "), key)
+        self.assertEqual(search_index.normalize("Pokémon"), "pokemon")
+        self.assertEqual(search_index.normalize("進撃の巨人"), "進撃の巨人")
+
+    @patch("app.providers.services.api_request")
+    def test_equivalent_queries_cached(self, mock_request):
+        """Equivalent queries are sent upstream once."""
+        mock_request.return_value = {"results": []}
+
+        tmdb.search("tv", "Breaking Bad")
+        tmdb.search("tv", "breaking  bad ")
+
+        mock_request.assert_called_once()
+
+    def test_tracked_items_suggested(self):
+        """Tracked items are suggested by the start of any word."""
+        Item.objects.create(
+            media_id=1396,
+            source="tmdb",
+            media_type="tv",
+            title="Breaking Bad",
+            image="http://example.com/image.jpg",
+        )
+
+        suggestions = services.suggest("tv", "ba")
+
+        self.assertEqual([media["title"] for media in suggestions], ["Breaking Bad"])
+        self.assertEqual(services.suggest("movie", "ba"), [])
+
+    def test_search_results_suggested(self):
+        """Results of recent searches are suggested."""
+        search_index.add_results(
+            "anime",
+            "mal",
+            [
+                {
+                    "media_id": 1,
+                    "source": "mal",
+                    "media_type": "anime",
+                    "title": "Cowboy Bebop",
+                    "image": "http://example.com/image.jpg",
+                },
+            ],
+        )
+
+        self.assertEqual(len(services.suggest("anime", "Cowboy b")), 1)
+        self.assertEqual(services.suggest("anime", "bebop x"), [])
+
 
 class Metadata(TestCase):
     """Test the external API calls for media details."""
@@ -111,6 +208,7 @@ class Metadata(TestCase):
             movie_response = json.load(file)
         mock_data.return_value.json.return_value = movie_response
         mock_data.return_value.status_code = 200
+        mock_data.return_value.headers = {}
 
         response = tmdb.movie("0")
         self.assertEqual(response["title"], "Unknown Movie")
@@ -130,3 +228,914 @@ class Metadata(TestCase):
         self.assertEqual(response["details"]["format"], "Main game")
         self.assertEqual(response["details"]["release_date"], "2015-05-19")
         self.assertEqual(response["details"]["themes"], "Action, Fantasy, Open world")
+
+
+class MetadataMemo(TestCase):
+    """Test the memoization of metadata lookups within a request or task."""
+
+    @patch("app.providers.tmdb.movie")
+    def test_memo_hits(self, mock_movie):
+        """Repeated lookups inside a memo only reach the provider once."""
+        mock_movie.return_value = {"title": "Perfect Blue", "max_progress": 1}
+
+        with services.metadata_memo("test") as memo:
+            first = services.get_media_metadata("movie", "10494", "tmdb")
+            second = services.get_media_metadata("movie", 10494, "tmdb")
+
+        self.assertIs(first, second)
+        self.assertEqual(mock_movie.call_count, 1)
+        self.assertEqual(memo.stats(), {"hits": 1, "misses": 1, "size": 1})
+
+    @patch("app.providers.tmdb.movie")
+    def test_no_memo_outside_scope(self, mock_movie):
+        """Lookups outside of a request or task are not memoized."""
+        mock_movie.return_value = {"title": "Perfect Blue", "max_progress": 1}
+
+        services.get_media_metadata("movie", "10494", "tmdb")
+        services.get_media_metadata("movie", "10494", "tmdb")
+
+        self.assertEqual(mock_movie.call_count, 2)
+        self.assertIsNone(services.current_memo.get())
+
+
+class ProviderCache(TestCase):
+    """Test the in-process tier of the provider cache."""
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted when the cache is full."""
+        local = cache.LocalCache(max_size=2, ttl=60)
+        local.set("a", 1)
+        local.set("b", 2)
+        local.get("a")
+        local.set("c", 3)
+
+        self.assertIsNone(local.get("b"))
+        self.assertEqual(local.get("a"), 1)
+        self.assertEqual(local.get("c"), 3)
+        self.assertEqual(local.stats()["evictions"], 1)
+
+    def test_ttl_expiration(self):
+        """Entries are dropped once their TTL is over."""
+        local = cache.LocalCache(max_size=2, ttl=0)
+        local.set("a", 1)
+
+        self.assertIsNone(local.get("a"))
+        self.assertEqual(local.stats()["expirations"], 1)
+
+    def test_values_are_copies(self):
+        """Modifying a returned value doesn't change the cached one."""
+        local = cache.LocalCache(max_size=2, ttl=60)
+        local.set("a", {"title": "Perfect Blue"})
+        local.get("a")["title"] = "Changed"
+
+        self.assertEqual(local.get("a"), {"title": "Perfect Blue"})
+
+    def test_redis_fallback(self):
+        """Values missing from the local tier are read from Redis."""
+        cache.set("test_redis_fallback", {"title": "Perfect Blue"})
+        cache.get_local_cache().delete("test_redis_fallback")
+
+        self.assertEqual(cache.get("test_redis_fallback"), {"title": "Perfect Blue"})
+        self.assertEqual(
+            cache.get_local_cache().get("test_redis_fallback")["value"],
+            {"title": "Perfect Blue"},
+        )
+
+    def test_invalidation_from_other_process(self):
+        """Invalidations published by other processes drop the local copy."""
+        cache.get_local_cache().set("test_invalidation", 1)
+        cache.handle_invalidation({"data": b"0:test_invalidation"})
+
+        self.assertIsNone(cache.get_local_cache().get("test_invalidation"))
+
+
+class MetadataSnapshots(TestCase):
+    """Test persisting the cached metadata in the database."""
+
+    def test_written_through(self):
+        """Metadata written to the cache is persisted with its lookup."""
+        cache.set("season_900030_1", {"season_number": 1})
+        cache.set_many({"game_900030": {"title": "Batched"}})
+        cache.set("search_persisted", ["not metadata"])
+
+        snapshot = MetadataSnapshot.objects.get(media_id="900030", media_type="season")
+        self.assertEqual(snapshot.lookup, ("tmdb", "season", "900030", 1))
+        self.assertEqual(snapshot.data, {"season_number": 1})
+        self.assertTrue(
+            MetadataSnapshot.objects.filter(source="igdb", media_id="900030").exists(),
+        )
+        self.assertEqual(MetadataSnapshot.objects.count(), 2)
+
+    def test_updated(self):
+        """Fetching the metadata again updates the existing snapshot."""
+        cache.set("movie_900031", {"title": "Old"})
+        cache.set("movie_900031", {"title": "New"})
+
+        snapshot = MetadataSnapshot.objects.get(media_id="900031")
+        self.assertEqual(snapshot.data, {"title": "New"})
+
+    @patch("requests.Session.get")
+    def test_rebuilt_after_eviction(self, mock_request):
+        """Metadata evicted from Redis is read from the database and cached again."""
+        cache.set("movie_900032", {"title": "Persisted"})
+        cache.redis_cache.delete("movie_900032")
+        cache.get_local_cache().delete("movie_900032")
+
+        response = tmdb.movie(900032)
+
+        mock_request.assert_not_called()
+        self.assertEqual(response, {"title": "Persisted"})
+        self.assertEqual(
+            cache.redis_cache.get("movie_900032")["value"],
+            {"title": "Persisted"},
+        )
+
+
+class MetadataMany(TestCase):
+    """Test fetching the metadata of many media at once."""
+
+    @patch("app.providers.tmdb.movie")
+    def test_cached_and_duplicated(self, mock_movie):
+        """Cached entries aren't fetched and duplicates are fetched once."""
+        cache.set("movie_900001", {"title": "Cached"})
+        mock_movie.return_value = {"title": "Fetched"}
+
+        lookups = [
+            ("movie", "900001", "tmdb"),
+            ("movie", "900002", "tmdb"),
+            ("movie", 900002, "tmdb"),
+        ]
+        response = services.get_media_metadata_many(lookups)
+
+        mock_movie.assert_called_once_with("900002")
+        self.assertEqual(response[lookups[0]], {"title": "Cached"})
+        self.assertEqual(response[lookups[1]], {"title": "Fetched"})
+        self.assertEqual(response[lookups[2]], {"title": "Fetched"})
+
+    @patch("app.providers.tmdb.seasons")
+    def test_seasons_grouped(self, mock_seasons):
+        """Seasons of the same show are fetched in a single request."""
+        mock_seasons.return_value = {
+            "season/1": {"season_number": 1},
+            "season/2": {"season_number": 2},
+        }
+
+        lookups = [
+            ("season", 900003, "tmdb", (1,)),
+            ("season", 900003, "tmdb", (2,)),
+        ]
+        response = services.get_media_metadata_many(lookups)
+
+        mock_seasons.assert_called_once_with(900003, [1, 2])
+        self.assertEqual(response[lookups[1]], {"season_number": 2})
+
+    @patch("app.providers.services.api_request")
+    def test_seasons_single_request(self, mock_request):
+        """The title of the show is read from the request of its seasons."""
+        mock_request.return_value = {
+            "name": "Friends",
+            "season/1": {
+                "name": "Season 1",
+                "poster_path": None,
+                "season_number": 1,
+                "overview": "",
+                "air_date": None,
+                "episodes": [],
+            },
+        }
+
+        self.addCleanup(cache.delete, "season_900005_1")
+
+        response = tmdb.seasons(900005, [1])
+
+        mock_request.assert_called_once()
+        self.assertEqual(response["season/1"]["tv_title"], "Friends")
+
+    @patch("app.providers.tmdb.movie")
+    def test_failed_lookup_skipped(self, mock_movie):
+        """Lookups that fail upstream are left out of the result."""
+        mock_movie.side_effect = requests.exceptions.ConnectionError()
+
+        response = services.get_media_metadata_many([("movie", 900004, "tmdb")])
+
+        self.assertEqual(response, {})
+
+
+class CoreMetadata(TestCase):
+    """Test the core metadata tier used by progress and calendar updates."""
+
+    def tearDown(self):
+        """Clear the cache entries of the test media."""
+        for key in ("movie_900010", "core_movie_900011", "core_mal_anime_900012"):
+            cache.delete(key)
+
+    @patch("app.providers.services.api_request")
+    def test_taken_from_full_metadata(self, mock_request):
+        """Cached full metadata is used without a core request."""
+        full = tmdb.process_movie(
+            {
+                "title": "Cached",
+                "poster_path": None,
+                "overview": "",
+                "release_date": "2020-01-01",
+                "status": "Released",
+                "runtime": 90,
+                "genres": [],
+                "production_companies": [],
+                "production_countries": [],
+                "spoken_languages": [],
+                "recommendations": {"results": []},
+            },
+            900010,
+        )
+        cache.set("movie_900010", full)
+
+        core = tmdb.movie_core(900010)
+
+        mock_request.assert_not_called()
+        self.assertEqual(core, services.get_core(full))
+        self.assertNotIn("synopsis", core)
+        self.assertEqual(core["details"]["release_date"], "2020-01-01")
+
+    @patch("app.providers.services.api_request")
+    def test_lightweight_request(self, mock_request):
+        """The core request leaves out the appended responses."""
+        mock_request.return_value = {
+            "title": "Fetched",
+            "poster_path": None,
+            "release_date": "2020-01-01",
+            "status": "Released",
+        }
+
+        core = tmdb.movie_core(900011)
+        tmdb.movie_core(900011)
+
+        mock_request.assert_called_once()
+        self.assertNotIn("append_to_response", mock_request.call_args.kwargs["params"])
+        self.assertEqual(core["max_progress"], 1)
+        self.assertEqual(cache.get("core_movie_900011"), core)
+
+    @patch("app.providers.services.api_request")
+    def test_mal_fields(self, mock_request):
+        """Only the core fields are requested from MyAnimeList."""
+        mock_request.return_value = {
+            "title": "Fetched",
+            "media_type": "tv",
+            "status": "finished_airing",
+            "num_episodes": 12,
+        }
+
+        core = mal.anime_core(900012)
+
+        self.assertEqual(
+            mock_request.call_args.kwargs["params"]["fields"],
+            f"{mal.core_fields},num_episodes",
+        )
+        self.assertEqual(core["max_progress"], 12)
+
+
+class IGDBBatch(TestCase):
+    """Test fetching many games with IGDB multiqueries."""
+
+    def setUp(self):
+        """Cache an access token for the requests."""
+        cache.set("igdb_access_token", "token", 60)
+
+    def tearDown(self):
+        """Clear the cache entries of the test games."""
+        for key in ("igdb_access_token", "game_900040", "game_900041"):
+            cache.delete(key)
+
+    def game_response(self, media_id):
+        """Return a minimal IGDB game response."""
+        return {
+            "id": media_id,
+            "name": f"Game {media_id}",
+            "summary": "",
+            "category": 0,
+        }
+
+    @patch("app.providers.services.api_request")
+    def test_games_multiquery(self, mock_request):
+        """Uncached games are fetched in one request and cached per game."""
+        cache.set("game_900040", {"title": "Cached"})
+        mock_request.return_value = [
+            {"name": "games_0", "result": [self.game_response(900041)]},
+        ]
+
+        data = igdb.games(["900040", "900041", "900042"])
+
+        mock_request.assert_called_once()
+        query = mock_request.call_args.kwargs["data"]
+        self.assertIn("where id = (900041,900042)", query)
+        self.assertEqual(data[900040], {"title": "Cached"})
+        self.assertEqual(cache.get("game_900041")["title"], "Game 900041")
+        self.assertNotIn(900042, data)
+
+    @patch("app.providers.services.api_request")
+    def test_queries_split(self, mock_request):
+        """Games are split between the queries of a multiquery."""
+        mock_request.return_value = []
+
+        with patch("app.providers.igdb.GAMES_PER_QUERY", 2):
+            igdb.multiquery_games([1, 2, 3])
+
+        data = mock_request.call_args.kwargs["data"]
+        self.assertIn("where id = (1,2)", data)
+        self.assertIn("where id = (3)", data)
+
+    @patch("app.providers.igdb.games")
+    def test_metadata_many_batched(self, mock_games):
+        """Game lookups in bulk share a single IGDB batch."""
+        mock_games.return_value = {
+            900040: {"title": "Game 900040"},
+            900041: {"title": "Game 900041"},
+        }
+
+        response = services.get_media_metadata_many(
+            [("game", 900040, "igdb"), ("game", 900041, "igdb")],
+        )
+
+        mock_games.assert_called_once_with([900040, 900041])
+        self.assertEqual(len(response), 2)
+
+
+class StaleWhileRevalidate(TestCase):
+    """Test serving stale metadata while it's refreshed in the background."""
+
+    @override_settings(PROVIDER_CACHE_TMDB_SOFT_TTL=-1)
+    @patch("app.tasks.refresh_metadata.delay")
+    def test_stale_served_and_refreshed(self, mock_delay):
+        """A stale entry is returned and a refresh is queued only once."""
+        cache.set("movie_900010", {"title": "Stale"})
+
+        for _ in range(2):
+            response = services.get_media_metadata("movie", 900010, "tmdb")
+            self.assertEqual(response, {"title": "Stale"})
+
+        mock_delay.assert_called_once_with(
+            "movie",
+            900010,
+            "tmdb",
+            None,
+            ["movie_900010"],
+        )
+
+    @patch("app.tasks.refresh_metadata.delay")
+    def test_fresh_not_refreshed(self, mock_delay):
+        """A fresh entry doesn't queue a refresh."""
+        cache.set("movie_900011", {"title": "Fresh"})
+
+        services.get_media_metadata("movie", 900011, "tmdb")
+
+        mock_delay.assert_not_called()
+
+    @patch("requests.Session.get")
+    def test_refresh_task(self, mock_data):
+        """The refresh task fetches the entry again from the provider."""
+        with Path(mock_path / "metadata_movie_unknown.json").open() as file:
+            movie_response = json.load(file)
+        mock_data.return_value.json.return_value = movie_response
+        mock_data.return_value.status_code = 200
+        mock_data.return_value.headers = {}
+        cache.set("movie_900012", {"title": "Stale"})
+
+        tasks.refresh_metadata("movie", 900012, "tmdb", None, ["movie_900012"])
+
+        self.assertEqual(cache.get("movie_900012")["title"], "Unknown Movie")
+
+    @patch("app.providers.tmdb.seasons")
+    @patch("app.providers.tmdb.tv")
+    def test_refresh_owner_lookup(self, mock_tv, mock_seasons):
+        """Entries read by another lookup are fetched by their own one."""
+        mock_seasons.return_value = {"season/1": {"title": "Season 1"}}
+
+        tasks.refresh_metadata(
+            "season",
+            900013,
+            "tmdb",
+            [1],
+            ["season_900013_1", "tv_900013"],
+        )
+
+        mock_seasons.assert_called_once_with(900013, [1])
+        mock_tv.assert_called_once_with("900013")
+
+
+class ChangeFeeds(TestCase):
+    """Test refreshing the TMDB metadata that changed upstream."""
+
+    def setUp(self):
+        """Create the tracked items."""
+        for media_type, media_id, season_number in (
+            ("movie", "900020", None),
+            ("tv", "900021", None),
+            ("season", "900021", 1),
+            ("tv", "900022", None),
+        ):
+            Item.objects.create(
+                media_id=media_id,
+                source="tmdb",
+                media_type=media_type,
+                season_number=season_number,
+                title="Tracked",
+                image="http://example.com/image.jpg",
+            )
+
+    def tearDown(self):
+        """Reset the time of the last poll."""
+        django_cache.delete(tasks.CHANGES_SINCE_KEY)
+
+    def test_longer_soft_ttl(self):
+        """TMDB entries go stale later than the other providers."""
+        self.assertEqual(
+            cache.get_soft_ttl("tv_900021"),
+            settings.PROVIDER_CACHE_TMDB_SOFT_TTL,
+        )
+        self.assertEqual(
+            cache.get_soft_ttl("mal_anime_1"),
+            settings.PROVIDER_CACHE_SOFT_TTL,
+        )
+
+    @patch("app.tasks.refresh")
+    @patch("app.providers.tmdb.changes")
+    def test_tracked_changes_refreshed(self, mock_changes, mock_refresh):
+        """Only changed media that is tracked is refreshed."""
+        mock_changes.side_effect = lambda media_type, _: {
+            "movie": {900020, 999999},
+            "tv": {900021},
+        }[media_type]
+
+        with CaptureQueriesContext(connection) as queries:
+            tasks.refresh_changed_metadata()
+
+        # the ids of the feeds aren't sent to the database
+        self.assertFalse(any("999999" in query["sql"] for query in queries))
+        self.assertEqual(mock_refresh.call_count, 2)
+        mock_refresh.assert_any_call(
+            "movie",
+            900020,
+            "tmdb",
+            None,
+            ["movie_900020"],
+        )
+        mock_refresh.assert_any_call(
+            "tv_with_seasons",
+            900021,
+            "tmdb",
+            [1],
+            ["tv_900021", "season_900021_1"],
+        )
+        self.assertIsNotNone(django_cache.get(tasks.CHANGES_SINCE_KEY))
+
+    @patch("requests.Session.get")
+    def test_changes_paginated(self, mock_data):
+        """Every page of the change feed is read."""
+        mock_data.return_value.status_code = 200
+        mock_data.return_value.headers = {}
+        mock_data.return_value.json.side_effect = [
+            {"results": [{"id": 1}], "page": 1, "total_pages": 2},
+            {"results": [{"id": 2}], "page": 2, "total_pages": 2},
+        ]
+
+        changed = tmdb.changes("tv", datetime.date(2024, 1, 1))
+
+        self.assertEqual(changed, {1, 2})
+
+
+class MangaUpdatesSeries(TestCase):
+    """Test fetching the images of the related series of a manga."""
+
+    def tearDown(self):
+        """Clear the cached images of the test series."""
+        for series_id in (900030, 900031):
+            cache.delete(f"mangaupdates_series_thumb_{series_id}")
+
+    @patch("app.providers.mangaupdates.fetch_series_images")
+    def test_cached_images(self, mock_fetch):
+        """Cached images are used without requests."""
+        cache.set("mangaupdates_series_thumb_900030", "http://example.com/1.jpg")
+
+        images, complete = mangaupdates.get_series_images([900030])
+
+        mock_fetch.assert_not_called()
+        self.assertEqual(images, {900030: "http://example.com/1.jpg"})
+        self.assertTrue(complete)
+
+    @patch("app.providers.mangaupdates.fetch_series_images")
+    def test_missing_images_fetched(self, mock_fetch):
+        """Only the uncached images are fetched, failed ones are left out."""
+        cache.set("mangaupdates_series_thumb_900030", "http://example.com/1.jpg")
+
+        def fetch(series_ids, lane, results):  # noqa: ARG001
+            results.update({900031: "http://example.com/2.jpg", 900032: None})
+
+        mock_fetch.side_effect = fetch
+
+        images, _ = mangaupdates.get_series_images([900030, 900031, 900032, 900031])
+
+        mock_fetch.assert_called_once_with([900031, 900032], "interactive", ANY)
+        self.assertEqual(len(images), 2)
+        self.assertEqual(
+            cache.get("mangaupdates_series_thumb_900031"),
+            "http://example.com/2.jpg",
+        )
+
+    @patch("app.providers.mangaupdates.SERIES_IMAGES_TIMEOUT", 0.1)
+    @patch("app.providers.mangaupdates.fetch_series_images")
+    def test_slow_images(self, mock_fetch):
+        """Images not fetched before the timeout are shown as placeholders."""
+
+        async def fetch(series_ids, lane, results):  # noqa: ARG001
+            results[900030] = "http://example.com/1.jpg"
+            await asyncio.sleep(10)
+
+        mock_fetch.side_effect = fetch
+
+        images, complete = mangaupdates.get_series_images([900030, 900031])
+
+        self.assertEqual(
+            images,
+            {900030: "http://example.com/1.jpg", 900031: settings.IMG_NONE},
+        )
+        self.assertFalse(complete)
+        self.assertIsNone(cache.get("mangaupdates_series_thumb_900031"))
+
+    @patch("app.providers.mangaupdates.fetch_manga")
+    def test_incomplete_manga_not_cached(self, mock_fetch):
+        """A manga with timed out images is fetched again on the next lookup."""
+        mock_fetch.return_value = ({"title": "Berserk"}, False)
+
+        mangaupdates.manga(900033)
+        mangaupdates.manga(900033)
+
+        self.assertEqual(mock_fetch.call_count, 2)
+        self.assertIsNone(cache.get("mangaupdates_manga_900033"))
+
+    def test_client_reused(self):
+        """The event loop of the pooled client is started once per process."""
+        self.assertIs(mangaupdates.get_client_loop(), mangaupdates.get_client_loop())
+
+
+class SingleFlight(TestCase):
+    """Test coalescing concurrent fetches of the same missing key."""
+
+    @patch("requests.Session.get")
+    def test_fetch_releases_lock(self, mock_data):
+        """The process holding the lock fetches the key and releases the lock."""
+        with Path(mock_path / "metadata_movie_unknown.json").open() as file:
+            movie_response = json.load(file)
+        mock_data.return_value.json.return_value = movie_response
+        mock_data.return_value.status_code = 200
+        mock_data.return_value.headers = {}
+
+        response = tmdb.movie(900020)
+
+        self.assertEqual(response["title"], "Unknown Movie")
+        self.assertIsNone(cache.redis_cache.get("lock_movie_900020"))
+
+    @patch("requests.Session.get")
+    @patch("app.providers.cache.time.sleep")
+    def test_waiter_reads_fetched_key(self, mock_sleep, mock_data):
+        """A process waiting for the lock reads the key instead of fetching it."""
+        cache.redis_cache.add("lock_movie_900021", "other", 30)
+
+        def finish_other_fetch(_):
+            cache.set("movie_900021", {"title": "Fetched by other"})
+            cache.redis_cache.delete("lock_movie_900021")
+
+        mock_sleep.side_effect = finish_other_fetch
+        coalesced = cache.stats()["coalesced"]
+
+        response = tmdb.movie(900021)
+
+        mock_data.assert_not_called()
+        self.assertEqual(response, {"title": "Fetched by other"})
+        self.assertEqual(cache.stats()["coalesced"], coalesced + 1)
+
+
+class ConditionalRequests(TestCase):
+    """Test revalidating cached metadata with conditional requests."""
+
+    @patch("requests.Session.get")
+    def test_validators_stored(self, mock_data):
+        """The validators of the response are stored with the metadata."""
+        with Path(mock_path / "metadata_movie_unknown.json").open() as file:
+            movie_response = json.load(file)
+        mock_data.return_value.json.return_value = movie_response
+        mock_data.return_value.status_code = 200
+        mock_data.return_value.headers = {"ETag": '"v1"'}
+
+        tmdb.movie(900040)
+
+        self.assertEqual(cache.peek("movie_900040")["validators"], {"etag": '"v1"'})
+        snapshot = MetadataSnapshot.objects.get(media_id="900040")
+        self.assertEqual(snapshot.validators, {"etag": '"v1"'})
+
+    @patch("requests.Session.get")
+    def test_not_modified(self, mock_data):
+        """A 304 response extends the cached entry without processing it."""
+        mock_data.return_value.status_code = 304
+        cache.set("movie_900041", {"title": "Cached"}, validators={"etag": '"v1"'})
+        fetched_at = cache.peek("movie_900041")["fetched_at"]
+
+        with cache.refreshing(["movie_900041"]):
+            response = tmdb.movie(900041)
+
+        self.assertEqual(response, {"title": "Cached"})
+        self.assertEqual(
+            mock_data.call_args.kwargs["headers"],
+            {"If-None-Match": '"v1"'},
+        )
+        mock_data.return_value.json.assert_not_called()
+        self.assertGreaterEqual(cache.peek("movie_900041")["fetched_at"], fetched_at)
+
+
+class CacheSerializer(TestCase):
+    """Test the compressed serializer of the cache."""
+
+    def test_small_values_not_compressed(self):
+        """Values below the threshold and integers are stored as is."""
+        serializer = CompressedSerializer(min_size=1024)
+
+        self.assertNotEqual(serializer.dumps({"a": 1})[:1], COMPRESSED_MARKER)
+        self.assertEqual(serializer.dumps(5), 5)
+        self.assertEqual(serializer.loads(b"5"), 5)
+
+    def test_large_values_compressed(self):
+        """Values above the threshold are compressed and read back."""
+        serializer = CompressedSerializer(min_size=1024)
+        value = {"episodes": [{"overview": "Same overview."}] * 500}
+
+        data = serializer.dumps(value)
+
+        self.assertEqual(data[:1], COMPRESSED_MARKER)
+        self.assertEqual(serializer.loads(data), value)
+
+    def test_benchmark_command(self):
+        """The benchmark generates a tv show and its seasons by default."""
+        out = StringIO()
+        call_command(
+            "benchmark_cache_serializers",
+            seasons=2,
+            episodes=2,
+            iterations=1,
+            stdout=out,
+        )
+
+        self.assertIn("3 entries", out.getvalue())
+        self.assertIn("pickle+zlib", out.getvalue())
+
+    def test_benchmark_command_recorded(self):
+        """The benchmark can run on the recorded responses."""
+        out = StringIO()
+        call_command(
+            "benchmark_cache_serializers",
+            recorded=True,
+            iterations=1,
+            stdout=out,
+        )
+
+        self.assertIn("2 entries", out.getvalue())
+
+
+class ProviderMetrics(TestCase):
+    """Test the instrumentation of the provider requests."""
+
+    def test_response_hook(self):
+        """Responses are counted by provider, endpoint and status."""
+        response = requests.Response()
+        response.url = "https://api.themoviedb.org/3/tv/1668/season/1?api_key=x"
+        response.status_code = 200
+        response.elapsed = datetime.timedelta(seconds=0.2)
+
+        metrics.response_hook("TMDB")(response)
+        rendered = metrics.render()
+
+        self.assertIn(
+            'yamtrack_provider_requests_total{provider="tmdb",'
+            'endpoint="/3/tv/{id}/season/{id}",status="200"}',
+            rendered,
+        )
+        self.assertIn(
+            'yamtrack_provider_request_duration_seconds_bucket{provider="tmdb",'
+            'endpoint="/3/tv/{id}/season/{id}",le="+Inf"}',
+            rendered,
+        )
+
+    def test_key_family(self):
+        """Cache keys are grouped by their prefix."""
+        self.assertEqual(metrics.key_family("mal_anime_1"), "mal_anime")
+        self.assertEqual(metrics.key_family("search_tv_query"), "search")
+        self.assertEqual(metrics.key_family("igdb_access_token"), "other")
+
+
+class RetryPolicy(TestCase):
+    """Test retrying, failing fast and pausing unavailable providers."""
+
+    def tearDown(self):
+        """Close the circuit of the test provider."""
+        cache.get_redis_client().delete(
+            "circuit_open_TEST",
+            "circuit_failures_TEST",
+        )
+        services.circuit_states.clear()
+
+    def get_response(self, status_code, headers=None):
+        """Return a response of the provider with the status code."""
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers.update(headers or {})
+        response.url = "https://example.com/test"
+        response._content = b"{}"  # noqa: SLF001
+        return response
+
+    @patch("requests.Session.get")
+    def test_rate_limited(self, mock_get):
+        """A Retry-After over the deadline fails fast and opens the circuit."""
+        mock_get.return_value = self.get_response(429, {"Retry-After": "60"})
+
+        with self.assertRaises(services.ProviderUnavailableError) as context:
+            services.api_request("TEST", "GET", "https://example.com/test")
+        self.assertEqual(context.exception.retry_after, 60)
+
+        # the next request doesn't reach the provider
+        with self.assertRaises(services.ProviderUnavailableError):
+            services.api_request("TEST", "GET", "https://example.com/test")
+        mock_get.assert_called_once()
+
+    @patch("app.providers.services.time.sleep")
+    @patch("requests.Session.get")
+    def test_transient_error_retried(self, mock_get, mock_sleep):
+        """Timeouts are retried after a backoff."""
+        mock_get.side_effect = [
+            requests.exceptions.ReadTimeout(),
+            self.get_response(200),
+        ]
+
+        response = services.api_request("TEST", "GET", "https://example.com/test")
+
+        self.assertEqual(response, {})
+        mock_sleep.assert_called_once()
+
+    @patch("requests.Session.get")
+    def test_client_error_not_retried(self, mock_get):
+        """Client errors are raised without retrying."""
+        mock_get.return_value = self.get_response(404)
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            services.api_request("TEST", "GET", "https://example.com/test")
+        mock_get.assert_called_once()
+
+    @patch("app.providers.services.time.sleep")
+    @patch("requests.Session.get")
+    def test_circuit_opens(self, mock_get, mock_sleep):  # noqa: ARG002
+        """Repeated server errors pause the requests to the provider."""
+        mock_get.return_value = self.get_response(503)
+
+        for _ in range(services.CIRCUIT_FAILURES):
+            with self.assertRaises(services.ProviderUnavailableError):
+                services.api_request("TEST", "GET", "https://example.com/test")
+        calls = mock_get.call_count
+
+        with self.assertRaises(services.ProviderUnavailableError):
+            services.api_request("TEST", "GET", "https://example.com/test")
+        self.assertEqual(mock_get.call_count, calls)
+
+    def test_circuit_state_reused(self):
+        """The state of the circuit isn't read from Redis on every request."""
+        with patch.object(cache, "get_redis_client") as mock_client:
+            mock_client.return_value.ttl.return_value = -2
+            for _ in range(3):
+                services.check_circuit("TEST")
+
+        mock_client.return_value.ttl.assert_called_once()
+
+    @patch("app.providers.services.provider_metadata")
+    def test_task_retried(self, mock_metadata):
+        """Tasks are retried when the provider is unavailable."""
+        mock_metadata.side_effect = services.ProviderUnavailableError("TEST", 30)
+
+        result = tasks.refresh_metadata.apply(
+            args=("movie", 900060, "tmdb", None, ["movie_900060"]),
+        )
+
+        self.assertTrue(result.failed())
+        self.assertEqual(
+            mock_metadata.call_count,
+            tasks.ProviderTask.max_retries + 1,
+        )
+
+
+class RateLimit(TestCase):
+    """Test the rate limiter shared by the processes."""
+
+    def tearDown(self):
+        """Reset the buckets and rates of the test hosts."""
+        client = cache.get_redis_client()
+        client.delete(
+            *client.keys("ratelimit_*.test*"),
+            *client.keys("ratelimit_*myanimelist*"),
+            ratelimit.GLOBAL_TAT_KEY,
+        )
+        ratelimit.adapted_rates.clear()
+        ratelimit.leases.clear()
+
+    def test_burst_then_spaced(self):
+        """Requests after the burst wait for the rate of the lane."""
+        ready = ratelimit.reserve("spaced.test", "background", 6)
+
+        self.assertLessEqual(ready[0], time.time())
+        self.assertGreater(ready[-1], time.time())
+
+    def test_lanes_separate(self):
+        """Celery tasks using their share don't delay web requests."""
+        ratelimit.reserve("lanes.test", "background", 3)
+
+        ready = ratelimit.reserve("lanes.test", "interactive", 2)
+        self.assertLessEqual(ready[0], time.time())
+        # the background lane is busy, web requests are limited to their share
+        self.assertGreater(ready[1], time.time())
+
+    @patch("app.providers.ratelimit.time.sleep")
+    def test_idle_lane_lends_rate(self, mock_sleep):
+        """Web requests use the whole rate while no task is running."""
+        for _ in range(2):
+            ratelimit.acquire("api.myanimelist.net", "interactive")
+
+        waited = sum(call.args[0] for call in mock_sleep.call_args_list)
+        self.assertLess(waited, settings.SEARCH_PROVIDER_TIMEOUT)
+
+    def test_global_rate(self):
+        """Requests to all hosts share the global rate."""
+        ratelimit.reserve("first.test", "background", 5)
+
+        ready = ratelimit.reserve("second.test", "background", 1)
+        self.assertGreater(ready[0], time.time())
+
+    def test_leased_requests(self):
+        """Requests are taken from the lease without calling Redis."""
+        size = ratelimit.get_lease_size("lease.test", "background")
+
+        with patch(
+            "app.providers.ratelimit.reserve",
+            wraps=ratelimit.reserve,
+        ) as reserve:
+            for _ in range(size):
+                ratelimit.take("lease.test", "background")
+            self.assertEqual(reserve.call_count, 1)
+
+            ratelimit.take("lease.test", "background")
+            self.assertEqual(reserve.call_count, 2)
+
+    def test_lease_released_on_slow_down(self):
+        """Leased requests not due yet are given back when the rate drops."""
+        client = cache.get_redis_client()
+        ratelimit.reserve("release.test", "background", 10)
+        ratelimit.take("release.test", "background")
+        tat = float(client.get("ratelimit_tat_release.test_background"))
+
+        response = requests.Response()
+        response.status_code = 429
+        ratelimit.update("release.test", response)
+
+        self.assertNotIn(("release.test", "background"), ratelimit.leases)
+        self.assertLess(
+            float(client.get("ratelimit_tat_release.test_background")),
+            tat,
+        )
+        self.assertGreater(client.ttl("ratelimit_tat_release.test_background"), 0)
+
+    def test_expired_bucket_not_recreated(self):
+        """Giving back requests to an expired bucket doesn't leave a key."""
+        client = cache.get_redis_client()
+        ratelimit.reserve("expired.test", "background", 10)
+        ratelimit.take("expired.test", "background")
+        client.delete("ratelimit_tat_expired.test_background")
+
+        ratelimit.release("expired.test", ratelimit.DEFAULT_RATE)
+
+        self.assertIsNone(client.get("ratelimit_tat_expired.test_background"))
+
+    def test_adapted_from_headers(self):
+        """The rate follows the remaining requests reported by the host."""
+        response = requests.Response()
+        response.status_code = 200
+        response.headers.update(
+            {"X-RateLimit-Remaining": "100", "X-RateLimit-Reset": "10"},
+        )
+
+        ratelimit.update("headers.test", response)
+
+        rate = cache.get_redis_client().get("ratelimit_rate_headers.test")
+        self.assertEqual(float(rate), 10)
+
+    def test_slowed_down_when_limited(self):
+        """A 429 response halves the rate of the host."""
+        response = requests.Response()
+        response.status_code = 429
+
+        ratelimit.update("limited.test", response)
+
+        rate = cache.get_redis_client().get("ratelimit_rate_limited.test")
+        self.assertEqual(float(rate), ratelimit.DEFAULT_RATE / 2)
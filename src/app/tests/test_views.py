@@ -1,10 +1,17 @@
 import datetime
+import os
+import tempfile
+from io import BytesIO
+from unittest.mock import MagicMock, patch
 
 from django.contrib.auth import get_user_model
 from django.test import TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from app.images import get_image_path, get_image_url, get_variant_url, prune_cache
 from app.models import TV, Anime, Episode, Item, Movie, Season
+from app.providers import cache, services
 
 
 class CreateMedia(TestCase):
@@ -375,3 +382,360 @@ class ProgressEditAnime(TestCase):
         )
 
         self.assertEqual(Anime.objects.get(item__media_id=1).progress, 1)
+
+
+class FederatedSearch(TestCase):
+    """Test searching every provider at once."""
+
+    def setUp(self):
+        """Create a user and log in."""
+        self.credentials = {"username": "test", "password": "12345"}
+        self.user = get_user_model().objects.create_user(**self.credentials)
+        self.client.login(**self.credentials)
+
+    @patch("app.providers.services.search")
+    def test_sections_loaded_separately(self, mock_search):
+        """The page only has a placeholder per provider."""
+        response = self.client.get(reverse("search"), {"media_type": "all", "q": "a"})
+
+        mock_search.assert_not_called()
+        self.assertContains(response, reverse("search_results"), count=6)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_search_type, "tv")
+
+    @patch("app.providers.services.search")
+    def test_section_results(self, mock_search):
+        """A section renders the results of its provider."""
+        mock_search.return_value = [
+            {
+                "media_id": 1,
+                "source": "mangaupdates",
+                "media_type": "manga",
+                "title": "Found Manga",
+                "image": "http://example.com/image.jpg",
+            },
+        ]
+
+        response = self.client.get(
+            reverse("search_results"),
+            {"media_type": "manga", "q": "found", "source": "mangaupdates"},
+        )
+
+        mock_search.assert_called_once_with("manga", "found", "mangaupdates")
+        self.assertContains(response, "Found Manga")
+
+    @patch("app.providers.services.suggest")
+    def test_suggestions(self, mock_suggest):
+        """Suggestions are rendered as options of the search bar."""
+        mock_suggest.return_value = [{"title": "Breaking Bad"}]
+
+        response = self.client.get(
+            reverse("search_suggestions"),
+            {"media_type": "tv", "q": "brea"},
+        )
+
+        mock_suggest.assert_called_once_with("tv", "brea")
+        self.assertContains(response, '<option value="Breaking Bad">')
+
+    @patch("app.providers.services.search_with_timeout")
+    def test_section_timeout(self, mock_search):
+        """A slow provider only affects its own section."""
+        mock_search.side_effect = TimeoutError
+
+        response = self.client.get(
+            reverse("search_results"),
+            {"media_type": "game", "q": "slow"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "taking too long")
+
+    @patch("app.providers.services.search_with_timeout")
+    def test_section_invalid_media_type(self, mock_search):
+        """Unknown media types are rejected before searching."""
+        response = self.client.get(
+            reverse("search_results"),
+            {"media_type": "book", "q": "dune"},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        mock_search.assert_not_called()
+
+
+class Metrics(TestCase):
+    """Test the Prometheus metrics endpoint."""
+
+    def test_unauthenticated(self):
+        """Anonymous requests without the token are rejected."""
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(METRICS_TOKEN="secret")  # noqa: S106
+    def test_token(self):
+        """Scrapers can authenticate with the bearer token."""
+        cache.get("movie_900050")
+
+        response = self.client.get(
+            reverse("metrics"),
+            headers={"Authorization": "Bearer secret"},
+        )
+
+        content = response.content.decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("# TYPE yamtrack_cache_requests_total counter", content)
+        self.assertIn(
+            'yamtrack_cache_requests_total{family="movie",result="miss"}',
+            content,
+        )
+
+    def test_logged_in(self):
+        """Logged in users can read the metrics."""
+        credentials = {"username": "test", "password": "12345"}
+        get_user_model().objects.create_user(**credentials)
+        self.client.login(**credentials)
+
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+
+
+class WatchEpisodes(TestCase):
+    """Test watching several episodes of a season at once."""
+
+    def setUp(self):
+        """Create a user, log in and track a season."""
+        self.credentials = {"username": "test", "password": "12345"}
+        self.user = get_user_model().objects.create_user(**self.credentials)
+        self.client.login(**self.credentials)
+
+        item_tv = Item.objects.create(
+            media_id=1668,
+            source="tmdb",
+            media_type="tv",
+            title="Friends",
+            image="http://example.com/image.jpg",
+        )
+        tv = TV.objects.create(item=item_tv, user=self.user, status="In progress")
+        item_season = Item.objects.create(
+            media_id=1668,
+            source="tmdb",
+            media_type="season",
+            title="Friends",
+            image="http://example.com/image.jpg",
+            season_number=1,
+        )
+        self.season = Season.objects.create(
+            item=item_season,
+            related_tv=tv,
+            user=self.user,
+            status="In progress",
+        )
+
+        self.season_metadata = {
+            "episodes": [
+                {
+                    "episode_number": number,
+                    "air_date": f"2023-01-0{number}",
+                    "still_path": None,
+                    "image": "image.jpg",
+                }
+                for number in (1, 2, 3)
+            ],
+        }
+
+    @patch("app.providers.services.get_core_metadata")
+    @patch("app.providers.services.get_media_metadata")
+    def test_watch_many(self, mock_metadata, mock_core):
+        """The episodes are written in bulk and complete the season once."""
+        mock_metadata.return_value = self.season_metadata
+        mock_core.return_value = {"related": {"seasons": [{"season_number": 1}]}}
+
+        self.client.post(
+            reverse("episodes_watch"),
+            {
+                "media_id": 1668,
+                "season_number": 1,
+                "source": "tmdb",
+                "episode_number": [1, 2, 3],
+                "date": "2023-06-01",
+            },
+        )
+
+        mock_metadata.assert_called_once()
+        season = Season.objects.get(id=self.season.id)
+        self.assertEqual(season.progress, 3)
+        self.assertEqual(season.status, "Completed")
+        self.assertEqual(season.related_tv.status, "Completed")
+        self.assertEqual(
+            Item.objects.filter(media_type="episode", image="image.jpg").count(),
+            3,
+        )
+
+    @patch("app.providers.services.get_media_metadata")
+    def test_rewatch(self, mock_metadata):
+        """Watched episodes get a repeat instead of a new episode."""
+        mock_metadata.return_value = self.season_metadata
+
+        self.season.watch_many([1, 2], "2023-06-01")
+        self.season.watch_many([2], "2023-06-02")
+
+        episode = Episode.objects.get(
+            related_season=self.season,
+            item__episode_number=2,
+        )
+        self.assertEqual(episode.repeats, 1)
+        self.assertEqual(episode.watch_date, datetime.date(2023, 6, 2))
+        self.assertEqual(self.season.progress, 2)
+        self.assertEqual(self.season.status, "In progress")
+
+    @patch("app.providers.services.get_media_metadata")
+    def test_unaired_skipped(self, mock_metadata):
+        """Episodes without a past air date aren't watched."""
+        self.season_metadata["episodes"][1]["air_date"] = "2999-01-01"
+        self.season_metadata["episodes"][2]["air_date"] = None
+        mock_metadata.return_value = self.season_metadata
+
+        self.season.watch_many([1, 2, 3], "2023-06-01")
+
+        self.assertEqual(self.season.progress, 1)
+
+    def test_invalid_input(self):
+        """Invalid episode numbers and dates are rejected."""
+        data = {"media_id": 1668, "season_number": 1, "source": "tmdb"}
+        for invalid in (
+            {"episode_number": ["1", "x"], "date": "2023-06-01"},
+            {"episode_number": ["1"], "date": "June"},
+        ):
+            response = self.client.post(reverse("episodes_watch"), data | invalid)
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(Episode.objects.exists())
+
+
+class ProviderUnavailable(TestCase):
+    """Test the degraded page while a provider is unavailable."""
+
+    def setUp(self):
+        """Create a user and log in."""
+        self.credentials = {"username": "test", "password": "12345"}
+        self.user = get_user_model().objects.create_user(**self.credentials)
+        self.client.login(**self.credentials)
+
+    @patch("app.providers.services.get_media_metadata")
+    def test_unavailable(self, mock_metadata):
+        """The page answers 503 with the Retry-After of the provider."""
+        mock_metadata.side_effect = services.ProviderUnavailableError("TMDB", 30)
+
+        response = self.client.get(
+            reverse(
+                "media_details",
+                args=["tmdb", "movie", 900070, "title"],
+            ),
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertContains(response, "TMDB is unavailable", status_code=503)
+
+
+class ImageProxy(TestCase):
+    """Test the image proxy serving resized provider images."""
+
+    def setUp(self):
+        """Create a user, log in and use a temporary image cache."""
+        self.credentials = {"username": "test", "password": "12345"}
+        self.user = get_user_model().objects.create_user(**self.credentials)
+        self.client.login(**self.credentials)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(IMAGE_CACHE_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.url = "https://image.tmdb.org/t/p/original/poster.png"
+
+    def test_proxy_url(self):
+        """Only images of the providers are rewritten to the proxy."""
+        self.assertTrue(get_image_url(self.url, "grid").startswith("/image/grid?"))
+        self.assertEqual(
+            get_image_url("https://example.com/poster.png", "grid"),
+            "https://example.com/poster.png",
+        )
+
+    def test_provider_variants(self):
+        """The provider size of the image is picked by the template context."""
+        self.assertEqual(
+            get_variant_url(self.url, "table"),
+            "https://image.tmdb.org/t/p/w92/poster.png",
+        )
+        # episode stills are stored with http
+        self.assertEqual(
+            get_variant_url("http://image.tmdb.org/t/p/original/still.jpg", "grid"),
+            "http://image.tmdb.org/t/p/w342/still.jpg",
+        )
+        self.assertEqual(
+            get_variant_url(
+                "https://images.igdb.com/igdb/image/upload/t_original/co1.jpg",
+                "grid",
+            ),
+            "https://images.igdb.com/igdb/image/upload/t_cover_big/co1.jpg",
+        )
+        self.assertEqual(
+            get_variant_url(
+                "https://cdn.myanimelist.net/images/anime/1/1l.jpg",
+                "table",
+            ),
+            "https://cdn.myanimelist.net/images/anime/1/1.jpg",
+        )
+        self.assertEqual(
+            get_variant_url(
+                "https://s4.anilist.co/file/anilistcdn/media/anime/cover/large/bx1.jpg",
+                "detail",
+            ),
+            "https://s4.anilist.co/file/anilistcdn/media/anime/cover/extraLarge/bx1.jpg",
+        )
+
+    @patch("app.images.requests.get")
+    def test_resized_once(self, mock_get):
+        """The image is fetched once and served resized as WebP."""
+        content = BytesIO()
+        Image.new("RGB", (1000, 1500)).save(content, "PNG")
+        mock_get.return_value = MagicMock(content=content.getvalue())
+
+        for _ in range(2):
+            response = self.client.get(get_image_url(self.url, "grid"))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("immutable", response["Cache-Control"])
+        mock_get.assert_called_once()
+
+        image = Image.open(BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(image.format, "WEBP")
+        self.assertEqual(image.size, (300, 450))
+
+        response = self.client.get(
+            get_image_url(self.url, "grid"),
+            headers={"If-None-Match": response["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_prune_cache(self):
+        """The least recently read images are deleted above the size limit."""
+        paths = [get_image_path(f"{self.url}?{index}", "grid") for index in range(3)]
+        for index, path in enumerate(paths):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"0" * 100)
+            os.utime(path, (index, index))
+
+        self.assertEqual(prune_cache(200), 1)
+        self.assertEqual([path.exists() for path in paths], [False, True, True])
+
+    def test_not_proxied(self):
+        """Unknown sizes and hosts aren't fetched."""
+        response = self.client.get(
+            reverse("image", args=["grid"]),
+            {"url": "http://localhost/admin"},
+        )
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse("image", args=["huge"]), {"url": self.url})
+        self.assertEqual(response.status_code, 404)
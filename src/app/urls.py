@@ -10,6 +10,12 @@ urlpatterns = [
     path("", views.home, name="home"),
     path("medialist/<media_type:media_type>", views.media_list, name="medialist"),
     path("search", views.media_search, name="search"),
+    path("search/results", views.search_results, name="search_results"),
+    path(
+        "search/suggestions",
+        views.search_suggestions,
+        name="search_suggestions",
+    ),
     path(
         "details/<source:source>/<media_type:media_type>/<int:media_id>/<str:title>",
         views.media_details,
@@ -25,8 +31,11 @@ urlpatterns = [
     path("media_save", views.media_save, name="media_save"),
     path("media_delete", views.media_delete, name="media_delete"),
     path("episode_handler", views.episode_handler, name="episode_handler"),
+    path("episodes_watch", views.episodes_watch, name="episodes_watch"),
     path("create/item", views.create_item, name="create_item"),
     path("create/media", views.create_media, name="create_media"),
     path("history_modal", views.history, name="history"),
     path("history_delete", views.history_delete, name="history_delete"),
+    path("metrics", views.metrics, name="metrics"),
+    path("image/<str:size>", views.image, name="image"),
 ]
@@ -1,20 +1,39 @@
+import datetime
 import logging
 
+import requests
 from django.apps import apps
+from django.conf import settings
 from django.contrib import messages
 from django.db import IntegrityError
-from django.http import HttpResponse
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+)
 from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.views.decorators.http import require_GET, require_http_methods, require_POST
 
-from app import database, helpers
+from app import database, helpers, images, items
 from app.forms import FilterForm, ManualItemForm, get_form_class
 from app.models import STATUS_IN_PROGRESS, Episode, Item, Season
-from app.providers import igdb, mal, mangaupdates, manual, services, tmdb
+from app.providers import manual, services, tmdb
+from app.providers import metrics as provider_metrics
 
 logger = logging.getLogger(__name__)
 
+# sections of the federated search page, searched concurrently
+SEARCH_SECTIONS = (
+    {"label": "TV", "media_type": "tv"},
+    {"label": "Movies", "media_type": "movie"},
+    {"label": "Anime", "media_type": "anime"},
+    {"label": "Manga", "media_type": "manga"},
+    {"label": "Manga (MangaUpdates)", "media_type": "manga", "source": "mangaupdates"},
+    {"label": "Games", "media_type": "game"},
+)
+
 
 @require_GET
 def home(request):
@@ -95,28 +114,66 @@ def media_search(request):
     """Return the media search page."""
     media_type = request.GET["media_type"]
     query = request.GET["q"]
+
+    if media_type == "all":
+        # each provider is searched by its own request, see search_results
+        return render(
+            request,
+            "app/search_all.html",
+            {"sections": SEARCH_SECTIONS, "query": query},
+        )
+
     request.user.set_last_search_type(media_type)
 
     # only receives source when searching with secondary source
     source = request.GET.get("source")
-
-    if media_type == "manga":
-        if source == "mangaupdates":
-            query_list = mangaupdates.search(query)
-        else:
-            query_list = mal.search(media_type, query)
-    elif media_type in "anime":
-        query_list = mal.search(media_type, query)
-    elif media_type in ("tv", "movie"):
-        query_list = tmdb.search(media_type, query)
-    elif media_type == "game":
-        query_list = igdb.search(query)
+    query_list = services.search(media_type, query, source)
 
     context = {"query_list": query_list, "source": source}
 
     return render(request, "app/search.html", context)
 
 
+@require_GET
+def search_results(request):
+    """Return the search results of a provider for the federated search."""
+    media_type = request.GET.get("media_type")
+    query = request.GET.get("q")
+    source = request.GET.get("source")
+    if media_type not in services.SEARCH_SOURCES or not query:
+        return HttpResponseBadRequest("Invalid media type or query")
+
+    context = {"query_list": []}
+
+    try:
+        context["query_list"] = services.search_with_timeout(media_type, query, source)
+    except TimeoutError:
+        logger.warning("Search of %s for %s timed out", media_type, query)
+        context["error"] = "timeout"
+    except requests.exceptions.RequestException as error:
+        logger.warning("Search of %s for %s failed: %s", media_type, query, error)
+        context["error"] = "unavailable"
+
+    return render(request, "app/components/search_results.html", context)
+
+
+@require_GET
+def search_suggestions(request):
+    """Return the titles suggested for the query typed in the search bar."""
+    media_type = request.GET.get("media_type")
+    query = request.GET.get("q", "")
+    suggestions = (
+        services.suggest(media_type, query)
+        if media_type in services.SEARCH_SOURCES
+        else []
+    )
+    return render(
+        request,
+        "app/components/search_suggestions.html",
+        {"suggestions": suggestions},
+    )
+
+
 @require_GET
 def media_details(request, source, media_type, media_id, title):  # noqa: ARG001 title for URL
     """Return the details page for a media item."""
@@ -144,15 +201,12 @@ def season_details(request, source, media_id, title, season_number):  # noqa: AR
     ).values("item__episode_number", "watch_date", "repeats")
 
     if source == "manual":
-        season_metadata["episodes"] = manual.process_episodes(
-            season_metadata,
-            episodes_in_db,
-        )
+        episodes = manual.process_episodes(season_metadata, episodes_in_db)
     else:
-        season_metadata["episodes"] = tmdb.process_episodes(
-            season_metadata,
-            episodes_in_db,
-        )
+        episodes = tmdb.process_episodes(season_metadata, episodes_in_db)
+
+    # metadata is shared within the request, don't modify it in place
+    season_metadata = {**season_metadata, "episodes": episodes}
 
     context = {"season": season_metadata, "tv": tv_with_seasons_metadata}
     return render(request, "app/season_details.html", context)
@@ -167,7 +221,7 @@ def track(request):
     media_type = request.GET["media_type"]
     season_number = request.GET.get("season_number")
 
-    item, _ = Item.objects.get_or_create(
+    item = items.resolve_item(
         media_id=media_id,
         source=source,
         media_type=media_type,
@@ -257,13 +311,52 @@ def media_delete(request):
 @require_POST
 def episode_handler(request):
     """Handle the creation, deletion, and updating of episodes for a season."""
+    episode_number = request.POST["episode_number"]
+    related_season = get_or_create_season(request)
+
+    if "unwatch" in request.POST:
+        related_season.unwatch(episode_number)
+
+    else:
+        if "release" in request.POST:
+            watch_date = request.POST["release"]
+        else:
+            # set watch date from form
+            watch_date = request.POST["date"]
+        related_season.watch(episode_number, watch_date)
+
+    return helpers.redirect_back(request)
+
+
+@require_POST
+def episodes_watch(request):
+    """Mark several episodes of a season as watched at once."""
+    watch_date = request.POST.get("date", "")
+    try:
+        episode_numbers = [
+            int(number) for number in request.POST.getlist("episode_number")
+        ]
+        if watch_date != "None":
+            datetime.date.fromisoformat(watch_date)
+    except ValueError:
+        return HttpResponseBadRequest("Invalid episode numbers or watch date")
+
+    related_season = get_or_create_season(request)
+
+    if episode_numbers:
+        related_season.watch_many(episode_numbers, watch_date)
+
+    return helpers.redirect_back(request)
+
+
+def get_or_create_season(request):
+    """Return the season of the request, creating it if it isn't tracked."""
     media_id = request.POST["media_id"]
     season_number = request.POST["season_number"]
-    episode_number = request.POST["episode_number"]
     source = request.POST["source"]
 
     try:
-        related_season = Season.objects.get(
+        return Season.objects.get(
             item__media_id=media_id,
             item__season_number=season_number,
             item__episode_number=None,
@@ -296,19 +389,7 @@ def episode_handler(request):
 
         related_season.save()
         logger.info("%s did not exist, it was created successfully.", related_season)
-
-    if "unwatch" in request.POST:
-        related_season.unwatch(episode_number)
-
-    else:
-        if "release" in request.POST:
-            watch_date = request.POST["release"]
-        else:
-            # set watch date from form
-            watch_date = request.POST["date"]
-        related_season.watch(episode_number, watch_date)
-
-    return helpers.redirect_back(request)
+        return related_season
 
 
 @require_http_methods(["GET", "POST"])
@@ -363,7 +444,7 @@ def history(request):
     """Return the history page for a media item."""
     media_type = request.GET["media_type"]
 
-    item, _ = Item.objects.get_or_create(
+    item = items.resolve_item(
         media_id=request.GET["media_id"],
         source=request.GET["source"],
         media_type=media_type,
@@ -440,3 +521,44 @@ def history_delete(request):
         logger.warning("User does not have permission to delete this history record.")
 
     return helpers.redirect_back(request)
+
+
+@require_GET
+def metrics(request):
+    """Return the provider metrics in the Prometheus text format."""
+    token = settings.METRICS_TOKEN
+    authorized = request.user.is_authenticated or (
+        token and request.headers.get("Authorization") == f"Bearer {token}"
+    )
+    if not authorized:
+        response = HttpResponse(status=401)
+        response["WWW-Authenticate"] = "Bearer"
+        return response
+
+    return HttpResponse(
+        provider_metrics.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@require_GET
+def image(request, size):
+    """Return the provider image resized and cached on disk."""
+    url = request.GET.get("url", "")
+    if size not in images.IMAGE_SIZES or not images.is_proxied(url):
+        msg = "Image not found"
+        raise Http404(msg)
+
+    path = images.get_resized(url, size)
+    if path is None:
+        # the provider couldn't be reached, let the browser try it directly
+        return redirect(url)
+
+    etag = f'"{images.get_etag(path)}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponse(status=304)
+    else:
+        response = FileResponse(path.open("rb"), content_type="image/webp")
+    response["ETag"] = etag
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
@@ -1,8 +1,12 @@
 from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
 from django.urls import resolve
 from django.utils.deprecation import MiddlewareMixin
 
-LOGIN_EXEMPT_ROUTES = ("login", "register")
+from app import items
+from app.providers import services
+
+LOGIN_EXEMPT_ROUTES = ("login", "register", "metrics")
 
 class LoginRequiredMiddleware(MiddlewareMixin):
     """Middleware that requires a user to be authenticated to view any page.
@@ -22,3 +26,59 @@ class LoginRequiredMiddleware(MiddlewareMixin):
             return None
 
         return login_required(view_func)(request, *view_args, **view_kwargs)
+
+
+class MetadataMemoMiddleware:
+    """Middleware that memoizes media metadata lookups for each request."""
+
+    def __init__(self, get_response):
+        """Initialize the middleware."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Process the request inside a metadata memo."""
+        with services.metadata_memo(request.path):
+            return self.get_response(request)
+
+
+class ItemResolverMiddleware:
+    """Middleware that keeps an identity map of the items for each request."""
+
+    def __init__(self, get_response):
+        """Initialize the middleware."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Process the request inside an item resolver."""
+        with items.item_resolver(request.path):
+            return self.get_response(request)
+
+
+class ProviderUnavailableMiddleware:
+    """Middleware that renders a 503 page while a provider is unavailable.
+
+    Pages with cached metadata are still served, only the ones that need a
+    provider that failed or is rate limited get the degraded page.
+    """
+
+    def __init__(self, get_response):
+        """Initialize the middleware."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Process the request."""
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        """Render the 503 page for an unavailable provider."""
+        if not isinstance(exception, services.ProviderUnavailableError):
+            return None
+
+        response = render(
+            request,
+            "503.html",
+            {"provider": exception.provider, "retry_after": exception.retry_after},
+            status=503,
+        )
+        response["Retry-After"] = exception.retry_after
+        return response
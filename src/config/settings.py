@@ -78,6 +78,9 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "config.middleware.LoginRequiredMiddleware",
+    "config.middleware.MetadataMemoMiddleware",
+    "config.middleware.ItemResolverMiddleware",
+    "config.middleware.ProviderUnavailableMiddleware",
     "simple_history.middleware.HistoryRequestMiddleware",
 ]
 
@@ -137,10 +140,53 @@ CACHES = {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
         "LOCATION": REDIS_URL,
         "TIMEOUT": 18000,  # 5 hours,
-        "VERSION": 3,
+        "VERSION": 4,
+        "OPTIONS": {
+            "serializer": config(
+                "CACHE_SERIALIZER",
+                default="app.providers.serializers.CompressedSerializer",
+            ),
+        },
     },
 }
 
+# cached values above this many pickled bytes are compressed with zlib
+PROVIDER_CACHE_COMPRESS_MIN_SIZE = config(
+    "PROVIDER_CACHE_COMPRESS_MIN_SIZE",
+    default=1024,
+    cast=int,
+)
+PROVIDER_CACHE_COMPRESS_LEVEL = config(
+    "PROVIDER_CACHE_COMPRESS_LEVEL",
+    default=6,
+    cast=int,
+)
+
+# provider metadata is served stale after the soft TTL while it's refreshed in
+# the background, requests only wait for the provider after the hard TTL
+PROVIDER_CACHE_SOFT_TTL = config("PROVIDER_CACHE_SOFT_TTL", default=18000, cast=int)
+# TMDB metadata is refreshed from the change feeds when it changes
+PROVIDER_CACHE_TMDB_SOFT_TTL = config(
+    "PROVIDER_CACHE_TMDB_SOFT_TTL",
+    default=60 * 60 * 24 * 3,  # 3 days
+    cast=int,
+)
+PROVIDER_CACHE_HARD_TTL = config(
+    "PROVIDER_CACHE_HARD_TTL",
+    default=60 * 60 * 24 * 7,  # 7 days
+    cast=int,
+)
+
+# in-process LRU tier in front of Redis for provider metadata, 0 disables it
+PROVIDER_CACHE_LOCAL_SIZE = config("PROVIDER_CACHE_LOCAL_SIZE", default=512, cast=int)
+PROVIDER_CACHE_LOCAL_TTL = config("PROVIDER_CACHE_LOCAL_TTL", default=300, cast=int)
+# subscribe to the local tier invalidations published by the other processes
+PROVIDER_CACHE_INVALIDATIONS = config(
+    "PROVIDER_CACHE_INVALIDATIONS",
+    default=True,
+    cast=bool,
+)
+
 # not using Memcached, ignore CacheKeyWarning
 # https://docs.djangoproject.com/en/stable/topics/cache/#cache-key-warnings
 warnings.simplefilter("ignore", CacheKeyWarning)
@@ -161,9 +207,6 @@ LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
     "loggers": {
-        "requests_ratelimiter": {
-            "level": "DEBUG" if DEBUG else "INFO",
-        },
         "psycopg": {
             "level": "DEBUG" if DEBUG else "INFO",
         },
@@ -231,6 +274,19 @@ IMG_NONE = "https://www.themoviedb.org/assets/2/v4/glyphicons/basic/glyphicons-b
 
 REQUEST_TIMEOUT = 120  # seconds
 
+# seconds a provider can take to answer on the federated search page
+SEARCH_PROVIDER_TIMEOUT = config("SEARCH_PROVIDER_TIMEOUT", default=5, cast=int)
+
+# resized posters served by the image proxy, fetched once from the providers
+IMAGE_CACHE_DIR = config("IMAGE_CACHE_DIR", default=BASE_DIR / "db" / "images")
+IMAGE_FETCH_TIMEOUT = 10  # seconds
+# bytes of resized posters kept on disk, the least recently read are pruned
+IMAGE_CACHE_MAX_SIZE = config(
+    "IMAGE_CACHE_MAX_SIZE",
+    default=1024 * 1024 * 1024,
+    cast=int,
+)
+
 TMDB_API = config("TMDB_API", default="61572be02f0a068658828f6396aacf60")
 TMDB_NSFW = config("TMDB_NSFW", default=False, cast=bool)
 TMDB_LANG = config("TMDB_LANG", default="en")
@@ -255,6 +311,9 @@ SIMKL_SECRET = config(
 
 REGISTRATION = config("REGISTRATION", default=True, cast=bool)
 
+# bearer token for scraping /metrics without a session, logged in users can always
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
 TESTING = False
 
 # Third party settings
@@ -304,4 +363,12 @@ CELERY_BEAT_SCHEDULE = {
         "task": "Reload calendar",
         "schedule": 60 * 60 * 6,  # every 6 hours
     },
+    "refresh_changed_metadata": {
+        "task": "Refresh changed metadata",
+        "schedule": 60 * 60,  # every hour
+    },
+    "prune_image_cache": {
+        "task": "Prune image cache",
+        "schedule": 60 * 60 * 24,  # every day
+    },
 }
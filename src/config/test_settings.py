@@ -9,8 +9,12 @@ CACHES = {
         "TIMEOUT": 18000,  # 5 hours
         "OPTIONS": {
             "connection_class": FakeConnection,
+            "serializer": "app.providers.serializers.CompressedSerializer",
         },
     },
 }
 
 TESTING = True
+
+# no invalidation listener thread in the tests
+PROVIDER_CACHE_INVALIDATIONS = False
@@ -1,7 +1,6 @@
 from django.db import models
-from django.db.models import Q
 
-from app.models import MEDIA_TYPES, Item
+from app.models import Item
 
 
 class EventManager(models.Manager):
@@ -9,15 +8,7 @@ class EventManager(models.Manager):
 
     def user_events(self, user):
         """Get all upcoming media events of the specified user within the next week."""
-        media_types_with_user = [media for media in MEDIA_TYPES if media != "episode"]
-
-        query = Q()
-        for media_type in media_types_with_user:
-            query |= Q(**{f"item__{media_type}__user": user})
-
-        return self.filter(
-            query,
-        )
+        return self.filter(item__library_entries__user=user)
 
 
 class Event(models.Model):
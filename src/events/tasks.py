@@ -8,7 +8,7 @@ from django.conf import settings
 from django.db import transaction
 from django.db.models import Q
 
-from app.models import MEDIA_TYPES, Item
+from app.models import Item, LibraryEntry
 from app.providers import services, tmdb
 from events.models import Event
 
@@ -22,13 +22,10 @@ DEFAULT_DAY = "-01"
 def reload_calendar(user=None):  # , used for metadata
     """Refresh the calendar with latest dates for all users."""
     statuses = ["Planning", "In progress"]
-    media_types_with_status = [media for media in MEDIA_TYPES if media != "episode"]
 
-    query = Q()
-    for media_type in media_types_with_status:
-        query |= Q(**{f"{media_type}__status__in": statuses})
-
-    items_with_status = Item.objects.filter(query).distinct()
+    items_with_status = Item.objects.filter(
+        id__in=LibraryEntry.objects.filter(status__in=statuses).values("item"),
+    )
 
     future_events = Event.objects.filter(date__gte=datetime.now(tz=settings.TZ))
     future_event_item_ids = set(future_events.values_list("item_id", flat=True))
@@ -41,22 +38,42 @@ def reload_calendar(user=None):  # , used for metadata
         Q(id__in=future_event_item_ids) | Q(id__in=items_without_events),
     )
 
+    items_to_process = list(items_to_process)
+
+    # warm the cache with a single round trip before processing item by item
+    prefetch_metadata(items_to_process)
+
     events_bulk = []
     anime_to_process = []
     user_reloaded_items = []
-    with transaction.atomic():
-        # Delete all events related to items with at least one future event
-        Event.objects.filter(item_id__in=future_event_item_ids).delete()
-        for item in items_to_process:
-            # anime can later be processed in bulk
-            if item.media_type == "anime":
-                anime_to_process.append(item)
-            elif process_item(item, events_bulk):
+    # items the providers couldn't answer for, their events are kept
+    skipped_item_ids = set()
+    for item in items_to_process:
+        # anime can later be processed in bulk
+        if item.media_type == "anime":
+            anime_to_process.append(item)
+            continue
+        try:
+            reloaded = process_item(item, events_bulk)
+        except services.ProviderUnavailableError as error:
+            logger.warning("Keeping the events of %s: %s", item, error)
+            skipped_item_ids.add(item.id)
+        else:
+            if reloaded:
                 add_user_reloaded(item, user, user_reloaded_items)
 
-        # process anime items in bulk
+    # process anime items in bulk
+    try:
         process_anime_bulk(anime_to_process, events_bulk, user, user_reloaded_items)
+    except services.ProviderUnavailableError as error:
+        logger.warning("Keeping the events of the anime: %s", error)
+        skipped_item_ids.update(item.id for item in anime_to_process)
 
+    with transaction.atomic():
+        # Delete all events related to items with at least one future event
+        Event.objects.filter(
+            item_id__in=future_event_item_ids - skipped_item_ids,
+        ).delete()
         Event.objects.bulk_create(events_bulk)
 
     user_reloaded_count = len(user_reloaded_items)
@@ -70,6 +87,23 @@ def reload_calendar(user=None):  # , used for metadata
     return "There have been no changes in your calendar"
 
 
+def prefetch_metadata(items):
+    """Fetch the metadata of the items in bulk, anime dates come from AniList."""
+    season_lookups = []
+    core_lookups = []
+    for item in items:
+        if item.media_type == "season":
+            season_lookups.append(
+                ("season", item.media_id, item.source, (item.season_number,)),
+            )
+        elif item.media_type != "anime":
+            core_lookups.append((item.media_type, item.media_id, item.source))
+
+    # other media only need their dates, which are part of the core metadata
+    services.get_media_metadata_many(season_lookups)
+    services.get_core_metadata_many(core_lookups)
+
+
 def process_item(item, events_bulk):
     """Process each item and add events to the event list."""
     try:
@@ -77,7 +111,7 @@ def process_item(item, events_bulk):
             metadata = tmdb.season(item.media_id, item.season_number)
             reloaded = process_season(item, metadata, events_bulk)
         else:
-            metadata = services.get_media_metadata(
+            metadata = services.get_core_metadata(
                 item.media_type,
                 item.media_id,
                 item.source,
@@ -218,8 +252,7 @@ def process_other(item, metadata, events_bulk):
 
 def add_user_reloaded(item, user, user_reloaded_items):
     """Add the item to the user reloaded list if the user is tracking it."""
-    user_query = Q(**{f"{item.media_type}__user": user})
-    if user and Item.objects.filter(user_query, id=item.id).exists():
+    if user and LibraryEntry.objects.filter(user=user, item=item).exists():
         user_reloaded_items.append(item)
 
     logger.info(
@@ -1,4 +1,5 @@
 from datetime import datetime
+from unittest.mock import patch
 from zoneinfo import ZoneInfo
 
 from django.contrib.auth import get_user_model
@@ -6,6 +7,7 @@ from django.test import TestCase
 from django.urls import reverse
 
 from app.models import Anime, Item
+from app.providers import services
 from events.models import Event
 from events.tasks import date_parser, reload_calendar
 
@@ -83,3 +85,30 @@ class ReloadCalendarTaskTests(TestCase):
         parsed_date = date_parser(year_month_date)
         expected_date = datetime(2024, 8, 1, tzinfo=ZoneInfo("UTC"))
         self.assertEqual(parsed_date, expected_date)
+
+
+class ReloadCalendarUnavailableTests(TestCase):
+    """Test the reload_calendar task while a provider is unavailable."""
+
+    def setUp(self):
+        """Set up the tests."""
+        self.credentials = {"username": "test", "password": "12345"}
+        self.user = get_user_model().objects.create_user(**self.credentials)
+
+    @patch("app.providers.services.api_request")
+    def test_provider_unavailable(self, mock_request):
+        """Events of media the provider can't answer for are kept."""
+        mock_request.side_effect = services.ProviderUnavailableError("ANILIST", 30)
+        item = Item.objects.create(
+            media_id=1,
+            source="manual",
+            media_type="anime",
+            title="Manual Anime",
+            image="http://example.com/image.jpg",
+        )
+        Anime.objects.create(item=item, user=self.user, status="Planning")
+        Event.objects.create(item=item, episode_number=1, date="2999-01-01")
+
+        reload_calendar(self.user.id)
+
+        self.assertTrue(Event.objects.filter(item=item).exists())
@@ -1,5 +1,8 @@
 from simple_history.utils import bulk_create_with_history
 
+from app.items import clear_resolver
+from app.models import sync_library
+
 
 def bulk_chunk_import(media_list, model, user):
     """Bulk import media in chunks.
@@ -15,3 +18,9 @@ def bulk_chunk_import(media_list, model, user):
             ignore_conflicts=True,
             default_user=user,
         )
+        # the items of an imported chunk aren't looked up again
+        clear_resolver()
+
+    # the ids aren't set when conflicts are ignored, the library entries of
+    # the user are rebuilt from the table instead
+    sync_library(model._meta.model_name, user)  # noqa: SLF001
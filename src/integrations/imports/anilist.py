@@ -134,6 +134,17 @@ def import_media(media_data, media_type, user):
 
 def process_status_list(bulk_media, status_list, media_type, user, warnings):
     """Process each status list."""
+    items = app.items.resolve_items(
+        {
+            (content["media"]["idMal"], "mal", media_type): {
+                "title": content["media"]["title"]["userPreferred"],
+                "image": content["media"]["coverImage"]["large"],
+            }
+            for content in status_list["entries"]
+            if content["media"]["idMal"] is not None
+        },
+    )
+
     for content in status_list["entries"]:
         if content["media"]["idMal"] is None:
             warnings.append(
@@ -146,15 +157,8 @@ def process_status_list(bulk_media, status_list, media_type, user, warnings):
                 status = content["status"].capitalize()
             notes = content["notes"] or ""
 
-            item, _ = app.models.Item.objects.get_or_create(
-                media_id=content["media"]["idMal"],
-                source="mal",
-                media_type=media_type,
-                defaults={
-                    "title": content["media"]["title"]["userPreferred"],
-                    "image": content["media"]["coverImage"]["large"],
-                },
-            )
+            key = app.items.get_key(content["media"]["idMal"], "mal", media_type)
+            item = items[key]
 
             model_type = apps.get_model(app_label="app", model_name=media_type)
             instance = model_type(
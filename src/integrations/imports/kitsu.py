@@ -8,7 +8,7 @@ from django.conf import settings
 from django.core.cache import cache
 
 import app
-from app.models import Item
+from app.items import resolve_item
 from integrations import helpers
 
 logger = logging.getLogger(__name__)
@@ -112,6 +112,8 @@ def importer(response, media_type, user):
                 )
             except ValueError as e:
                 warnings.append(str(e))
+            except app.providers.services.ProviderUnavailableError as e:
+                warnings.append(f"Kitsu entry {entry['id']}: {e}")
             else:
                 bulk_data.append(instance)
 
@@ -226,7 +228,7 @@ def create_or_get_item(media_type, kitsu_metadata, mapping_lookup, kitsu_mu_mapp
 
     image_url = get_image_url(kitsu_metadata)
 
-    return Item.objects.get_or_create(
+    return resolve_item(
         media_id=media_id,
         source=source,
         media_type=media_type,
@@ -235,7 +237,7 @@ def create_or_get_item(media_type, kitsu_metadata, mapping_lookup, kitsu_mu_mapp
             "title": kitsu_metadata["attributes"]["canonicalTitle"],
             "image": image_url,
         },
-    )[0]
+    )
 
 
 def convert_tvdb_to_tmdb(tvdb_id, source):
@@ -72,6 +72,16 @@ def add_media_list(response, media_type, user):
     logger.info("Importing %s from MyAnimeList", media_type)
     bulk_media = []
 
+    items = app.items.resolve_items(
+        {
+            (content["node"]["id"], "mal", media_type): {
+                "title": content["node"]["title"],
+                "image": get_image_url(content["node"]),
+            }
+            for content in response["data"]
+        },
+    )
+
     for content in response["data"]:
         list_status = content["list_status"]
         status = get_status(list_status["status"])
@@ -87,20 +97,7 @@ def add_media_list(response, media_type, user):
             if list_status["is_rereading"]:
                 status = "Repeating"
 
-        try:
-            image_url = content["node"]["main_picture"]["large"]
-        except KeyError:
-            image_url = settings.IMG_NONE
-
-        item, _ = app.models.Item.objects.get_or_create(
-            media_id=content["node"]["id"],
-            source="mal",
-            media_type=media_type,
-            defaults={
-                "title": content["node"]["title"],
-                "image": image_url,
-            },
-        )
+        item = items[app.items.get_key(content["node"]["id"], "mal", media_type)]
 
         model = apps.get_model(app_label="app", model_name=media_type)
         instance = model(
@@ -119,6 +116,14 @@ def add_media_list(response, media_type, user):
     return bulk_media
 
 
+def get_image_url(node):
+    """Return the image URL of the media node, the default one if missing."""
+    try:
+        return node["main_picture"]["large"]
+    except KeyError:
+        return settings.IMG_NONE
+
+
 def get_status(status):
     """Convert the status from MyAnimeList to the status used in the app."""
     status_mapping = {
@@ -87,6 +87,20 @@ def process_tv_list(tv_list, user):
     warnings = []
     tv_count = 0
 
+    # fetch all the metadata at once, the lookups below are then served from cache
+    app.providers.services.get_media_metadata_many(
+        [
+            (
+                "tv_with_seasons",
+                tv["show"]["ids"]["tmdb"],
+                "tmdb",
+                tuple(season["number"] for season in tv["seasons"]),
+            )
+            for tv in tv_list
+            if "seasons" in tv
+        ],
+    )
+
     for tv in tv_list:
         title = tv["show"]["title"]
         msg = f"Processing {title}"
@@ -111,8 +125,13 @@ def process_tv_list(tv_list, user):
                 )
                 continue
             raise
+        except app.providers.services.ProviderUnavailableError as error:
+            warnings.append(
+                f"{title}: Couldn't fetch metadata from TMDB ({tmdb_id}), {error}",
+            )
+            continue
 
-        tv_item, _ = app.models.Item.objects.get_or_create(
+        tv_item = app.items.resolve_item(
             media_id=tmdb_id,
             source="tmdb",
             media_type="tv",
@@ -139,7 +158,7 @@ def process_tv_list(tv_list, user):
             episodes = season["episodes"]
             season_metadata = metadata[f"season/{season_number}"]
 
-            season_item, _ = app.models.Item.objects.get_or_create(
+            season_item = app.items.resolve_item(
                 media_id=tmdb_id,
                 source="tmdb",
                 media_type="season",
@@ -166,7 +185,7 @@ def process_tv_list(tv_list, user):
 
             for episode in episodes:
                 ep_img = get_episode_image(episode, season_number, metadata)
-                episode_item, _ = app.models.Item.objects.get_or_create(
+                episode_item = app.items.resolve_item(
                     media_id=tmdb_id,
                     source="tmdb",
                     media_type="episode",
@@ -203,6 +222,11 @@ def process_movie_list(movie_list, user):
     warnings = []
     movie_count = 0
 
+    # fetch all the metadata at once, the lookups below are then served from cache
+    app.providers.services.get_media_metadata_many(
+        [("movie", movie["movie"]["ids"]["tmdb"], "tmdb") for movie in movie_list],
+    )
+
     for movie in movie_list:
         title = movie["movie"]["title"]
 
@@ -221,8 +245,13 @@ def process_movie_list(movie_list, user):
                 )
                 continue
             raise
+        except app.providers.services.ProviderUnavailableError as error:
+            warnings.append(
+                f"{title}: Couldn't fetch metadata from TMDB ({tmdb_id}), {error}",
+            )
+            continue
 
-        movie_item, _ = app.models.Item.objects.get_or_create(
+        movie_item = app.items.resolve_item(
             media_id=tmdb_id,
             source="tmdb",
             media_type="movie",
@@ -257,6 +286,11 @@ def process_anime_list(anime_list, user):
     warnings = []
     anime_count = 0
 
+    # fetch all the metadata at once, the lookups below are then served from cache
+    app.providers.services.get_media_metadata_many(
+        [("anime", anime["show"]["ids"]["mal"], "mal") for anime in anime_list],
+    )
+
     for anime in anime_list:
         title = anime["show"]["title"]
         msg = f"Processing {title}"
@@ -274,8 +308,13 @@ def process_anime_list(anime_list, user):
                 )
                 continue
             raise
+        except app.providers.services.ProviderUnavailableError as error:
+            warnings.append(
+                f"{title}: Couldn't fetch metadata from MAL ({mal_id}), {error}",
+            )
+            continue
 
-        anime_item, _ = app.models.Item.objects.get_or_create(
+        anime_item = app.items.resolve_item(
             media_id=mal_id,
             source="mal",
             media_type="anime",
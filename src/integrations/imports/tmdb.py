@@ -5,7 +5,7 @@ import logging
 from django.apps import apps
 from django.conf import settings
 
-from app import models
+from app import items
 from app.providers import services
 
 logger = logging.getLogger(__name__)
@@ -14,22 +14,44 @@ logger = logging.getLogger(__name__)
 def importer(file, user, status):
     """Import movie and TV ratings or watchlist depending on status from TMDB."""
     decoded_file = file.read().decode("utf-8").splitlines()
-    reader = csv.DictReader(decoded_file)
+    rows = list(csv.DictReader(decoded_file))
 
     logger.info("Importing from TMDB")
 
     num_imported = {"tv": 0, "movie": 0}
+    warnings = []
+
+    # fetch all the metadata at once, the lookups below are then served from cache
+    services.get_media_metadata_many(
+        [
+            (row["Type"], row["TMDb ID"], "tmdb")
+            for row in rows
+            if row["Type"] == "movie"
+            or (row["Type"] == "tv" and row["Episode Number"] == "")
+        ],
+    )
 
-    for row in reader:
+    for row in rows:
         media_type = row["Type"]
         episode_number = row["Episode Number"]
         media_id = row["TMDb ID"]
 
         # if movie or tv show (not episode)
         if media_type == "movie" or (media_type == "tv" and episode_number == ""):
-            media_metadata = services.get_media_metadata(media_type, media_id, "tmdb")
+            try:
+                media_metadata = services.get_media_metadata(
+                    media_type,
+                    media_id,
+                    "tmdb",
+                )
+            except services.ProviderUnavailableError as error:
+                warnings.append(
+                    f"{row['Name']}: Couldn't fetch metadata from TMDB "
+                    f"({media_id}), {error}",
+                )
+                continue
 
-            item, _ = models.Item.objects.get_or_create(
+            item = items.resolve_item(
                 media_id=media_metadata["media_id"],
                 source="tmdb",
                 media_type=media_type,
@@ -80,4 +102,4 @@ def importer(file, user, status):
         num_imported["tv"],
         num_imported["movie"],
     )
-    return num_imported["tv"], num_imported["movie"]
+    return num_imported["tv"], num_imported["movie"], "\n".join(warnings)
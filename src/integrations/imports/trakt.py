@@ -223,7 +223,7 @@ def add_tmdb_show(entry, user, defaults, list_type):
         raise ValueError(msg)
     metadata = get_metadata(app.providers.tmdb.tv, "TMDB", trakt_title, tmdb_id)
 
-    item, _ = app.models.Item.objects.get_or_create(
+    item = app.items.resolve_item(
         media_id=tmdb_id,
         source="tmdb",
         media_type="tv",
@@ -268,7 +268,7 @@ def add_tmdb_season(entry, season_number, user, defaults, list_type):
         [season_number],
     )
 
-    tv_item, _ = app.models.Item.objects.get_or_create(
+    tv_item = app.items.resolve_item(
         media_id=tmdb_id,
         source="tmdb",
         media_type="tv",
@@ -284,7 +284,7 @@ def add_tmdb_season(entry, season_number, user, defaults, list_type):
     )
 
     season_metadata = metadata[f"season/{season_number}"]
-    season_item, _ = app.models.Item.objects.get_or_create(
+    season_item = app.items.resolve_item(
         media_id=tmdb_id,
         source="tmdb",
         media_type="season",
@@ -321,7 +321,7 @@ def add_tmdb_episodes(entry, season, user):
         season_numbers,
     )
 
-    tv_item, _ = app.models.Item.objects.get_or_create(
+    tv_item = app.items.resolve_item(
         media_id=tmdb_id,
         source="tmdb",
         media_type="tv",
@@ -339,7 +339,7 @@ def add_tmdb_episodes(entry, season, user):
     )
 
     season_number = season["number"]
-    season_item, _ = app.models.Item.objects.get_or_create(
+    season_item = app.items.resolve_item(
         media_id=tmdb_id,
         source="tmdb",
         media_type="season",
@@ -370,7 +370,7 @@ def add_tmdb_episodes(entry, season, user):
         if not ep_img:
             ep_img = settings.IMG_NONE
 
-        episode_item, _ = app.models.Item.objects.get_or_create(
+        episode_item = app.items.resolve_item(
             media_id=tmdb_id,
             source="tmdb",
             media_type="episode",
@@ -438,7 +438,7 @@ def add_tmdb_movie(entry, user, defaults, list_type):
 
     metadata = get_metadata(app.providers.tmdb.movie, "TMDB", trakt_title, tmdb_id)
 
-    item, _ = app.models.Item.objects.get_or_create(
+    item = app.items.resolve_item(
         media_id=tmdb_id,
         source="tmdb",
         media_type="movie",
@@ -462,7 +462,7 @@ def add_mal_anime(entry, mal_id, user, defaults):
         title = entry["movie"]["title"]
     metadata = get_metadata(app.providers.mal.anime, "MAL", title, mal_id)
 
-    item, _ = app.models.Item.objects.get_or_create(
+    item = app.items.resolve_item(
         media_id=mal_id,
         source="mal",
         media_type="anime",
@@ -492,6 +492,10 @@ def get_metadata(fetch_func, source, title, *args, **kwargs):
         msg = f"{title}: Couldn't parse incomplete metadata from {source} ({args[0]})"
         logger.warning(msg)
         raise ValueError(msg) from e
+    except app.providers.services.ProviderUnavailableError as e:
+        msg = f"{title}: Couldn't fetch metadata from {source} ({args[0]}), {e}"
+        logger.warning(msg)
+        raise ValueError(msg) from e
 
 
 def download_and_parse_anitrakt_db(url):
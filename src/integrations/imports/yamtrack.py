@@ -4,7 +4,7 @@ from csv import DictReader
 from django.apps import apps
 
 import app
-from app.models import TV, Episode, Season
+from app.models import TV, Episode, Season, update_aggregates
 from integrations import helpers
 
 logger = logging.getLogger(__name__)
@@ -41,7 +41,7 @@ def add_bulk_media(row, user, bulk_media):
     season_number = row["season_number"] if row["season_number"] != "" else None
     episode_number = row["episode_number"] if row["episode_number"] != "" else None
 
-    item, _ = app.models.Item.objects.get_or_create(
+    item = app.items.resolve_item(
         media_id=row["media_id"],
         source=row["source"],
         media_type=media_type,
@@ -123,5 +123,6 @@ def import_episodes(bulk_data, user):
 
     num_episodes_before = Episode.objects.filter(related_season__user=user).count()
     helpers.bulk_chunk_import(bulk_data, Episode, user)
+    update_aggregates({season.id for season in season_mapping.values()})
     num_episodes_after = Episode.objects.filter(related_season__user=user).count()
     return num_episodes_after - num_episodes_before
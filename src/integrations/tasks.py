@@ -1,6 +1,7 @@
 import requests
 from celery import shared_task
 
+from app.tasks import ProviderTask
 from integrations.imports import anilist, kitsu, mal, simkl, tmdb, trakt, yamtrack
 
 ERROR_TITLE = "\n\n\n Couldn't import the following media: \n\n"
@@ -47,7 +48,7 @@ def import_simkl(token, user):
     return info_message
 
 
-@shared_task(name="Import from MyAnimeList")
+@shared_task(base=ProviderTask, name="Import from MyAnimeList")
 def import_mal(username, user):
     """Celery task for importing anime and manga data from MyAnimeList."""
     try:
@@ -64,17 +65,27 @@ def import_mal(username, user):
 def import_tmdb(file, user, status):
     """Celery task for importing TMDB tv shows and movies."""
     try:
-        num_tv_imported, num_movie_imported = tmdb.importer(file, user, status)
+        num_tv_imported, num_movie_imported, warning_message = tmdb.importer(
+            file,
+            user,
+            status,
+        )
     except UnicodeDecodeError as error:
         msg = "Invalid file format. Please upload a CSV file."
         raise ValueError(msg) from error
     except KeyError as error:
         msg = "Error parsing TMDB CSV file."
         raise ValueError(msg) from error
-    return f"Imported {num_tv_imported} TV shows and {num_movie_imported} movies."
+
+    info_message = (
+        f"Imported {num_tv_imported} TV shows and {num_movie_imported} movies."
+    )
+    if warning_message:
+        return f"{info_message} {ERROR_TITLE} {warning_message}"
+    return info_message
 
 
-@shared_task(name="Import from AniList")
+@shared_task(base=ProviderTask, name="Import from AniList")
 def import_anilist(username, user):
     """Celery task for importing anime and manga data from AniList."""
     try:
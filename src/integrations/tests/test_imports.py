@@ -9,6 +9,7 @@ from django.contrib.auth import get_user_model
 from django.test import TestCase
 
 from app.models import TV, Anime, Episode, Item, Manga, Movie, Season
+from app.providers import services
 from integrations.imports import anilist, kitsu, mal, simkl, tmdb, trakt, yamtrack
 
 mock_path = Path(__file__).resolve().parent / "mock_data"
@@ -90,6 +91,22 @@ class ImportTMDB(TestCase):
 
         self.assertEqual(TV.objects.filter(user=self.user).count(), 2)
 
+    @patch("app.providers.services.get_media_metadata")
+    @patch("app.providers.services.get_media_metadata_many")
+    def test_tmdb_import_unavailable(self, mock_many, mock_metadata):  # noqa: ARG002
+        """Media skipped while TMDB is unavailable are reported as warnings."""
+        mock_metadata.side_effect = services.ProviderUnavailableError("TMDB", 30)
+
+        with Path(mock_path / "import_tmdb_ratings.csv").open("rb") as file:
+            tv_count, movie_count, warnings = tmdb.importer(
+                file,
+                self.user,
+                "Completed",
+            )
+
+        self.assertEqual((tv_count, movie_count), (0, 0))
+        self.assertIn("부산행: Couldn't fetch metadata from TMDB (396535)", warnings)
+
 
 class ImportAniList(TestCase):
     """Test importing media from AniList."""
@@ -436,6 +453,27 @@ class ImportSimkl(TestCase):
         self.assertEqual(anime_obj.status, "Planning")
         self.assertEqual(anime_obj.score, 7)
 
+    @patch("app.providers.tmdb.tv_with_seasons")
+    @patch("app.providers.services.get_media_metadata_many")
+    def test_tv_prefetch(self, mock_many, mock_tv):
+        """The metadata of the shows is fetched at once before processing."""
+        mock_tv.side_effect = services.ProviderUnavailableError("TMDB", 30)
+        tv_list = [
+            {
+                "show": {"title": "Breaking Bad", "ids": {"tmdb": 1396}},
+                "status": "watching",
+                "seasons": [{"number": 1}, {"number": 2}],
+            },
+            {"show": {"title": "Friends", "ids": {"tmdb": 1668}}, "status": "hold"},
+        ]
+
+        _, warnings = simkl.process_tv_list(tv_list, self.user)
+
+        mock_many.assert_called_once_with(
+            [("tv_with_seasons", 1396, "tmdb", (1, 2))],
+        )
+        self.assertEqual(len(warnings), 2)
+
     def test_get_status(self):
         """Test mapping SIMKL status to internal status."""
         self.assertEqual(simkl.get_status("completed"), "Completed")
@@ -4,7 +4,7 @@ from django.contrib import messages
 from django.shortcuts import get_object_or_404, render
 from django.views.decorators.http import require_GET, require_POST
 
-from app import helpers
+from app import helpers, items
 from app.models import Item
 from lists.forms import CustomListForm, FilterListItemsForm
 from lists.models import CustomList, CustomListItem
@@ -127,7 +127,7 @@ def lists_modal(request):
     season_number = request.GET.get("season_number")
     episode_number = request.GET.get("episode_number")
 
-    item, _ = Item.objects.get_or_create(
+    item = items.resolve_item(
         media_id=media_id,
         source=source,
         media_type=media_type,